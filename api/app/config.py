@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -23,10 +26,149 @@ class Settings(BaseSettings):
     max_context_length: int = 4096
     # Streaming disponible avec 6GB RAM
     enable_streaming: bool = True
+    # Sessions WebSocket /ws/chat: tours simultanés max par connexion, fermeture après inactivité (s)
+    websocket_max_turns: int = 4
+    websocket_idle_timeout: float = 300.0
+    
+    # Options de génération par endpoint (num_predict par défaut et plafond)
+    # Les règles de /chat/structured demandent moins de 3 phrases
+    chat_num_predict_default: int = 512
+    chat_num_predict_max: int = 2048
+    structured_num_predict_default: int = 192
+    structured_num_predict_max: int = 1024
+    # Budget de latence (ms) par défaut: num_predict calculé sur les tokens/s mesurés; None = désactivé
+    chat_latency_budget_ms: Optional[float] = None
+    structured_latency_budget_ms: Optional[float] = None
+    
+    # Limite adaptative de générations simultanées vers Ollama (file d'attente dans l'API)
+    adaptive_limit_enabled: bool = True
+    # "gradient" ou "aimd"
+    adaptive_limit_algorithm: str = "gradient"
+    adaptive_limit_initial: int = 2
+    adaptive_limit_min: int = 1
+    adaptive_limit_max: int = 16
+    # Au-delà: réponse 503 (file pleine ou attente trop longue, en secondes)
+    adaptive_limit_max_queue: int = 256
+    adaptive_limit_max_queue_wait: float = 60.0
+    # Ordonnancement par modèle: les requêtes du modèle chargé passent devant, pour éviter
+    # les rechargements (OLLAMA_MAX_LOADED_MODELS côté Ollama); attente max avant d'être servie
+    # quel que soit son modèle (0 = FIFO strict)
+    ollama_max_loaded_models: int = 1
+    swap_max_wait: float = 10.0
+    
+    # Objectifs SLO suivis en mémoire (/slo et jauges ollama_slo_*)
+    slo_availability_target: float = 0.99
+    slo_latency_target: float = 0.95
+    slo_latency_threshold_ms: float = 10000
+    # Fenêtres glissantes, ex: "5m,1h,6h"
+    slo_windows: str = "5m,1h"
+    slo_max_series: int = 64
+    
+    # Consommation par tenant (X-Tenant-ID ou X-API-Key hashée), agrégée en mémoire puis SQLite
+    usage_enabled: bool = True
+    usage_db_path: str = "data/usage.db"
+    usage_flush_interval: float = 10.0
+    
+    # File de jobs durable (SQLite) pour les générations longues
+    jobs_enabled: bool = True
+    jobs_db_path: str = "data/jobs.db"
+    # Jobs exécutés simultanément par processus (la limite adaptative vers Ollama s'applique en plus)
+    jobs_concurrency: int = 2
+    jobs_max_attempts: int = 3
+    jobs_poll_interval: float = 1.0
+    # Bail d'un job en cours: repris par un autre worker s'il n'est plus renouvelé (crash, redémarrage)
+    jobs_lease_seconds: float = 60.0
+    jobs_retry_delay: float = 5.0
+    jobs_retention_hours: float = 24.0
+    jobs_callback_timeout: float = 10.0
+    # Hôtes autorisés pour callback_url, séparés par des virgules (".example.org" = sous-domaines); vide = tout hôte public
+    jobs_callback_allowed_hosts: str = ""
+    # Les callbacks vers des adresses privées/loopback/link-local sont refusés sauf si activé (réseau interne de confiance)
+    jobs_callback_allow_private: bool = False
+    
+    # Analyse en flux des prompts (count-min sketch + top-k, HyperLogLog) par fenêtre, pour dimensionner les caches
+    prompt_analytics_enabled: bool = True
+    prompt_analytics_window_seconds: float = 3600.0
+    prompt_analytics_windows: int = 24
+    prompt_analytics_top_k: int = 50
+    # Début des prompts exposé sur /debug/prompts (0 = empreintes seules). Sans authentification sur
+    # l'endpoint, à n'activer que comme le journal d'audit: le texte de tous les tenants y serait visible
+    prompt_analytics_sample_chars: int = 0
+    
+    # Surveillance de la pression mémoire (API: RSS + cgroup, Ollama: modèles chargés via /api/ps)
+    memory_monitor_enabled: bool = True
+    memory_check_interval: float = 5.0
+    # Seuils (part de la limite): warning => déchargement des modèles inactifs + num_ctx uniforme réduit,
+    # critical => trafic batch rejeté (X-Priority: batch) et jobs suspendus
+    memory_warning_ratio: float = 0.85
+    memory_critical_ratio: float = 0.95
+    # Hystérésis: un niveau n'est quitté qu'une fois la marge repassée sous son seuil
+    memory_recovery_margin: float = 0.05
+    # Limite mémoire du conteneur Ollama (deploy.resources.limits de docker-compose), 0 = pas de suivi
+    ollama_memory_limit_bytes: int = 8 * 1024**3
+    memory_unload_idle_seconds: float = 300.0
+    memory_pressure_num_ctx: int = 2048
+    memory_shed_batch: bool = True
+    
+    # Journal d'audit des prompts/réponses (désactivé par défaut)
+    audit_log_enabled: bool = False
+    audit_log_dir: str = "audit"
+    audit_log_max_bytes: int = 100 * 1024 * 1024
+    audit_log_max_files: int = 50
+    # File bornée: "drop" (défaut) jette l'enregistrement si pleine, "block" attend audit_log_block_timeout
+    audit_log_queue_size: int = 10000
+    audit_log_policy: str = "drop"
+    audit_log_block_timeout: float = 1.0
+    audit_log_batch_size: int = 500
+    audit_log_flush_interval: float = 1.0
+    
+    # Embeddings (micro-batching)
+    # Modèle d'embedding servi par /embeddings
+    embedding_model: str = "nomic-embed-text"
+    # Nombre max de textes regroupés dans un seul appel /api/embed
+    embedding_batch_max_size: int = 32
+    # Temps d'attente max (ms) pour remplir un batch
+    embedding_batch_max_wait_ms: float = 5.0
+    
+    # Cache sémantique devant /chat/structured (désactivé par défaut)
+    semantic_cache_enabled: bool = False
+    # Similarité cosinus minimale pour servir une réponse en cache
+    semantic_cache_threshold: float = 0.92
+    # Entrées max par (template, modèle) et nombre max de scopes
+    semantic_cache_max_entries: int = 2048
+    semantic_cache_max_scopes: int = 32
+    semantic_cache_ttl_seconds: int = 3600
+    # Modèle d'embedding du cache (multilingue pour FR/EN, ex: bge-m3); défaut: embedding_model
+    semantic_cache_embedding_model: Optional[str] = None
+    
+    # Bases de connaissances (BM25 en mémoire) pour /chat/structured
+    knowledge_max_bases: int = 16
+    # Taille cible des morceaux indexés (caractères) et nombre de morceaux insérés par défaut
+    knowledge_chunk_chars: int = 400
+    knowledge_top_k: int = 4
+    
+    # Enregistrement du trafic pour rejeu (désactivé par défaut)
+    traffic_recording_enabled: bool = False
+    traffic_recording_sample_rate: float = 0.1
+    traffic_recording_dir: str = "recordings"
+    # Rotation des fichiers JSONL compressés
+    traffic_recording_max_bytes: int = 50 * 1024 * 1024
+    traffic_recording_max_files: int = 20
+    traffic_recording_flush_interval: float = 5.0
     
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Settings from the environment and .env, read on first use rather than at import"""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # `from app.config import settings` keeps working
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,200 @@
+from functools import cached_property
+
+from starlette.requests import HTTPConnection
+
+from app.config import Settings
+
+
+class Container:
+    """
+    Services shared by the routers, created on first use
+
+    Built by `create_app()` and stored on `app.state.container`. Service
+    modules are imported inside each property, so heavy dependencies (numpy
+    for the semantic cache) load only when the feature is used; `close()`
+    shuts down whatever was actually created.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+    def created(self, name: str) -> bool:
+        return name in self.__dict__
+
+    @cached_property
+    def limiter(self):
+        from app.services.adaptive_limiter import AdaptiveConcurrencyLimiter
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=self.settings.adaptive_limit_initial,
+            min_limit=self.settings.adaptive_limit_min,
+            max_limit=self.settings.adaptive_limit_max,
+            algorithm=self.settings.adaptive_limit_algorithm,
+            max_queue=self.settings.adaptive_limit_max_queue,
+            max_queue_wait=self.settings.adaptive_limit_max_queue_wait,
+            max_loaded_models=self.settings.ollama_max_loaded_models,
+            swap_max_wait=self.settings.swap_max_wait,
+            enabled=self.settings.adaptive_limit_enabled
+        )
+        limiter.known_models.update(filter(None, (
+            self.settings.ollama_model, self.settings.embedding_model, self.settings.semantic_cache_embedding_model
+        )))
+        return limiter
+
+    @cached_property
+    def ollama_client(self):
+        from app.services.ollama_client import OllamaClient
+        return OllamaClient(
+            self.settings.ollama_url,
+            limiter=self.limiter,
+            timeout=self.settings.api_timeout,
+            max_retries=self.settings.max_retries,
+            retry_delay=self.settings.retry_delay
+        )
+
+    @cached_property
+    def embedding_batcher(self):
+        from app.services.embedding_batcher import EmbeddingBatcher
+        return EmbeddingBatcher(
+            self.ollama_client,
+            max_batch_size=self.settings.embedding_batch_max_size,
+            max_wait_ms=self.settings.embedding_batch_max_wait_ms
+        )
+
+    @cached_property
+    def semantic_cache(self):
+        from app.services.semantic_cache import SemanticCache
+        return SemanticCache(
+            threshold=self.settings.semantic_cache_threshold,
+            max_entries=self.settings.semantic_cache_max_entries,
+            max_scopes=self.settings.semantic_cache_max_scopes,
+            ttl_seconds=self.settings.semantic_cache_ttl_seconds
+        )
+
+    @cached_property
+    def knowledge(self):
+        from app.services.retrieval import KnowledgeRegistry
+        return KnowledgeRegistry(
+            max_bases=self.settings.knowledge_max_bases,
+            chunk_chars=self.settings.knowledge_chunk_chars
+        )
+
+    @cached_property
+    def prompt_analytics(self):
+        from app.services.prompt_analytics import PromptAnalytics
+        return PromptAnalytics(
+            window_seconds=self.settings.prompt_analytics_window_seconds,
+            windows=self.settings.prompt_analytics_windows,
+            top_k=self.settings.prompt_analytics_top_k,
+            sample_chars=self.settings.prompt_analytics_sample_chars,
+            enabled=self.settings.prompt_analytics_enabled
+        )
+
+    @cached_property
+    def generation_budget(self):
+        from app.services.generation_budget import GenerationBudget
+        return GenerationBudget()
+
+    @cached_property
+    def traffic_recorder(self):
+        from app.services.traffic_recorder import TrafficRecorder
+        from app.utils.jsonl_writer import RotatingJsonlWriter
+        return TrafficRecorder(
+            RotatingJsonlWriter(
+                self.settings.traffic_recording_dir,
+                prefix="traffic",
+                max_bytes=self.settings.traffic_recording_max_bytes,
+                max_files=self.settings.traffic_recording_max_files
+            ),
+            sample_rate=self.settings.traffic_recording_sample_rate,
+            enabled=self.settings.traffic_recording_enabled,
+            flush_interval=self.settings.traffic_recording_flush_interval
+        )
+
+    @cached_property
+    def audit_log(self):
+        from app.services.audit_log import AuditLog
+        from app.utils.jsonl_writer import RotatingJsonlWriter
+        return AuditLog(
+            RotatingJsonlWriter(
+                self.settings.audit_log_dir,
+                prefix="audit",
+                max_bytes=self.settings.audit_log_max_bytes,
+                max_files=self.settings.audit_log_max_files
+            ),
+            enabled=self.settings.audit_log_enabled,
+            max_queue=self.settings.audit_log_queue_size,
+            policy=self.settings.audit_log_policy,
+            block_timeout=self.settings.audit_log_block_timeout,
+            batch_size=self.settings.audit_log_batch_size,
+            flush_interval=self.settings.audit_log_flush_interval
+        )
+
+    @cached_property
+    def slo_tracker(self):
+        from app.services.slo import SLOTracker, parse_windows
+        return SLOTracker(
+            windows=parse_windows(self.settings.slo_windows),
+            availability_target=self.settings.slo_availability_target,
+            latency_target=self.settings.slo_latency_target,
+            latency_threshold_ms=self.settings.slo_latency_threshold_ms,
+            max_series=self.settings.slo_max_series
+        )
+
+    @cached_property
+    def usage_tracker(self):
+        from app.services.usage import UsageStore, UsageTracker
+        return UsageTracker(
+            UsageStore(self.settings.usage_db_path),
+            enabled=self.settings.usage_enabled,
+            flush_interval=self.settings.usage_flush_interval
+        )
+
+    @cached_property
+    def job_queue(self):
+        from app.services.jobs import JobQueue, JobStore, parse_hosts
+        return JobQueue(
+            JobStore(self.settings.jobs_db_path),
+            concurrency=self.settings.jobs_concurrency,
+            max_attempts=self.settings.jobs_max_attempts,
+            poll_interval=self.settings.jobs_poll_interval,
+            lease_seconds=self.settings.jobs_lease_seconds,
+            retry_delay=self.settings.jobs_retry_delay,
+            retention_seconds=self.settings.jobs_retention_hours * 3600,
+            callback_timeout=self.settings.jobs_callback_timeout,
+            callback_hosts=parse_hosts(self.settings.jobs_callback_allowed_hosts),
+            callback_allow_private=self.settings.jobs_callback_allow_private,
+            enabled=self.settings.jobs_enabled,
+            paused=self.shedding_batch
+        )
+
+    @cached_property
+    def memory_monitor(self):
+        from app.services.memory_monitor import MemoryMonitor
+        return MemoryMonitor(
+            self.ollama_client,
+            interval=self.settings.memory_check_interval,
+            warning_ratio=self.settings.memory_warning_ratio,
+            critical_ratio=self.settings.memory_critical_ratio,
+            recovery_margin=self.settings.memory_recovery_margin,
+            ollama_memory_limit=self.settings.ollama_memory_limit_bytes or None,
+            unload_idle_seconds=self.settings.memory_unload_idle_seconds,
+            protected_model=self.settings.ollama_model,
+            num_ctx_cap=self.settings.memory_pressure_num_ctx,
+            shed_batch=self.settings.memory_shed_batch,
+            enabled=self.settings.memory_monitor_enabled
+        )
+
+    def shedding_batch(self) -> bool:
+        """Whether batch traffic (jobs, X-Priority: batch) is refused under memory pressure"""
+        return self.created("memory_monitor") and self.memory_monitor.shed_batch
+
+    async def close(self):
+        """Stop the memory monitor and job workers, flush pipelines, then stop batchers and close the Ollama client"""
+        for name in ("memory_monitor", "job_queue", "traffic_recorder", "audit_log", "usage_tracker", "embedding_batcher", "ollama_client"):
+            if self.created(name):
+                await getattr(self, name).close()
+
+
+def get_container(connection: HTTPConnection) -> Container:
+    """FastAPI dependency returning the application's container (HTTP and WebSocket)"""
+    return connection.app.state.container
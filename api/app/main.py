@@ -1,35 +1,103 @@
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
+
 from fastapi import FastAPI
-from fastapi.responses import PlainTextResponse
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+
+from app.config import Settings
+from app.utils.timers import PhaseTimer
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the application
+
+    Each call gets its own service container (`app.state.container`);
+    services are created on first use, the Ollama client eagerly at startup.
+    Startup phase durations are exposed on /health/startup and as the
+    `api_startup_phase_seconds` gauge.
+    """
+    startup = PhaseTimer()
+
+    with startup.phase("imports"):
+        from prometheus_client import generate_latest
+        from app.container import Container
+        from app.metrics import initialize_metrics, startup_phase_duration
+        from app.routers import health, chat, ws_chat, jobs, knowledge, embeddings, slo, usage, analytics
+
+    with startup.phase("settings"):
+        if settings is None:
+            from app.config import get_settings
+            settings = get_settings()
+
+    with startup.phase("metrics"):
+        # Initialize Prometheus metrics
+        initialize_metrics()
+
+    with startup.phase("container"):
+        container = Container(settings)
 
-from app.config import settings
-from app.routers import health, chat
-from app.metrics import initialize_metrics
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Create the Ollama client before serving; flush background pipelines on shutdown"""
+        with startup.phase("services"):
+            container.ollama_client
+            if container.settings.memory_monitor_enabled:
+                container.memory_monitor.start()
+            if container.settings.jobs_enabled:
+                # Also resumes the jobs left queued or running by a previous process
+                container.job_queue.start(partial(jobs.run_job, container))
+        app.state.startup = startup.as_dict()
+        for phase, duration_ms in app.state.startup["phases_ms"].items():
+            startup_phase_duration.labels(phase=phase).set(duration_ms / 1000)
+        yield
+        await container.close()
 
-app = FastAPI(
-    title="Ollama Monitoring API",
-    description="API with monitoring for Ollama interactions",
-    version="1.0.0"
-)
+    with startup.phase("routers"):
+        app = FastAPI(
+            title="Ollama Monitoring API",
+            description="API with monitoring for Ollama interactions",
+            version="1.0.0",
+            default_response_class=ORJSONResponse,
+            lifespan=lifespan
+        )
+        app.state.container = container
 
-# Initialize Prometheus metrics
-initialize_metrics()
+        # Include routers
+        app.include_router(health.router, tags=["Health"])
+        app.include_router(chat.router, tags=["Chat"])
+        app.include_router(ws_chat.router, tags=["Chat"])
+        app.include_router(jobs.router, tags=["Jobs"])
+        app.include_router(knowledge.router, tags=["Knowledge"])
+        app.include_router(embeddings.router, tags=["Embeddings"])
+        app.include_router(slo.router, tags=["SLO"])
+        app.include_router(usage.router, tags=["Usage"])
+        app.include_router(analytics.router, tags=["Analytics"])
 
-# Include routers
-app.include_router(health.router, tags=["Health"])
-app.include_router(chat.router, tags=["Chat"])
+        @app.get("/metrics", response_class=PlainTextResponse)
+        async def metrics():
+            """Expose Prometheus metrics"""
+            slo.export_slo_gauges(container)
+            return generate_latest()
 
+        @app.get("/")
+        async def root():
+            return {
+                "message": "Ollama Monitoring API",
+                "version": "1.0.0",
+                "docs": "/docs"
+            }
 
-@app.get("/metrics", response_class=PlainTextResponse)
-async def metrics():
-    """Expose Prometheus metrics"""
-    return generate_latest()
+    # Without a lifespan (e.g. httpx.ASGITransport) the report stops here
+    app.state.startup = startup.as_dict()
+    return app
 
 
-@app.get("/")
-async def root():
-    return {
-        "message": "Ollama Monitoring API",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
+def __getattr__(name: str):
+    """Keep `app.main:app` working: the module-level app is built on first access"""
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -40,6 +40,241 @@ tokens_processed = Counter(
     ['model']
 )
 
+# Embedding micro-batching
+embedding_batch_size = Histogram(
+    'ollama_embedding_batch_size',
+    'Number of texts sent to Ollama in a single embed call',
+    ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+embedding_batch_wait = Histogram(
+    'ollama_embedding_batch_wait_seconds',
+    'Time a text waited in the micro-batcher before being sent',
+    ['model'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+# Semantic cache
+semantic_cache_lookups = Counter(
+    'ollama_semantic_cache_lookups_total',
+    'Semantic cache lookups by result',
+    ['endpoint', 'result']
+)
+
+semantic_cache_similarity = Histogram(
+    'ollama_semantic_cache_similarity',
+    'Best cosine similarity found per semantic cache lookup',
+    ['result'],
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 0.99, 1.0)
+)
+
+semantic_cache_entries = Gauge(
+    'ollama_semantic_cache_entries',
+    'Number of entries held by the semantic cache'
+)
+
+semantic_cache_evictions = Counter(
+    'ollama_semantic_cache_evictions_total',
+    'Semantic cache entries evicted',
+    ['reason']
+)
+
+# Generation options and budgets
+generation_num_predict = Histogram(
+    'ollama_generation_num_predict',
+    'num_predict sent to Ollama, by how it was chosen',
+    ['endpoint', 'mode'],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048)
+)
+
+generation_tokens_per_second = Gauge(
+    'ollama_generation_tokens_per_second',
+    'Moving average of Ollama tokens/sec used for latency budgets',
+    ['model', 'phase']
+)
+
+# Adaptive concurrency limiter around Ollama generations
+concurrency_limit = Gauge(
+    'ollama_concurrency_limit',
+    'Current adaptive limit on in-flight Ollama generations'
+)
+
+concurrency_limit_adjustments = Counter(
+    'ollama_concurrency_limit_adjustments_total',
+    'Changes of the adaptive concurrency limit',
+    ['direction']
+)
+
+limiter_inflight = Gauge(
+    'ollama_limiter_inflight',
+    'Ollama generations currently holding a limiter slot'
+)
+
+limiter_queue_depth = Gauge(
+    'ollama_limiter_queue_depth',
+    'Requests waiting in the API for a limiter slot'
+)
+
+limiter_queue_wait = Histogram(
+    'ollama_limiter_queue_wait_seconds',
+    'Time spent waiting for a limiter slot',
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+limiter_rejections = Counter(
+    'ollama_limiter_rejections_total',
+    'Requests shed by the limiter',
+    ['reason']
+)
+
+scheduler_grants = Counter(
+    'ollama_scheduler_grants_total',
+    'Limiter slots granted by scheduling decision (direct, fifo, affinity, overdue, load)',
+    ['decision']
+)
+
+model_swaps = Counter(
+    'ollama_model_swaps_total',
+    'Generations that made Ollama evict a loaded model, by incoming model',
+    ['model']
+)
+
+model_load_time = Counter(
+    'ollama_model_load_seconds_total',
+    'Time Ollama spent loading models (load_duration of the replies)',
+    ['model']
+)
+
+# SLO tracking (refreshed from the in-process sketches at each scrape)
+slo_latency = Gauge(
+    'ollama_slo_latency_ms',
+    'Latency quantile over the SLO window (DDSketch, 1% relative error)',
+    ['endpoint', 'model', 'window', 'quantile']
+)
+
+slo_compliance = Gauge(
+    'ollama_slo_compliance_ratio',
+    'Share of good requests over the SLO window',
+    ['endpoint', 'model', 'window', 'objective']
+)
+
+slo_burn_rate = Gauge(
+    'ollama_slo_burn_rate',
+    'Error budget burn rate over the SLO window (1 = exactly on budget)',
+    ['endpoint', 'model', 'window', 'objective']
+)
+
+# Audit log pipeline
+audit_queue_depth = Gauge(
+    'ollama_audit_queue_depth',
+    'Audit records waiting to be written'
+)
+
+audit_records = Counter(
+    'ollama_audit_records_total',
+    'Audit records by outcome (written, dropped, failed)',
+    ['result']
+)
+
+# Knowledge base retrieval
+knowledge_retrieval_latency = Histogram(
+    'ollama_knowledge_retrieval_duration_seconds',
+    'BM25 retrieval time per structured request',
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1]
+)
+
+structured_prompt_chars = Histogram(
+    'ollama_structured_prompt_chars',
+    'Length of the structured prompt sent to Ollama',
+    ['retrieval'],
+    buckets=[250, 500, 1000, 2000, 4000, 8000, 16000, 32000]
+)
+
+# Durable job queue
+jobs_processed = Counter(
+    'ollama_jobs_processed_total',
+    'Job attempts by outcome (succeeded, failed, retried)',
+    ['status']
+)
+
+jobs_queue_depth = Gauge(
+    'ollama_jobs_queue_depth',
+    'Jobs in the store by status',
+    ['status']
+)
+
+jobs_oldest_queued_age = Gauge(
+    'ollama_jobs_oldest_queued_age_seconds',
+    'Age of the oldest job waiting to run'
+)
+
+job_latency = Histogram(
+    'ollama_job_duration_seconds',
+    'Job latency by phase (queue_wait, run, total)',
+    ['phase'],
+    buckets=[0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0]
+)
+
+job_callbacks = Counter(
+    'ollama_job_callbacks_total',
+    'Job callback deliveries by result',
+    ['result']
+)
+
+# WebSocket chat sessions
+websocket_connections = Gauge(
+    'ollama_websocket_connections',
+    'Open /ws/chat connections'
+)
+
+websocket_messages = Counter(
+    'ollama_websocket_messages_total',
+    'Client messages received on /ws/chat by type',
+    ['type']
+)
+
+# Memory pressure
+memory_process_rss = Gauge(
+    'api_memory_process_rss_bytes',
+    'Resident set size of the API process'
+)
+
+memory_cgroup = Gauge(
+    'api_memory_cgroup_bytes',
+    'Memory of the API container cgroup (usage, working_set, limit)',
+    ['kind']
+)
+
+memory_pressure_stall = Gauge(
+    'api_memory_pressure_stall_percent',
+    'Share of the last 10 s tasks stalled on memory (PSI some avg10)'
+)
+
+loaded_model_memory = Gauge(
+    'ollama_loaded_model_bytes',
+    'Memory of the models loaded in Ollama (/api/ps)',
+    ['model']
+)
+
+memory_pressure_level = Gauge(
+    'api_memory_pressure_level',
+    'Memory pressure level (0 normal, 1 warning, 2 critical)'
+)
+
+memory_pressure_actions = Counter(
+    'api_memory_pressure_actions_total',
+    'Actions taken under memory pressure (unload, num_ctx_cap, shed_batch, reject_batch)',
+    ['action']
+)
+
+# Application startup
+startup_phase_duration = Gauge(
+    'api_startup_phase_seconds',
+    'Duration of each application startup phase',
+    ['phase']
+)
+
 
 def initialize_metrics():
     """Initialize metrics with default values"""
@@ -0,0 +1,23 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.container import Container, get_container
+from app.utils import fastjson
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+@router.get("/debug/prompts")
+async def prompt_analytics(
+    cache_size: List[int] = Query([10, 100, 1000]),
+    limit: int = 20,
+    services: Container = Depends(get_container)
+):
+    """Heavy-hitter prompts and templates, distinct counts and estimated cache hit rates per window"""
+    if not services.settings.prompt_analytics_enabled:
+        raise HTTPException(status_code=404, detail="Prompt analytics are disabled")
+    return services.prompt_analytics.report(
+        cache_sizes=[size for size in cache_size if size > 0],
+        limit=min(max(limit, 1), services.settings.prompt_analytics_top_k)
+    )
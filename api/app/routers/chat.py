@@ -1,20 +1,46 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import time
 
-from app.services.ollama_client import OllamaClient
-from app.config import settings
-from app.utils.timers import timer_context
-from app.metrics import request_counter, request_latency, active_requests, error_counter
+from app.container import Container, get_container
+from app.config import Settings
+from app.services.adaptive_limiter import LimiterOverloaded
+from app.routers.usage import current_tenant
+from app.utils import fastjson
+from app.utils.timers import Timer, timer_context
+from app.metrics import (
+    request_counter, request_latency, active_requests, error_counter,
+    semantic_cache_lookups, semantic_cache_similarity, generation_num_predict,
+    knowledge_retrieval_latency, structured_prompt_chars, memory_pressure_actions
+)
 
-router = APIRouter()
-ollama_client = OllamaClient(settings.ollama_url)
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+class GenerationOptions(BaseModel):
+    """Ollama generation options accepted from clients (capped per endpoint)"""
+    num_predict: Optional[int] = Field(None, ge=1)
+    # A num_ctx different from the loaded one makes Ollama reload the model
+    num_ctx: Optional[int] = Field(None, ge=256)
+    stop: Optional[List[str]] = None
+    temperature: Optional[float] = Field(None, ge=0)
+    top_p: Optional[float] = Field(None, gt=0, le=1)
+    top_k: Optional[int] = Field(None, ge=1)
+    repeat_penalty: Optional[float] = Field(None, ge=0)
+    seed: Optional[int] = None
+    # Pick num_predict so generation finishes within this time at the live tokens/sec
+    latency_budget_ms: Optional[float] = Field(None, gt=0)
 
 
 class ChatRequest(BaseModel):
     prompt: str
     model: Optional[str] = None
     stream: bool = False
+    options: Optional[GenerationOptions] = None
 
 
 class StructuredChatRequest(BaseModel):
@@ -23,16 +49,47 @@ class StructuredChatRequest(BaseModel):
     stream: bool = False
     rules: Optional[str] = None
     context: Optional[str] = None
+    # Registered knowledge base: only its top_k chunks relevant to the query enter the prompt
+    knowledge_base: Optional[str] = None
+    top_k: Optional[int] = Field(None, ge=1, le=32)
+    options: Optional[GenerationOptions] = None
+
+
+# Request kinds accepted outside the HTTP endpoints (WebSocket turns, jobs) -> (endpoint, model)
+REQUEST_TYPES = {
+    "chat": ("/chat", ChatRequest),
+    "structured": ("/chat/structured", StructuredChatRequest)
+}
 
 
 class ChatResponse(BaseModel):
     response: str
     model: str
     duration_ms: float
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    generation_ms: Optional[float] = None
+
 
+def generation_stats(response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Token counts and generation time reported by Ollama (None when absent)"""
+    response = response or {}
+    eval_duration = response.get("eval_duration")
+    return {
+        "prompt_tokens": response.get("prompt_eval_count"),
+        "completion_tokens": response.get("eval_count"),
+        "generation_ms": eval_duration / 1e6 if eval_duration is not None else None
+    }
 
-def build_structured_prompt(query: str, rules: Optional[str] = None, context: Optional[str] = None) -> str:
-    """Build a structured prompt with rules, context, and user query"""
+
+def build_structured_prompt(
+    query: str,
+    rules: Optional[str] = None,
+    context: Optional[str] = None,
+    knowledge: Optional[List[str]] = None
+) -> str:
+    """Build a structured prompt with rules, context (or retrieved knowledge), and user query"""
     
     default_rules = """RULES:
 - Provide concise and accurate answers
@@ -48,7 +105,11 @@ Your expertise includes Docker, Kubernetes, monitoring systems, and API developm
 You help developers understand and implement modern infrastructure solutions."""
 
     final_rules = rules if rules else default_rules
-    final_context = context if context else default_context
+    if knowledge is not None:
+        # Retrieved chunks replace the default context
+        final_context = (f"{context}\n\n" if context else "") + "CONTEXT:\n" + "\n\n".join(knowledge)
+    else:
+        final_context = context if context else default_context
     
     structured_prompt = f"""{final_rules}
 
@@ -60,71 +121,378 @@ USER QUERY:
     return structured_prompt
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def structured_prompt(services: Container, request: StructuredChatRequest) -> Tuple[str, Optional[List[str]]]:
+    """Prompt of a structured request and the knowledge chunks retrieved for it (None without a knowledge base)"""
+    knowledge = None
+    if request.knowledge_base is not None:
+        base = services.knowledge.get(request.knowledge_base)
+        if base is None:
+            raise HTTPException(status_code=404, detail=f"Unknown knowledge base: {request.knowledge_base}")
+        with knowledge_retrieval_latency.time():
+            hits = base.retrieve(request.query, request.top_k or services.settings.knowledge_top_k)
+        knowledge = [hit.chunk.text for hit in hits]
+    
+    prompt = build_structured_prompt(
+        query=request.query,
+        rules=request.rules,
+        context=request.context,
+        knowledge=knowledge
+    )
+    structured_prompt_chars.labels(retrieval="no" if knowledge is None else "yes").observe(len(prompt))
+    return prompt, knowledge
+
+
+def generation_limits(settings: Settings, endpoint: str) -> Dict[str, Any]:
+    """num_predict default, cap and latency budget of an endpoint"""
+    if endpoint == "/chat/structured":
+        return {
+            "num_predict": settings.structured_num_predict_default,
+            "max_num_predict": settings.structured_num_predict_max,
+            "latency_budget_ms": settings.structured_latency_budget_ms
+        }
+    return {
+        "num_predict": settings.chat_num_predict_default,
+        "max_num_predict": settings.chat_num_predict_max,
+        "latency_budget_ms": settings.chat_latency_budget_ms
+    }
+
+
+def generation_options(
+    services: Container,
+    endpoint: str,
+    options: Optional[GenerationOptions],
+    model: str,
+    prompt: str
+) -> Dict[str, Any]:
+    """Ollama options for a request: client values capped, endpoint defaults, latency budget"""
+    limits = generation_limits(services.settings, endpoint)
+    values = options.model_dump(exclude_none=True) if options else {}
+    budget_ms = values.pop("latency_budget_ms", None) or limits["latency_budget_ms"]
+    
+    mode = "requested" if "num_predict" in values else "default"
+    num_predict = min(values.get("num_predict", limits["num_predict"]), limits["max_num_predict"])
+    if budget_ms:
+        budgeted = services.generation_budget.num_predict_for(model, prompt, budget_ms)
+        if budgeted is not None and budgeted < num_predict:
+            num_predict, mode = budgeted, "budget"
+    values["num_predict"] = num_predict
+    
+    if "num_ctx" in values:
+        values["num_ctx"] = min(values["num_ctx"], services.settings.max_context_length)
+    # Under memory pressure every request runs with the same smaller KV cache: one reload, not one per num_ctx
+    if services.created("memory_monitor") and services.memory_monitor.num_ctx_cap:
+        values["num_ctx"] = services.memory_monitor.num_ctx_cap
+    
+    generation_num_predict.labels(endpoint=endpoint, mode=mode).observe(num_predict)
+    return values
+
+
+def shed_batch_traffic(x_priority: Optional[str] = Header(None), services: Container = Depends(get_container)):
+    """Reject `X-Priority: batch` requests while memory pressure is critical"""
+    if x_priority == "batch" and services.shedding_batch():
+        memory_pressure_actions.labels(action="reject_batch").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Memory pressure: batch traffic is paused",
+            headers={"Retry-After": str(max(1, round(services.settings.memory_check_interval)))}
+        )
+
+
+async def record_completion(
+    services: Container,
+    endpoint: str,
+    request: BaseModel,
+    model: str,
+    arrival: float,
+    status: str,
+    duration_ms: float,
+    response: Optional[Dict[str, Any]] = None,
+    tenant: str = "anonymous",
+    text: Optional[str] = None
+):
+    """Feed a finished request to the traffic pipelines (SLO tracking, usage, prompt analytics, audit log, sampled recording)"""
+    # A client cancel is neither a success nor a failure of the service: it spends no error budget
+    if status != "cancelled":
+        services.slo_tracker.record(endpoint, model, duration_ms, status == "success")
+    if services.settings.prompt_analytics_enabled:
+        if isinstance(request, StructuredChatRequest):
+            template = (request.rules, request.context, request.knowledge_base)
+            services.prompt_analytics.observe(endpoint, request.query, template)
+        else:
+            services.prompt_analytics.observe(endpoint, request.prompt)
+    response = response or {}
+    services.usage_tracker.record(
+        tenant,
+        model,
+        status in ("success", "cancelled"),
+        prompt_tokens=response.get("prompt_eval_count"),
+        completion_tokens=response.get("eval_count"),
+        backend_seconds=(response.get("total_duration") or 0) / 1e9
+    )
+    if services.audit_log.enabled:
+        await services.audit_log.submit({
+            "endpoint": endpoint,
+            "tenant": tenant,
+            "model": model,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "request": request.model_dump(exclude_none=True),
+            "response": text if text is not None else response.get("response")
+        })
+    if services.traffic_recorder.should_sample():
+        services.traffic_recorder.record(
+            endpoint=endpoint,
+            body=request.model_dump(),
+            arrival=arrival,
+            model=model,
+            status=status,
+            duration_ms=duration_ms,
+            response=response
+        )
+
+
+async def generation_events(
+    services: Container,
+    endpoint: str,
+    model: str,
+    prompt: str,
+    request: BaseModel,
+    arrival: float,
+    options: Optional[Dict[str, Any]] = None,
+    tenant: str = "anonymous",
+    method: str = "POST"
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a generation as events, recording the same metrics as non-streamed calls
+
+    Closing or cancelling the iteration closes the upstream stream, which
+    stops the generation in Ollama; the request is then recorded as "cancelled".
+    """
+    status = "success"
+    final_chunk = None
+    # Full text is only assembled when the audit log needs it
+    parts = [] if services.audit_log.enabled else None
+    timer = Timer()
+    timer.start()
+    active_requests.inc()
+    try:
+        async for chunk in services.ollama_client.generate_stream(model=model, prompt=prompt, options=options):
+            if chunk.get("done"):
+                timer.stop()
+                final_chunk = chunk
+                services.generation_budget.observe(model, chunk)
+                yield {
+                    "response": chunk.get("response", ""),
+                    "done": True,
+                    "model": model,
+                    "duration_ms": timer.duration_ms,
+                    **generation_stats(chunk)
+                }
+            else:
+                if parts is not None:
+                    parts.append(chunk.get("response", ""))
+                yield {"response": chunk.get("response", ""), "done": False}
+    
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    
+    except LimiterOverloaded as e:
+        status = "overloaded"
+        error_counter.labels(error_type=type(e).__name__).inc()
+        yield {"error": str(e), "done": True}
+    
+    except Exception as e:
+        status = "error"
+        error_counter.labels(error_type=type(e).__name__).inc()
+        yield {"error": f"Error communicating with Ollama: {str(e)}", "done": True}
+    
+    finally:
+        if timer.end_time is None:
+            timer.stop()
+        request_latency.labels(method=method, endpoint=endpoint).observe(timer.duration)
+        request_counter.labels(method=method, endpoint=endpoint, status=status).inc()
+        active_requests.dec()
+        await record_completion(
+            services, endpoint, request, model, arrival, status, timer.duration_ms, final_chunk, tenant,
+            text="".join(parts) if parts is not None else None
+        )
+
+
+async def stream_chat(
+    services: Container,
+    endpoint: str,
+    model: str,
+    prompt: str,
+    request: BaseModel,
+    arrival: float,
+    options: Optional[Dict[str, Any]] = None,
+    tenant: str = "anonymous"
+) -> AsyncIterator[bytes]:
+    """Relay Ollama chunks as NDJSON lines"""
+    events = generation_events(services, endpoint, model, prompt, request, arrival, options, tenant)
+    async with aclosing(events):
+        async for event in events:
+            yield fastjson.dumps(event) + b"\n"
+
+
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(shed_batch_traffic)])
+async def chat(
+    request: ChatRequest,
+    tenant: str = Depends(current_tenant),
+    services: Container = Depends(get_container)
+):
     """Send a chat request to Ollama"""
-    model = request.model or settings.ollama_model
+    model = request.model or services.settings.ollama_model
+    arrival = time.time()
+    options = generation_options(services, "/chat", request.options, model, request.prompt)
+    
+    if request.stream and services.settings.enable_streaming:
+        return StreamingResponse(
+            stream_chat(services, "/chat", model, request.prompt, request, arrival, options, tenant),
+            media_type="application/x-ndjson"
+        )
     
     active_requests.inc()
     try:
         with timer_context() as timer:
             with request_latency.labels(method="POST", endpoint="/chat").time():
-                response = await ollama_client.generate(
+                response = await services.ollama_client.generate(
                     model=model,
                     prompt=request.prompt,
-                    stream=request.stream
+                    options=options
                 )
         
+        services.generation_budget.observe(model, response)
         request_counter.labels(method="POST", endpoint="/chat", status="success").inc()
+        await record_completion(services, "/chat", request, model, arrival, "success", timer.duration_ms, response, tenant=tenant)
         
         return ChatResponse(
             response=response.get("response", ""),
             model=model,
-            duration_ms=timer.duration_ms
+            duration_ms=timer.duration_ms,
+            **generation_stats(response)
         )
     
+    except LimiterOverloaded as e:
+        # Shed at the API: the queue in front of Ollama is full or too slow
+        error_counter.labels(error_type=type(e).__name__).inc()
+        request_counter.labels(method="POST", endpoint="/chat", status="overloaded").inc()
+        await record_completion(services, "/chat", request, model, arrival, "overloaded", (time.time() - arrival) * 1000, tenant=tenant)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
     except Exception as e:
         error_counter.labels(error_type=type(e).__name__).inc()
         request_counter.labels(method="POST", endpoint="/chat", status="error").inc()
+        await record_completion(services, "/chat", request, model, arrival, "error", (time.time() - arrival) * 1000, tenant=tenant)
         raise HTTPException(status_code=500, detail=f"Error communicating with Ollama: {str(e)}")
     
     finally:
         active_requests.dec()
 
 
-@router.post("/chat/structured", response_model=ChatResponse)
-async def chat_structured(request: StructuredChatRequest):
+async def embed_for_cache(services: Container, query: str):
+    """Embed a normalized query for the semantic cache, or None if embedding fails"""
+    from app.services.semantic_cache import normalize_query
+    
+    model = services.settings.semantic_cache_embedding_model or services.settings.embedding_model
+    try:
+        vectors = await services.embedding_batcher.embed(model=model, texts=[normalize_query(query)])
+        return vectors[0]
+    except Exception as e:
+        error_counter.labels(error_type=type(e).__name__).inc()
+        semantic_cache_lookups.labels(endpoint="/chat/structured", result="error").inc()
+        return None
+
+
+@router.post("/chat/structured", response_model=ChatResponse, dependencies=[Depends(shed_batch_traffic)])
+async def chat_structured(
+    request: StructuredChatRequest,
+    tenant: str = Depends(current_tenant),
+    services: Container = Depends(get_container)
+):
     """Send a structured chat request to Ollama with rules and context"""
-    model = request.model or settings.ollama_model
+    model = request.model or services.settings.ollama_model
+    arrival = time.time()
     
     # Build the structured prompt
-    structured_prompt = build_structured_prompt(
-        query=request.query,
-        rules=request.rules,
-        context=request.context
-    )
+    prompt, knowledge = structured_prompt(services, request)
+    options = generation_options(services, "/chat/structured", request.options, model, prompt)
+    
+    if request.stream and services.settings.enable_streaming:
+        return StreamingResponse(
+            stream_chat(services, "/chat/structured", model, prompt, request, arrival, options, tenant),
+            media_type="application/x-ndjson"
+        )
+    
+    use_cache = services.settings.semantic_cache_enabled
+    if use_cache:
+        # numpy and the cache are only loaded once the cache is enabled
+        from app.services.semantic_cache import normalize_query, template_fingerprint
+        # Retrieved chunks are part of the template, so knowledge base updates invalidate answers built on them;
+        # so are the options the client asked for (stop, sampling, num_predict). Caps and the latency budget
+        # are left out: they move with load, and the answers they truncate are not stored
+        template_context = "\n".join([request.context or ""] + (knowledge or []))
+        requested = request.options.model_dump(exclude_none=True, exclude={"latency_budget_ms"}) if request.options else {}
+        cache_scope = (template_fingerprint(request.rules, template_context, requested), model)
     
     active_requests.inc()
     try:
         with timer_context() as timer:
             with request_latency.labels(method="POST", endpoint="/chat/structured").time():
-                response = await ollama_client.generate(
-                    model=model,
-                    prompt=structured_prompt,
-                    stream=request.stream
-                )
+                query_vector = await embed_for_cache(services, request.query) if use_cache else None
+                hit = None
+                if query_vector is not None:
+                    hit, similarity = services.semantic_cache.lookup(cache_scope, query_vector)
+                    result = "hit" if hit else "miss"
+                    semantic_cache_lookups.labels(endpoint="/chat/structured", result=result).inc()
+                    semantic_cache_similarity.labels(result=result).observe(max(similarity, 0.0))
+                
+                if hit is None:
+                    response = await services.ollama_client.generate(
+                        model=model,
+                        prompt=prompt,
+                        options=options
+                    )
         
         request_counter.labels(method="POST", endpoint="/chat/structured", status="success").inc()
         
+        if hit is not None:
+            await record_completion(
+                services, "/chat/structured", request, model, arrival, "success", timer.duration_ms,
+                tenant=tenant, text=hit.entry.response
+            )
+            return ChatResponse(
+                response=hit.entry.response,
+                model=model,
+                duration_ms=timer.duration_ms,
+                cached=True
+            )
+        
+        services.generation_budget.observe(model, response)
+        response_text = response.get("response", "")
+        if query_vector is not None and response_text and response.get("done_reason") == "stop":
+            services.semantic_cache.store(cache_scope, query_vector, normalize_query(request.query), response_text)
+        await record_completion(services, "/chat/structured", request, model, arrival, "success", timer.duration_ms, response, tenant=tenant)
+        
         return ChatResponse(
-            response=response.get("response", ""),
+            response=response_text,
             model=model,
-            duration_ms=timer.duration_ms
+            duration_ms=timer.duration_ms,
+            **generation_stats(response)
         )
     
+    except LimiterOverloaded as e:
+        # Shed at the API: the queue in front of Ollama is full or too slow
+        error_counter.labels(error_type=type(e).__name__).inc()
+        request_counter.labels(method="POST", endpoint="/chat/structured", status="overloaded").inc()
+        await record_completion(services, "/chat/structured", request, model, arrival, "overloaded", (time.time() - arrival) * 1000, tenant=tenant)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
     except Exception as e:
         error_counter.labels(error_type=type(e).__name__).inc()
         request_counter.labels(method="POST", endpoint="/chat/structured", status="error").inc()
+        await record_completion(services, "/chat/structured", request, model, arrival, "error", (time.time() - arrival) * 1000, tenant=tenant)
         raise HTTPException(status_code=500, detail=f"Error communicating with Ollama: {str(e)}")
     
     finally:
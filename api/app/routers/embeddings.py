@@ -0,0 +1,75 @@
+import base64
+import sys
+from typing import List, Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from app.container import Container, get_container
+from app.services.adaptive_limiter import LimiterOverloaded
+from app.utils import fastjson
+from app.utils.timers import timer_context
+from app.metrics import request_counter, request_latency, active_requests, error_counter
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str]]
+    model: Optional[str] = None
+    # "float": JSON arrays of float32 values, "base64": little-endian float32 bytes
+    encoding_format: Literal["float", "base64"] = "float"
+
+
+class EmbeddingResponse(BaseModel):
+    embeddings: Union[List[List[float]], List[str]]
+    model: str
+    dimensions: int
+    duration_ms: float
+
+
+def encode_embedding(vector, encoding_format: str):
+    """Serialize a float32 array in the requested format"""
+    if encoding_format == "base64":
+        if sys.byteorder != "little":
+            vector = type(vector)(vector.typecode, vector)
+            vector.byteswap()
+        return base64.b64encode(vector.tobytes()).decode("ascii")
+    return vector.tolist()
+
+
+@router.post("/embeddings", response_model=EmbeddingResponse)
+async def embeddings(request: EmbeddingRequest, services: Container = Depends(get_container)):
+    """Compute embeddings through the micro-batcher"""
+    model = request.model or services.settings.embedding_model
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    if not texts:
+        raise HTTPException(status_code=422, detail="input must contain at least one text")
+
+    active_requests.inc()
+    try:
+        with timer_context() as timer:
+            with request_latency.labels(method="POST", endpoint="/embeddings").time():
+                vectors = await services.embedding_batcher.embed(model=model, texts=texts)
+
+        request_counter.labels(method="POST", endpoint="/embeddings", status="success").inc()
+
+        return EmbeddingResponse(
+            embeddings=[encode_embedding(vector, request.encoding_format) for vector in vectors],
+            model=model,
+            dimensions=len(vectors[0]) if vectors else 0,
+            duration_ms=timer.duration_ms
+        )
+
+    except LimiterOverloaded as e:
+        error_counter.labels(error_type=type(e).__name__).inc()
+        request_counter.labels(method="POST", endpoint="/embeddings", status="overloaded").inc()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    except Exception as e:
+        error_counter.labels(error_type=type(e).__name__).inc()
+        request_counter.labels(method="POST", endpoint="/embeddings", status="error").inc()
+        raise HTTPException(status_code=500, detail=f"Error communicating with Ollama: {str(e)}")
+
+    finally:
+        active_requests.dec()
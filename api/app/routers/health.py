@@ -1,9 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from app.services.ollama_client import OllamaClient
-from app.config import settings
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.container import Container, get_container
 
 router = APIRouter()
-ollama_client = OllamaClient(settings.ollama_url)
 
 
 @router.get("/health")
@@ -16,17 +14,35 @@ async def health_check():
 
 
 @router.get("/health/ollama")
-async def ollama_health_check():
+async def ollama_health_check(services: Container = Depends(get_container)):
     """Check Ollama service health"""
     try:
-        is_healthy = await ollama_client.check_health()
+        is_healthy = await services.ollama_client.check_health()
         if is_healthy:
             return {
                 "status": "healthy",
                 "service": "ollama",
-                "url": settings.ollama_url
+                "url": services.settings.ollama_url
             }
         else:
             raise HTTPException(status_code=503, detail="Ollama service is unhealthy")
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Failed to connect to Ollama: {str(e)}")
+
+
+@router.get("/health/startup")
+async def startup_report(request: Request):
+    """Duration of each startup phase and the services created so far"""
+    services: Container = request.app.state.container
+    report = dict(request.app.state.startup)
+    report["services"] = sorted(name for name in vars(services) if name != "settings")
+    return report
+
+
+@router.get("/health/memory")
+async def memory_status(services: Container = Depends(get_container)):
+    """Latest memory-pressure sample (level, usage ratios, loaded models, active mitigations)"""
+    if not services.settings.memory_monitor_enabled:
+        raise HTTPException(status_code=404, detail="Memory monitor is disabled")
+    monitor = services.memory_monitor
+    return monitor.snapshot or await monitor.check()
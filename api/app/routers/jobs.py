@@ -0,0 +1,143 @@
+import asyncio
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from pydantic import BaseModel, Field, ValidationError
+
+from app.container import Container, get_container
+from app.metrics import request_counter, request_latency, active_requests, error_counter
+from app.routers.chat import (
+    REQUEST_TYPES, StructuredChatRequest, generation_options, generation_stats, record_completion, structured_prompt
+)
+from app.routers.usage import current_tenant
+from app.services.adaptive_limiter import LimiterOverloaded
+from app.services.jobs import JOB_STATUSES, JobFailed, check_callback_url, public_job
+from app.utils import fastjson
+from app.utils.timers import timer_context
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+class JobSubmission(BaseModel):
+    type: Literal["chat", "structured"] = "chat"
+    # Body of the matching endpoint (/chat or /chat/structured); stream is ignored
+    request: Dict[str, Any]
+    # Receives the finished job as JSON (POST)
+    callback_url: Optional[str] = Field(None, pattern=r"^https?://")
+
+
+async def run_job(services: Container, job: Dict[str, Any]) -> Dict[str, Any]:
+    """One attempt of a job: the non-streamed generation path of its endpoint, with method "JOB" metrics"""
+    endpoint, model_class = REQUEST_TYPES[job["type"]]
+    request = model_class.model_validate(job["request"])
+    model = request.model or services.settings.ollama_model
+    if isinstance(request, StructuredChatRequest):
+        try:
+            prompt, _ = structured_prompt(services, request)
+        except HTTPException as e:
+            raise JobFailed(e.detail)
+    else:
+        prompt = request.prompt
+    options = generation_options(services, endpoint, request.options, model, prompt)
+
+    active_requests.inc()
+    try:
+        with timer_context() as timer:
+            with request_latency.labels(method="JOB", endpoint=endpoint).time():
+                response = await services.ollama_client.generate(model=model, prompt=prompt, options=options)
+
+        services.generation_budget.observe(model, response)
+        request_counter.labels(method="JOB", endpoint=endpoint, status="success").inc()
+        await record_completion(
+            services, endpoint, request, model, job["created_at"], "success", timer.duration_ms, response,
+            tenant=job["tenant"]
+        )
+        return {
+            "response": response.get("response", ""),
+            "model": model,
+            "duration_ms": timer.duration_ms,
+            **generation_stats(response)
+        }
+
+    except Exception as e:
+        status = "overloaded" if isinstance(e, LimiterOverloaded) else "error"
+        error_counter.labels(error_type=type(e).__name__).inc()
+        request_counter.labels(method="JOB", endpoint=endpoint, status=status).inc()
+        await record_completion(
+            services, endpoint, request, model, job["created_at"], status, timer.duration_ms, tenant=job["tenant"]
+        )
+        raise
+
+    finally:
+        active_requests.dec()
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    submission: JobSubmission,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=128),
+    tenant: str = Depends(current_tenant),
+    services: Container = Depends(get_container)
+):
+    """Queue a generation; poll GET /jobs/{id} or wait for the callback. Idempotency-Key makes retries safe."""
+    if not services.settings.jobs_enabled:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+    _, model_class = REQUEST_TYPES[submission.type]
+    try:
+        request = model_class.model_validate(submission.request)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    if submission.callback_url is not None:
+        queue = services.job_queue
+        try:
+            await check_callback_url(submission.callback_url, queue.callback_hosts, queue.callback_allow_private)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    job = await services.job_queue.submit(
+        tenant,
+        submission.type,
+        request.model_dump(exclude_none=True, exclude={"stream"}),
+        callback_url=submission.callback_url,
+        idempotency_key=idempotency_key
+    )
+    if not job["created"]:
+        # Same Idempotency-Key: the job queued by the first submission
+        response.status_code = 200
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return public_job(job)
+
+
+@router.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = None,
+    limit: int = 50,
+    tenant: str = Depends(current_tenant),
+    services: Container = Depends(get_container)
+):
+    """Latest jobs of the tenant"""
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=422, detail=f"status must be one of {', '.join(JOB_STATUSES)}")
+    jobs = await asyncio.to_thread(services.job_queue.store.list, tenant, status, min(max(limit, 1), 500))
+    return {"jobs": [public_job(job) for job in jobs]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, tenant: str = Depends(current_tenant), services: Container = Depends(get_container)):
+    """Status of a job, with its result once succeeded"""
+    job = await asyncio.to_thread(services.job_queue.store.get, job_id)
+    if job is None or job["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return public_job(job)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, tenant: str = Depends(current_tenant), services: Container = Depends(get_container)):
+    """Cancel a job that has not started yet"""
+    job = await asyncio.to_thread(services.job_queue.store.get, job_id)
+    if job is None or job["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not await asyncio.to_thread(services.job_queue.store.cancel, job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, only queued jobs can be cancelled")
+    return {"id": job_id, "status": "cancelled"}
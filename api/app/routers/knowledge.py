@@ -0,0 +1,75 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+from app.container import Container, get_container
+from app.utils import fastjson
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+class KnowledgeDocument(BaseModel):
+    id: str
+    text: str
+
+
+class KnowledgeUpdate(BaseModel):
+    documents: List[KnowledgeDocument]
+    # Only used when the knowledge base is created
+    chunk_chars: Optional[int] = Field(None, ge=50)
+
+
+@router.get("/knowledge")
+async def list_knowledge_bases(services: Container = Depends(get_container)):
+    """Registered knowledge bases and their index sizes"""
+    return {"knowledge_bases": services.knowledge.stats()}
+
+
+@router.post("/knowledge/{name}/documents")
+async def upsert_documents(name: str, update: KnowledgeUpdate, services: Container = Depends(get_container)):
+    """Create the knowledge base if needed and (re)index documents by id"""
+    try:
+        base = services.knowledge.get_or_create(name, update.chunk_chars)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    indexed = {document.id: base.upsert(document.id, document.text) for document in update.documents}
+    # Chunks per upserted document, then the totals of the knowledge base
+    return {"knowledge_base": name, "indexed": indexed, **base.stats()}
+
+
+@router.delete("/knowledge/{name}/documents/{document_id}")
+async def delete_document(name: str, document_id: str, services: Container = Depends(get_container)):
+    """Remove one document from the index"""
+    base = services.knowledge.get(name)
+    if base is None or not base.delete(document_id):
+        raise HTTPException(status_code=404, detail="Unknown knowledge base or document")
+    return {"knowledge_base": name, **base.stats()}
+
+
+@router.delete("/knowledge/{name}")
+async def delete_knowledge_base(name: str, services: Container = Depends(get_container)):
+    """Drop a knowledge base"""
+    if not services.knowledge.delete(name):
+        raise HTTPException(status_code=404, detail=f"Unknown knowledge base: {name}")
+    return {"deleted": name}
+
+
+@router.get("/knowledge/{name}/search")
+async def search(
+    name: str,
+    q: str,
+    top_k: int = 4,
+    services: Container = Depends(get_container)
+):
+    """Chunks that would be inserted in the prompt for a query, with their BM25 scores"""
+    base = services.knowledge.get(name)
+    if base is None:
+        raise HTTPException(status_code=404, detail=f"Unknown knowledge base: {name}")
+    return {
+        "knowledge_base": name,
+        "hits": [
+            {"document_id": hit.chunk.document_id, "score": round(hit.score, 4), "text": hit.chunk.text}
+            for hit in base.retrieve(q, top_k)
+        ]
+    }
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from app.container import Container, get_container
+from app.metrics import slo_latency, slo_compliance, slo_burn_rate
+from app.utils import fastjson
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+def export_slo_gauges(services: Container):
+    """Refresh the SLO gauges from the sketches (called at each /metrics scrape)"""
+    if not services.created("slo_tracker"):
+        return
+    nan = float("nan")
+    for series in services.slo_tracker.report()["series"]:
+        labels = {"endpoint": series["endpoint"], "model": series["model"]}
+        for window, summary in series["windows"].items():
+            for quantile in ("p50", "p90", "p95", "p99"):
+                value = summary[quantile]
+                slo_latency.labels(window=window, quantile=quantile, **labels).set(nan if value is None else value)
+            for objective, key in (("availability", "availability"), ("latency", "latency_compliance")):
+                value = summary[key]
+                burn = summary["burn_rate"][objective]
+                slo_compliance.labels(window=window, objective=objective, **labels).set(nan if value is None else value)
+                slo_burn_rate.labels(window=window, objective=objective, **labels).set(nan if burn is None else burn)
+
+
+@router.get("/slo")
+async def slo(endpoint: Optional[str] = None, services: Container = Depends(get_container)):
+    """SLO compliance, burn rates and latency quantiles per endpoint and model"""
+    return services.slo_tracker.report(endpoint)
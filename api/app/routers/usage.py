@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+
+from app.container import Container, get_container
+from app.services.usage import tenant_from_headers
+from app.utils import fastjson
+
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+
+async def current_tenant(
+    x_tenant_id: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None)
+) -> str:
+    """Tenant of the request (X-Tenant-ID, else hashed X-API-Key)"""
+    return tenant_from_headers(x_tenant_id, x_api_key)
+
+
+@router.get("/usage")
+async def usage(
+    tenant: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    by_model: bool = True,
+    services: Container = Depends(get_container)
+):
+    """Prompt tokens, generated tokens and backend seconds per tenant (and model)"""
+    rows = await services.usage_tracker.query(
+        tenant=tenant,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        group_by_model=by_model
+    )
+    return {"usage": rows}
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from contextlib import aclosing
+from functools import partial
+from typing import Any, Dict, Optional, Set, Union
+
+from fastapi import APIRouter, Depends, Header, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+
+from app.container import Container, get_container
+from app.metrics import memory_pressure_actions, websocket_connections, websocket_messages
+from app.routers.chat import (
+    REQUEST_TYPES, StructuredChatRequest, generation_events, generation_options, structured_prompt
+)
+from app.routers.usage import current_tenant
+from app.utils import fastjson
+
+router = APIRouter()
+
+
+class ChatSession:
+    """
+    One /ws/chat connection
+
+    Turns run as concurrent tasks keyed by the client's `id`, so several
+    generations can be in flight on the same socket; sends are serialized.
+    A turn goes through the same generation path as a streamed /chat call
+    (options, adaptive limiter, metrics, SLO, usage, audit), labelled with
+    method "WS". A turn leaves `turns` from its task's done callback, which
+    also reports cancellations: a turn cancelled before its first step never
+    runs its own code.
+
+    Admission matches /chat: batch-priority turns (the connection's
+    `X-Priority: batch` header, or `"priority": "batch"` in the message,
+    since browsers cannot set WebSocket headers) are refused while memory
+    pressure sheds batch traffic. Beyond `websocket_max_turns` per
+    connection, the shared Ollama limiter is the only other limit, as for
+    HTTP requests.
+    """
+
+    def __init__(self, websocket: WebSocket, services: Container, tenant: str, priority: Optional[str] = None):
+        self.websocket = websocket
+        self.services = services
+        self.tenant = tenant
+        self.priority = priority
+        self.turns: Dict[Union[str, int], asyncio.Task] = {}
+        self.closing = False
+        self._send_lock = asyncio.Lock()
+        self._notices: Set[asyncio.Task] = set()
+
+    async def send(self, message: Dict[str, Any]):
+        async with self._send_lock:
+            await self.websocket.send_text(fastjson.dumps(message).decode())
+
+    async def handle(self, raw: Union[str, bytes]):
+        """Dispatch one client message"""
+        try:
+            message = fastjson.loads(raw)
+        except ValueError:
+            websocket_messages.labels(type="invalid").inc()
+            await self.send({"type": "error", "error": "Invalid JSON"})
+            return
+        if not isinstance(message, dict):
+            websocket_messages.labels(type="invalid").inc()
+            await self.send({"type": "error", "error": "Messages must be JSON objects"})
+            return
+
+        kind = message.pop("type", "chat")
+        turn_id = message.pop("id", None)
+        priority = message.pop("priority", None) or self.priority
+        websocket_messages.labels(type=kind if kind in REQUEST_TYPES or kind in ("cancel", "ping") else "invalid").inc()
+
+        if kind == "ping":
+            await self.send({"type": "pong", "id": turn_id})
+        elif kind == "cancel":
+            task = self.turns.get(turn_id) if isinstance(turn_id, (str, int)) else None
+            if task is not None:
+                task.cancel()
+        elif kind in REQUEST_TYPES:
+            await self.start_turn(kind, turn_id, message, priority)
+        else:
+            await self.send({"type": "error", "id": turn_id, "error": f"Unknown message type: {kind}"})
+
+    async def start_turn(
+        self,
+        kind: str,
+        turn_id: Union[str, int, None],
+        payload: Dict[str, Any],
+        priority: Optional[str] = None
+    ):
+        if not isinstance(turn_id, (str, int)):
+            await self.send({"type": "error", "id": turn_id, "error": "Turns need a string or integer id"})
+            return
+        if turn_id in self.turns:
+            await self.send({"type": "error", "id": turn_id, "error": "A turn with this id is already running"})
+            return
+        if len(self.turns) >= self.services.settings.websocket_max_turns:
+            await self.send({"type": "error", "id": turn_id, "error": "Too many concurrent turns on this connection"})
+            return
+        if priority == "batch" and self.services.shedding_batch():
+            memory_pressure_actions.labels(action="reject_batch").inc()
+            await self.send({
+                "type": "error",
+                "id": turn_id,
+                "error": "Memory pressure: batch traffic is paused",
+                "retry_after": max(1, round(self.services.settings.memory_check_interval))
+            })
+            return
+
+        endpoint, model_class = REQUEST_TYPES[kind]
+        try:
+            request = model_class.model_validate(payload)
+        except ValidationError as e:
+            await self.send({
+                "type": "error",
+                "id": turn_id,
+                "error": "Invalid request",
+                "detail": e.errors(include_url=False, include_context=False)
+            })
+            return
+        task = asyncio.create_task(self.run_turn(turn_id, endpoint, request))
+        self.turns[turn_id] = task
+        task.add_done_callback(partial(self._turn_done, turn_id))
+
+    def _turn_done(self, turn_id: Union[str, int], task: asyncio.Task):
+        if self.turns.get(turn_id) is task:
+            del self.turns[turn_id]
+        if task.cancelled() and not self.closing:
+            notice = asyncio.create_task(self._notify_cancelled(turn_id))
+            self._notices.add(notice)
+            notice.add_done_callback(self._notices.discard)
+
+    async def _notify_cancelled(self, turn_id: Union[str, int]):
+        try:
+            await self.send({"type": "cancelled", "id": turn_id})
+        except (WebSocketDisconnect, RuntimeError):
+            # Connection already gone
+            pass
+
+    async def run_turn(self, turn_id: Union[str, int], endpoint: str, request: BaseModel):
+        """Stream one generation as token frames, ending with done, error or cancelled"""
+        services = self.services
+        model = request.model or services.settings.ollama_model
+        arrival = time.time()
+        if isinstance(request, StructuredChatRequest):
+            try:
+                prompt, _ = structured_prompt(services, request)
+            except HTTPException as e:
+                await self.send({"type": "error", "id": turn_id, "error": e.detail})
+                return
+        else:
+            prompt = request.prompt
+        options = generation_options(services, endpoint, request.options, model, prompt)
+
+        events = generation_events(
+            services, endpoint, model, prompt, request, arrival, options, self.tenant, method="WS"
+        )
+        try:
+            async with aclosing(events):
+                async for event in events:
+                    if "error" in event:
+                        await self.send({"type": "error", "id": turn_id, "error": event["error"]})
+                    elif event["done"]:
+                        del event["done"]
+                        await self.send({"type": "done", "id": turn_id, **event})
+                    else:
+                        await self.send({"type": "token", "id": turn_id, "response": event["response"]})
+        except WebSocketDisconnect:
+            pass
+        # A client cancel propagates: closing the events stopped the upstream generation,
+        # and _turn_done sends the "cancelled" frame
+
+    async def close(self):
+        """Cancel the turns still running (connection closed)"""
+        self.closing = True
+        turns = list(self.turns.values())
+        for task in turns:
+            task.cancel()
+        await asyncio.gather(*turns, *self._notices, return_exceptions=True)
+
+
+@router.websocket("/ws/chat")
+async def ws_chat(
+    websocket: WebSocket,
+    tenant: str = Depends(current_tenant),
+    x_priority: Optional[str] = Header(None),
+    services: Container = Depends(get_container)
+):
+    """
+    Multiplexed chat turns over one connection
+
+    Client: {"type": "chat", "id": ..., "prompt": ...} (fields of /chat),
+    {"type": "structured", "id": ..., "query": ...} (fields of /chat/structured),
+    {"type": "cancel", "id": ...}, {"type": "ping"}. Chat messages may carry
+    "priority": "batch".
+    Server: "token" frames, then one "done" (same fields as the final NDJSON
+    line), "error" or "cancelled" frame per turn.
+    """
+    await websocket.accept()
+    session = ChatSession(websocket, services, tenant, x_priority)
+    idle_timeout = services.settings.websocket_idle_timeout
+    websocket_connections.inc()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                if session.turns:
+                    continue
+                await websocket.close(code=1000, reason="Idle timeout")
+                break
+            if message["type"] == "websocket.disconnect":
+                break
+            # JSON is accepted in text and binary frames
+            await session.handle(message.get("text") or message.get("bytes") or "")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+        websocket_connections.dec()
@@ -0,0 +1,308 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+import httpx
+
+from app.metrics import (
+    concurrency_limit, concurrency_limit_adjustments, limiter_inflight, limiter_queue_depth,
+    limiter_queue_wait, limiter_rejections, model_load_time, model_swaps, scheduler_grants
+)
+
+
+class LimiterOverloaded(Exception):
+    """The limiter's queue is full or a request waited longer than allowed"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Ollama concurrency limit reached ({reason})")
+        self.reason = reason
+
+
+def is_overload_error(error: Exception) -> bool:
+    """Timeouts, connection failures and 5xx replies signal an overloaded backend"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def is_unknown_model_error(error: Exception) -> bool:
+    """Ollama answers 404 for a model it does not have"""
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 404
+
+
+class Permit:
+    """A granted slot; set `tokens` (or `failed`) and `load_duration` before it is released"""
+
+    def __init__(self, model: Optional[str]):
+        self.model = model
+        self.started = time.perf_counter()
+        self.tokens: Optional[int] = None
+        # Ollama's load_duration (ns) for this request
+        self.load_duration: Optional[int] = None
+        self.failed = False
+
+
+class Waiter:
+    """A queued request"""
+
+    def __init__(self, model: Optional[str]):
+        self.model = model
+        self.enqueued = time.perf_counter()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Adaptive limit on in-flight Ollama generations (and embedding calls)
+
+    Requests over the limit wait in a FIFO queue inside the API (bounded by
+    `max_queue` and `max_queue_wait`) instead of in Ollama's hidden queue.
+    The limit follows measured latency per output token:
+
+    - "gradient": limit scales with tolerance * baseline / recent latency,
+      plus `probe` slots to keep discovering capacity, smoothed;
+    - "aimd": +1/limit per fast success at full utilisation, multiplied by
+      `backoff` on slow replies or failures.
+
+    The queue is also model-aware. The limiter keeps track of the models
+    Ollama should have loaded (at most `max_loaded_models`, least recently
+    granted evicted first) and serves queued requests for those models ahead
+    of older ones for other models, so that same-model work runs in batches
+    instead of forcing a reload on every interleaved request. A request for
+    a model that is not loaded is held while every loaded model still has
+    generations in flight; it gets a slot as soon as one drains. Once the
+    oldest queued request has waited `swap_max_wait` seconds, it is served
+    next regardless of its model, which bounds starvation. `swap_max_wait=0`
+    restores plain FIFO. Embedding calls take slots too: their model counts
+    against `max_loaded_models` like any other, but they carry no token
+    count, so they do not move the latency-based limit.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 2,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        algorithm: str = "gradient",
+        max_queue: int = 256,
+        max_queue_wait: float = 60.0,
+        tolerance: float = 1.2,
+        probe: float = 1.0,
+        smoothing: float = 0.2,
+        backoff: float = 0.9,
+        max_loaded_models: int = 1,
+        swap_max_wait: float = 10.0,
+        enabled: bool = True
+    ):
+        if algorithm not in ("gradient", "aimd"):
+            raise ValueError(f"Unknown limiter algorithm: {algorithm}")
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.algorithm = algorithm
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.tolerance = tolerance
+        self.probe = probe
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.max_loaded_models = max(1, max_loaded_models)
+        self.swap_max_wait = swap_max_wait
+        self.enabled = enabled
+        self.inflight = 0
+        self._waiters: Deque[Waiter] = deque()
+        # Models expected to be loaded in Ollama, least recently granted first
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+        self._running: Counter = Counter()
+        # Model a grant evicted from _resident, restored if Ollama rejects the newcomer
+        self._displaced: Dict[str, str] = {}
+        # Models Ollama has served (or listed): others are labelled "other" in metrics
+        self.known_models: Set[str] = set()
+        self._baseline_rtt: Optional[float] = None
+        self._short_rtt: Optional[float] = None
+        concurrency_limit.set(self.current_limit)
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self, model: Optional[str] = None) -> Permit:
+        """Wait for a slot; raises LimiterOverloaded when the request should be shed"""
+        if self.enabled and (self._waiters or self.inflight >= self.current_limit or not self._can_start(model)):
+            if len(self._waiters) >= self.max_queue:
+                limiter_rejections.labels(reason="queue_full").inc()
+                raise LimiterOverloaded("queue_full")
+            waiter = Waiter(model)
+            self._waiters.append(waiter)
+            # Slots may be free: a request for a loaded model can pass queued ones
+            self._wake()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_queue_wait)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                limiter_rejections.labels(reason="timeout").inc()
+                raise LimiterOverloaded("timeout")
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+            finally:
+                limiter_queue_wait.observe(time.perf_counter() - waiter.enqueued)
+            # The slot was counted by _wake() when the waiter was granted
+        else:
+            self._grant(model, "direct")
+        limiter_inflight.set(self.inflight)
+        return Permit(model)
+
+    def _abandon(self, waiter: Waiter):
+        """Drop a waiter that gave up, handing back its slot if it was granted meanwhile"""
+        if waiter.future.done() and not waiter.future.cancelled():
+            self._finish(waiter.model)
+            self._wake()
+        else:
+            waiter.future.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        limiter_queue_depth.set(len(self._waiters))
+
+    def _can_start(self, model: Optional[str]) -> bool:
+        """Whether `model` can run now without evicting a model that is still generating"""
+        if not self.swap_max_wait or model is None or model in self._resident:
+            return True
+        return len(self._resident) < self.max_loaded_models or any(
+            not self._running[resident] for resident in self._resident
+        )
+
+    def _next_waiter(self) -> Tuple[Optional[Waiter], Optional[str]]:
+        """Queued request to serve next, with the reason it was picked"""
+        head = self._waiters[0]
+        if not self.swap_max_wait:
+            return head, "fifo"
+        if time.perf_counter() - head.enqueued >= self.swap_max_wait:
+            return head, "overdue"
+        for waiter in self._waiters:
+            if waiter.model is None or waiter.model in self._resident:
+                return waiter, "fifo" if waiter is head else "affinity"
+        # No queued work for a loaded model: load the oldest request's model once it fits
+        return (head, "load") if self._can_start(head.model) else (None, None)
+
+    def _grant(self, model: Optional[str], decision: str):
+        self.inflight += 1
+        scheduler_grants.labels(decision=decision).inc()
+        if model is None:
+            return
+        self._running[model] += 1
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return
+        if len(self._resident) >= self.max_loaded_models:
+            # Ollama evicts an idle model first, else waits for one to drain
+            idle = [resident for resident in self._resident if not self._running[resident]]
+            evicted = idle[0] if idle else next(iter(self._resident))
+            self._resident.pop(evicted)
+            self._displaced[model] = evicted
+            model_swaps.labels(model=self._label(model)).inc()
+        self._resident[model] = None
+
+    def _label(self, model: str) -> str:
+        """Metric label for `model`: client-supplied names must not create unbounded series"""
+        return model if model in self.known_models else "other"
+
+    def _finish(self, model: Optional[str]):
+        self.inflight -= 1
+        if model is not None:
+            self._running[model] -= 1
+            if not self._running[model]:
+                del self._running[model]
+
+    def _wake(self):
+        """Grant free slots to queued requests, same-model work first (see class docstring)"""
+        while self._waiters and self.inflight < self.current_limit:
+            if self._waiters[0].future.done():
+                self._waiters.popleft()
+                continue
+            waiter, decision = self._next_waiter()
+            if waiter is None:
+                break
+            self._waiters.remove(waiter)
+            self._grant(waiter.model, decision)
+            waiter.future.set_result(None)
+        limiter_queue_depth.set(len(self._waiters))
+        limiter_inflight.set(self.inflight)
+
+    def _reject(self, model: str):
+        """Ollama refused `model` (e.g. 404): it never loaded, so what it displaced is still resident"""
+        self._resident.pop(model, None)
+        displaced = self._displaced.pop(model, None)
+        if displaced is not None and displaced not in self._resident and len(self._resident) < self.max_loaded_models:
+            self._resident[displaced] = None
+            self._resident.move_to_end(displaced, last=False)
+
+    def forget(self, model: str):
+        """The model was unloaded outside the scheduler (keep_alive=0)"""
+        self._resident.pop(model, None)
+        self._wake()
+
+    def release(self, permit: Permit):
+        """Return a slot and adapt the limit from the request's latency"""
+        if self.enabled:
+            self._adjust(permit, time.perf_counter() - permit.started)
+        if permit.load_duration and permit.model is not None:
+            model_load_time.labels(model=self._label(permit.model)).inc(permit.load_duration / 1e9)
+        self._finish(permit.model)
+        self._wake()
+
+    def _adjust(self, permit: Permit, latency: float):
+        previous = self.current_limit
+        if permit.failed:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif permit.tokens:
+            # Latency per generated token: comparable across output lengths
+            sample = latency / permit.tokens
+            if self._baseline_rtt is None:
+                self._baseline_rtt = self._short_rtt = sample
+            self._short_rtt += 0.5 * (sample - self._short_rtt)
+            # Uncongested baseline: drops at once, rises slowly (e.g. after a model change)
+            self._baseline_rtt = min(sample, self._baseline_rtt + 0.01 * (sample - self._baseline_rtt))
+            if self.algorithm == "gradient":
+                self._adjust_gradient()
+            else:
+                self._adjust_aimd(sample)
+        self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+
+        current = self.current_limit
+        if current != previous:
+            concurrency_limit_adjustments.labels(direction="increase" if current > previous else "decrease").inc()
+        concurrency_limit.set(current)
+
+    def _adjust_gradient(self):
+        gradient = max(0.5, min(1.0, self.tolerance * self._baseline_rtt / self._short_rtt))
+        target = self.limit * gradient + self.probe
+        self.limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+
+    def _adjust_aimd(self, sample: float):
+        if sample > self.tolerance * self._baseline_rtt:
+            self.limit *= self.backoff
+        elif self.inflight >= self.current_limit:
+            self.limit += 1 / self.limit
+
+    @asynccontextmanager
+    async def slot(self, model: Optional[str] = None) -> AsyncIterator[Permit]:
+        """`async with limiter.slot(model) as permit:` around one generation"""
+        permit = await self.acquire(model)
+        try:
+            yield permit
+        except Exception as e:
+            permit.failed = is_overload_error(e)
+            if model is not None and not permit.failed and (is_unknown_model_error(e) or model not in self.known_models):
+                self._reject(model)
+            raise
+        else:
+            if model is not None:
+                self.known_models.add(model)
+                self._displaced.pop(model, None)
+        finally:
+            self.release(permit)
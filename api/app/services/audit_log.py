@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.metrics import audit_queue_depth, audit_records
+from app.utils.jsonl_writer import RotatingJsonlWriter
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling the writer to flush and stop
+_STOP = object()
+
+
+class AuditLog:
+    """
+    Asynchronous request/response audit log
+
+    Routers `submit` records into a bounded queue; a single background writer
+    drains it in batches of up to `batch_size` (waiting at most
+    `flush_interval` to fill one) and appends them to rotating gzip JSONL
+    files in a worker thread. When the queue is full, the "drop" policy
+    discards the record and the "block" policy waits up to `block_timeout`
+    before discarding it.
+    """
+
+    def __init__(
+        self,
+        writer: RotatingJsonlWriter,
+        enabled: bool = True,
+        max_queue: int = 10000,
+        policy: str = "drop",
+        block_timeout: float = 1.0,
+        batch_size: int = 500,
+        flush_interval: float = 1.0
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown audit log policy: {policy}")
+        self.writer = writer
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        """Start the writer on first use"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, record: Dict[str, Any]):
+        """Queue one record according to the full-queue policy"""
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        record.setdefault("ts", time.time())
+        try:
+            if self.policy == "block":
+                await asyncio.wait_for(self._queue.put(record), self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            audit_records.labels(result="dropped").inc()
+            return
+        audit_queue_depth.set(self._queue.qsize())
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch: List[Dict[str, Any]] = [item]
+            if self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+            stop = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            audit_queue_depth.set(self._queue.qsize())
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            await asyncio.to_thread(self.writer.write_batch, batch)
+            audit_records.labels(result="written").inc(len(batch))
+        except Exception as e:
+            audit_records.labels(result="failed").inc(len(batch))
+            logger.error("Failed to write %d audit records: %s", len(batch), e)
+
+    async def close(self):
+        """Write everything still queued, then stop the writer"""
+        if self._worker is None or self._worker.done():
+            return
+        # Queue the sentinel behind pending records, making room if the queue is full
+        while True:
+            try:
+                self._queue.put_nowait(_STOP)
+                break
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.01)
+        await self._worker
+        self._worker = None
+        audit_queue_depth.set(0)
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from app.metrics import embedding_batch_size, embedding_batch_wait
+from app.services.ollama_client import OllamaClient
+
+
+@dataclass
+class _PendingEmbedding:
+    """A single text waiting to be embedded"""
+    model: str
+    text: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batcher for Ollama embeddings
+
+    Concurrent callers enqueue texts; a background worker collects them for at
+    most `max_wait_ms` (or until `max_batch_size` texts are queued) and sends
+    them to Ollama in a single /api/embed call per model.
+    """
+
+    def __init__(self, client: OllamaClient, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.client = client
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def _ensure_worker(self):
+        """Start the batching worker on first use"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def embed(self, model: str, texts: List[str]) -> List[array]:
+        """Embed texts, sharing backend calls with concurrent callers"""
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait(_PendingEmbedding(model=model, text=text, future=future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self) -> List[_PendingEmbedding]:
+        """Wait for a first item, then gather more until the batch is full or the window closes"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain what is already queued without yielding to the event loop
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            remaining = deadline - time.perf_counter()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Worker loop: collect batches and dispatch them without blocking collection"""
+        while True:
+            batch = await self._collect()
+
+            by_model: Dict[str, List[_PendingEmbedding]] = {}
+            for item in batch:
+                by_model.setdefault(item.model, []).append(item)
+
+            for model, items in by_model.items():
+                task = asyncio.create_task(self._dispatch(model, items))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, model: str, items: List[_PendingEmbedding]):
+        """Send one batch to Ollama and resolve the waiting futures"""
+        now = time.perf_counter()
+        for item in items:
+            embedding_batch_wait.labels(model=model).observe(now - item.enqueued_at)
+
+        # Identical texts in the same window are embedded only once
+        unique_texts = list(dict.fromkeys(item.text for item in items))
+        embedding_batch_size.labels(model=model).observe(len(unique_texts))
+
+        try:
+            response = await self.client.embed(model=model, inputs=unique_texts)
+            vectors = response.get("embeddings", [])
+            if len(vectors) != len(unique_texts):
+                raise ValueError(
+                    f"Ollama returned {len(vectors)} embeddings for {len(unique_texts)} inputs"
+                )
+            by_text = {text: array('f', vector) for text, vector in zip(unique_texts, vectors)}
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item in items:
+            if not item.future.done():
+                item.future.set_result(by_text[item.text])
+
+    async def close(self):
+        """Stop the worker and wait for in-flight batches"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
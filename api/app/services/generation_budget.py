@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional
+
+from app.metrics import generation_tokens_per_second
+
+
+class GenerationBudget:
+    """
+    Live per-model generation rates for latency-budgeted requests
+
+    Keeps an exponentially weighted moving average of decode and prompt-eval
+    tokens/sec from Ollama's reply timings, and converts a latency budget
+    into the `num_predict` that should finish within it.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_tokens: int = 16, chars_per_token: float = 4.0):
+        self.alpha = alpha
+        self.min_tokens = min_tokens
+        self.chars_per_token = chars_per_token
+        self._rates: Dict[str, Dict[str, float]] = {}
+
+    def _update(self, model: str, kind: str, count: Optional[int], duration_ns: Optional[int]):
+        if not count or not duration_ns:
+            return
+        rate = count / (duration_ns / 1e9)
+        rates = self._rates.setdefault(model, {})
+        previous = rates.get(kind)
+        rates[kind] = rate if previous is None else previous + self.alpha * (rate - previous)
+        generation_tokens_per_second.labels(model=model, phase=kind).set(rates[kind])
+
+    def observe(self, model: str, response: Optional[Dict[str, Any]]):
+        """Fold the timings of a finished Ollama reply into the averages"""
+        if not response:
+            return
+        self._update(model, "decode", response.get("eval_count"), response.get("eval_duration"))
+        self._update(model, "prompt", response.get("prompt_eval_count"), response.get("prompt_eval_duration"))
+
+    def rate(self, model: str) -> Optional[float]:
+        """Current decode tokens/sec for a model, None before the first reply"""
+        return self._rates.get(model, {}).get("decode")
+
+    def num_predict_for(self, model: str, prompt: str, budget_ms: float) -> Optional[int]:
+        """Tokens that fit in `budget_ms` after prompt evaluation, None without live rates"""
+        rates = self._rates.get(model, {})
+        decode = rates.get("decode")
+        if decode is None:
+            return None
+        prompt_ms = 0.0
+        if rates.get("prompt"):
+            prompt_ms = len(prompt) / self.chars_per_token / rates["prompt"] * 1000
+        return max(self.min_tokens, int(decode * (budget_ms - prompt_ms) / 1000))
@@ -0,0 +1,454 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.metrics import (
+    job_callbacks, job_latency, jobs_oldest_queued_age, jobs_processed, jobs_queue_depth
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    idempotency_key TEXT,
+    type TEXT NOT NULL,
+    request TEXT NOT NULL,
+    callback_url TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_token TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    callback_status TEXT,
+    UNIQUE (tenant, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at, created_at);
+"""
+
+# Queued jobs that are due, and running jobs whose worker stopped renewing its lease
+_CLAIM = """
+UPDATE jobs
+SET status = 'running', attempts = attempts + 1, started_at = :now, lease_token = :token, lease_until = :lease_until
+WHERE id IN (
+    SELECT id FROM jobs
+    WHERE (status = 'queued' AND available_at <= :now) OR (status = 'running' AND lease_until < :now)
+    ORDER BY created_at
+    LIMIT :limit
+)
+RETURNING *
+"""
+
+
+class JobFailed(Exception):
+    """A job error that retrying cannot fix (e.g. invalid request)"""
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["request"] = json.loads(job["request"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobStore:
+    """
+    SQLite table of generation jobs
+
+    A job is claimed with a lease: the worker renews it while running, and
+    a job whose lease expired (worker crashed, API restarted) becomes
+    claimable again. Completion only applies with the current lease token,
+    so a job taken over by another worker is recorded once. Every method
+    opens its own connection and blocks; run them off the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._initialized = True
+        return connection
+
+    def _execute(self, sql: str, params=()) -> List[sqlite3.Row]:
+        connection = self._connect()
+        try:
+            with connection:
+                return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def create(
+        self,
+        tenant: str,
+        job_type: str,
+        request: Dict[str, Any],
+        max_attempts: int,
+        callback_url: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Insert a queued job; with a known idempotency key, return the existing job instead"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            with connection:
+                inserted = connection.execute(
+                    """INSERT INTO jobs (id, tenant, idempotency_key, type, request, callback_url, status,
+                                         max_attempts, created_at, available_at)
+                       VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)
+                       ON CONFLICT (tenant, idempotency_key) DO NOTHING
+                       RETURNING *""",
+                    (uuid.uuid4().hex, tenant, idempotency_key, job_type, json.dumps(request),
+                     callback_url, max_attempts, now, now)
+                ).fetchall()
+                if inserted:
+                    return dict(_decode(inserted[0]), created=True)
+                existing = connection.execute(
+                    "SELECT * FROM jobs WHERE tenant = ? AND idempotency_key = ?", (tenant, idempotency_key)
+                ).fetchone()
+                return dict(_decode(existing), created=False)
+        finally:
+            connection.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return _decode(rows[0]) if rows else None
+
+    def list(self, tenant: str, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        if status is None:
+            rows = self._execute(
+                "SELECT * FROM jobs WHERE tenant = ? ORDER BY created_at DESC LIMIT ?", (tenant, limit)
+            )
+        else:
+            rows = self._execute(
+                "SELECT * FROM jobs WHERE tenant = ? AND status = ? ORDER BY created_at DESC LIMIT ?",
+                (tenant, status, limit)
+            )
+        return [_decode(row) for row in rows]
+
+    def claim(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Atomically take up to `limit` due jobs (one UPDATE ... RETURNING, safe across processes)"""
+        now = time.time()
+        rows = self._execute(_CLAIM, {
+            "now": now,
+            "token": uuid.uuid4().hex,
+            "lease_until": now + lease_seconds,
+            "limit": limit
+        })
+        return sorted((_decode(row) for row in rows), key=lambda job: job["created_at"])
+
+    def renew(self, tokens: List[str], lease_seconds: float):
+        if tokens:
+            self._execute(
+                f"UPDATE jobs SET lease_until = ? WHERE status = 'running' AND lease_token IN ({','.join('?' * len(tokens))})",
+                [time.time() + lease_seconds, *tokens]
+            )
+
+    def finish(self, job_id: str, token: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None) -> bool:
+        """Record the outcome of a claimed job; False if the lease was lost meanwhile"""
+        rows = self._execute(
+            """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_token = NULL, lease_until = NULL
+               WHERE id = ? AND lease_token = ? RETURNING id""",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, token)
+        )
+        return bool(rows)
+
+    def retry(self, job_id: str, token: str, error: str, delay: float) -> bool:
+        """Put a failed attempt back in the queue after `delay` seconds"""
+        rows = self._execute(
+            """UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_token = NULL, lease_until = NULL
+               WHERE id = ? AND lease_token = ? RETURNING id""",
+            (error, time.time() + delay, job_id, token)
+        )
+        return bool(rows)
+
+    def release(self, job_id: str, token: str):
+        """Requeue an interrupted job without counting the attempt (graceful shutdown)"""
+        self._execute(
+            """UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_token = NULL, lease_until = NULL
+               WHERE id = ? AND lease_token = ?""",
+            (job_id, token)
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started"""
+        rows = self._execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued' RETURNING id",
+            (time.time(), job_id)
+        )
+        return bool(rows)
+
+    def set_callback_status(self, job_id: str, callback_status: str):
+        self._execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (callback_status, job_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Job count per status and age of the oldest due queued job"""
+        now = time.time()
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        oldest = self._execute(
+            "SELECT MIN(created_at) FROM jobs WHERE status = 'queued' AND available_at <= ?", (now,)
+        )[0][0]
+        return {
+            "counts": {status: counts.get(status, 0) for status in JOB_STATUSES},
+            "oldest_queued_age": now - oldest if oldest is not None else 0.0
+        }
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs older than an epoch timestamp"""
+        rows = self._execute(
+            """DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?
+               RETURNING id""",
+            (older_than,)
+        )
+        return len(rows)
+
+
+Runner = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def parse_hosts(spec: str) -> List[str]:
+    """'hooks.example.org, .example.net' -> ['hooks.example.org', '.example.net']"""
+    return [host.strip().lower() for host in spec.split(",") if host.strip()]
+
+
+def host_allowed(host: str, allowed_hosts: Sequence[str]) -> bool:
+    """Exact match, or subdomain match for entries starting with a dot (empty list: any host)"""
+    if not allowed_hosts:
+        return True
+    return any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in allowed_hosts)
+
+
+async def check_callback_url(url: str, allowed_hosts: Sequence[str] = (), allow_private: bool = False):
+    """
+    Raise ValueError unless the API may POST to `url`
+
+    The host must be in `allowed_hosts` (when set) and, unless
+    `allow_private`, every address it resolves to must be public: loopback,
+    private, link-local (cloud metadata) and reserved ranges would let
+    clients reach internal services such as Ollama through the callback.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+    if not host_allowed(host, allowed_hosts):
+        raise ValueError(f"callback host {host} is not allowed")
+    if allow_private:
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parts.port, proto=6)
+    except OSError:
+        raise ValueError(f"callback host {host} does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"callback host {host} resolves to a non-public address")
+
+
+class JobQueue:
+    """
+    Background workers draining the job store
+
+    A dispatcher claims due jobs while fewer than `concurrency` run in this
+    process, renews their leases, and refreshes the queue metrics. Failed
+    attempts are requeued with exponential backoff until `max_attempts`;
+    `JobFailed` errors fail the job at once. Finished jobs are POSTed to
+    their callback URL, if any. While `paused()` returns true (memory
+    pressure), no new job is claimed; running ones finish normally.
+    Callback URLs are checked again (`check_callback_url`) before delivery,
+    since a host may resolve elsewhere by then.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+        retry_delay: float = 5.0,
+        retention_seconds: float = 86400.0,
+        callback_timeout: float = 10.0,
+        callback_hosts: Sequence[str] = (),
+        callback_allow_private: bool = False,
+        enabled: bool = True,
+        paused: Optional[Callable[[], bool]] = None
+    ):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.retention_seconds = retention_seconds
+        self.callback_timeout = callback_timeout
+        self.callback_hosts = list(callback_hosts)
+        self.callback_allow_private = callback_allow_private
+        self.enabled = enabled
+        self.paused = paused or (lambda: False)
+        self._runner: Optional[Runner] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._tokens: Dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+        self._callbacks: Optional[httpx.AsyncClient] = None
+
+    async def submit(self, tenant: str, job_type: str, request: Dict[str, Any], callback_url: Optional[str] = None,
+                     idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        job = await asyncio.to_thread(
+            self.store.create, tenant, job_type, request, self.max_attempts, callback_url, idempotency_key
+        )
+        if job["created"]:
+            self._wakeup.set()
+        return job
+
+    def start(self, runner: Runner):
+        """Start the dispatcher (jobs left by a previous process are picked up once their lease expires)"""
+        if not self.enabled or self._dispatcher is not None:
+            return
+        self._runner = runner
+        self._callbacks = httpx.AsyncClient(timeout=self.callback_timeout)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        last_renewal = last_purge = time.monotonic()
+        while True:
+            try:
+                now = time.monotonic()
+                if now - last_renewal >= self.lease_seconds / 3:
+                    await asyncio.to_thread(self.store.renew, list(self._tokens.values()), self.lease_seconds)
+                    last_renewal = now
+                if now - last_purge >= 3600:
+                    await asyncio.to_thread(self.store.purge, time.time() - self.retention_seconds)
+                    last_purge = now
+
+                free = self.concurrency - len(self._running)
+                if free > 0 and not self.paused():
+                    for job in await asyncio.to_thread(self.store.claim, free, self.lease_seconds):
+                        self._tokens[job["id"]] = job["lease_token"]
+                        self._running[job["id"]] = asyncio.create_task(self._run(job))
+                await self._export_stats()
+            except Exception as e:
+                logger.error("Job dispatcher error: %s", e)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _export_stats(self):
+        stats = await asyncio.to_thread(self.store.stats)
+        for status in ("queued", "running"):
+            jobs_queue_depth.labels(status=status).set(stats["counts"][status])
+        jobs_oldest_queued_age.set(stats["oldest_queued_age"])
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id, token = job["id"], job["lease_token"]
+        started = time.time()
+        job_latency.labels(phase="queue_wait").observe(max(0.0, started - job["available_at"]))
+        try:
+            if job["attempts"] > job["max_attempts"]:
+                # Reclaimed after lease expiries only: its workers keep dying
+                raise JobFailed("Lease expired on every attempt")
+            result = await self._runner(job)
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back without spending an attempt
+            await asyncio.to_thread(self.store.release, job_id, token)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, JobFailed) or job["attempts"] >= job["max_attempts"]:
+                await asyncio.to_thread(self.store.finish, job_id, token, "failed", None, error)
+                jobs_processed.labels(status="failed").inc()
+                await self._callback(job_id)
+            else:
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                await asyncio.to_thread(self.store.retry, job_id, token, error, delay)
+                jobs_processed.labels(status="retried").inc()
+        else:
+            if await asyncio.to_thread(self.store.finish, job_id, token, "succeeded", result):
+                jobs_processed.labels(status="succeeded").inc()
+                job_latency.labels(phase="run").observe(time.time() - started)
+                job_latency.labels(phase="total").observe(time.time() - job["created_at"])
+                await self._callback(job_id)
+        finally:
+            self._running.pop(job_id, None)
+            self._tokens.pop(job_id, None)
+            self._wakeup.set()
+
+    async def _callback(self, job_id: str):
+        """POST the finished job to its callback URL (3 attempts)"""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or not job["callback_url"]:
+            return
+        try:
+            await check_callback_url(job["callback_url"], self.callback_hosts, self.callback_allow_private)
+        except ValueError as e:
+            logger.warning("Callback for job %s rejected: %s", job_id, e)
+            job_callbacks.labels(result="rejected").inc()
+            await asyncio.to_thread(self.store.set_callback_status, job_id, "rejected")
+            return
+        body = public_job(job)
+        for attempt in range(3):
+            try:
+                response = await self._callbacks.post(job["callback_url"], json=body)
+                response.raise_for_status()
+                status = "delivered"
+                break
+            except Exception as e:
+                status = "failed"
+                logger.warning("Callback for job %s failed (attempt %d): %s", job_id, attempt + 1, e)
+                if attempt < 2:
+                    await asyncio.sleep(2 ** attempt)
+        job_callbacks.labels(result=status).inc()
+        await asyncio.to_thread(self.store.set_callback_status, job_id, status)
+
+    async def close(self):
+        """Stop claiming, requeue the jobs still running here"""
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *running, return_exceptions=True)
+        self._dispatcher = None
+        await self._callbacks.aclose()
+
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields returned to clients (no lease bookkeeping)"""
+    return {
+        key: job.get(key)
+        for key in ("id", "status", "type", "attempts", "max_attempts", "created_at", "started_at",
+                    "finished_at", "result", "error", "callback_url", "callback_status")
+    }
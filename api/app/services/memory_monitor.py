@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.metrics import (
+    loaded_model_memory, memory_cgroup, memory_pressure_actions, memory_pressure_level,
+    memory_pressure_stall, memory_process_rss
+)
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("normal", "warning", "critical")
+
+CGROUP_V2 = "/sys/fs/cgroup"
+CGROUP_V1 = "/sys/fs/cgroup/memory"
+# cgroup v1 reports "no limit" as a huge page-aligned number
+_V1_UNLIMITED = 1 << 60
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def read_process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux /proc)"""
+    status = _read("/proc/self/status")
+    if status is None:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def read_cgroup_memory() -> Optional[Dict[str, Optional[int]]]:
+    """
+    Usage, working set and limit of the container's memory cgroup (v2, else v1)
+
+    The working set (usage minus inactive page cache) is what the OOM killer
+    and kubelet/cAdvisor look at; reclaimable cache does not count.
+    """
+    usage = _read(f"{CGROUP_V2}/memory.current")
+    if usage is not None:
+        limit = (_read(f"{CGROUP_V2}/memory.max") or "max").strip()
+        stat_path, inactive_key = f"{CGROUP_V2}/memory.stat", "inactive_file"
+        limit_bytes = None if limit == "max" else int(limit)
+    else:
+        usage = _read(f"{CGROUP_V1}/memory.usage_in_bytes")
+        if usage is None:
+            return None
+        limit_bytes = int((_read(f"{CGROUP_V1}/memory.limit_in_bytes") or "0").strip() or 0)
+        limit_bytes = limit_bytes if 0 < limit_bytes < _V1_UNLIMITED else None
+        stat_path, inactive_key = f"{CGROUP_V1}/memory.stat", "total_inactive_file"
+
+    usage_bytes = int(usage.strip())
+    inactive = 0
+    for line in (_read(stat_path) or "").splitlines():
+        key, _, value = line.partition(" ")
+        if key == inactive_key:
+            inactive = int(value)
+            break
+    return {"usage": usage_bytes, "working_set": max(0, usage_bytes - inactive), "limit": limit_bytes}
+
+
+def read_memory_stall() -> Optional[float]:
+    """Share of the last 10 s some task waited on memory (PSI 'some avg10', percent)"""
+    for path in (f"{CGROUP_V2}/memory.pressure", "/proc/pressure/memory"):
+        pressure = _read(path)
+        if pressure is None:
+            continue
+        for line in pressure.splitlines():
+            if line.startswith("some "):
+                fields = dict(item.split("=") for item in line.split()[1:])
+                return float(fields["avg10"])
+    return None
+
+
+class MemoryMonitor:
+    """
+    Periodic memory-pressure check of the API container and of Ollama
+
+    Samples the process RSS, the container cgroup and the models loaded in
+    Ollama (/api/ps, compared with `ollama_memory_limit`). The pressure is
+    the highest usage ratio: from `warning_ratio`, idle models are unloaded
+    and every generation runs with `num_ctx = num_ctx_cap`; from
+    `critical_ratio`, batch-priority traffic is shed (jobs paused, requests
+    sent with `X-Priority: batch` rejected). Actions stop once the ratio is
+    `recovery_margin` below the threshold that triggered them.
+    """
+
+    def __init__(
+        self,
+        ollama_client,
+        interval: float = 5.0,
+        warning_ratio: float = 0.85,
+        critical_ratio: float = 0.95,
+        recovery_margin: float = 0.05,
+        ollama_memory_limit: Optional[int] = None,
+        unload_idle_seconds: float = 300.0,
+        protected_model: Optional[str] = None,
+        num_ctx_cap: Optional[int] = 2048,
+        shed_batch: bool = True,
+        enabled: bool = True
+    ):
+        self.ollama_client = ollama_client
+        self.interval = interval
+        self.warning_ratio = warning_ratio
+        self.critical_ratio = critical_ratio
+        self.recovery_margin = recovery_margin
+        self.ollama_memory_limit = ollama_memory_limit
+        self.unload_idle_seconds = unload_idle_seconds
+        self.protected_model = protected_model
+        self.num_ctx_cap_value = num_ctx_cap
+        self.shed_batch_enabled = shed_batch
+        self.enabled = enabled
+        self.level = "normal"
+        self.snapshot: Dict[str, Any] = {}
+        # When each loaded model was first seen in /api/ps: the idle clock of models
+        # this process never used (loaded by warmup or another replica)
+        self.first_seen: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def num_ctx_cap(self) -> Optional[int]:
+        """num_ctx applied to every generation right now (None: no pressure cap)"""
+        return self.num_ctx_cap_value if self.level != "normal" else None
+
+    @property
+    def shed_batch(self) -> bool:
+        return self.shed_batch_enabled and self.level == "critical"
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error("Memory check failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def _loaded_models(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        try:
+            running = await self.ollama_client.list_running()
+        except Exception as e:
+            logger.warning("Ollama /api/ps unavailable: %s", e)
+            return None
+        return {model.get("name") or model.get("model"): model for model in running.get("models", [])}
+
+    async def check(self) -> Dict[str, Any]:
+        """Sample memory, update the pressure level and act on it"""
+        rss, cgroup, stall = await asyncio.to_thread(
+            lambda: (read_process_rss(), read_cgroup_memory(), read_memory_stall())
+        )
+        models = await self._loaded_models()
+        if models is not None:
+            now = time.monotonic()
+            self.first_seen = {name: self.first_seen.get(name, now) for name in models}
+
+        ratios: Dict[str, float] = {}
+        if cgroup is not None and cgroup["limit"]:
+            ratios["api"] = cgroup["working_set"] / cgroup["limit"]
+        ollama_bytes = sum(model.get("size", 0) for model in (models or {}).values())
+        if models is not None and self.ollama_memory_limit:
+            ratios["ollama"] = ollama_bytes / self.ollama_memory_limit
+        ratio = max(ratios.values(), default=0.0)
+
+        previous = self.level
+        self.level = self._level(ratio)
+        if self.level != previous:
+            logger.warning("Memory pressure %s -> %s (%.0f%%)", previous, self.level, ratio * 100)
+            if previous == "normal" and self.num_ctx_cap_value:
+                memory_pressure_actions.labels(action="num_ctx_cap").inc()
+            if self.shed_batch:
+                memory_pressure_actions.labels(action="shed_batch").inc()
+        if self.level != "normal" and models:
+            await self._unload_idle(models)
+
+        self.snapshot = {
+            "level": self.level,
+            "ratio": round(ratio, 4),
+            "ratios": {name: round(value, 4) for name, value in ratios.items()},
+            "process_rss_bytes": rss,
+            "cgroup": cgroup,
+            "memory_stall_avg10": stall,
+            "ollama_models": {name: model.get("size", 0) for name, model in (models or {}).items()},
+            "num_ctx_cap": self.num_ctx_cap,
+            "shed_batch": self.shed_batch
+        }
+        self._export(rss, cgroup, stall, models)
+        return self.snapshot
+
+    def _level(self, ratio: float) -> str:
+        """New level, leaving a level only once `recovery_margin` below its threshold"""
+        if ratio >= self.critical_ratio:
+            return "critical"
+        if self.level == "critical" and ratio >= self.critical_ratio - self.recovery_margin:
+            return "critical"
+        if ratio >= self.warning_ratio:
+            return "warning"
+        if self.level != "normal" and ratio >= self.warning_ratio - self.recovery_margin:
+            return "warning"
+        return "normal"
+
+    async def _unload_idle(self, models: Dict[str, Dict[str, Any]]):
+        now = time.monotonic()
+        for name in list(models):
+            if name == self.protected_model and self.level != "critical":
+                continue
+            if self.ollama_client.inflight.get(name):
+                continue
+            # Reloaded elsewhere since this process last used it: idle since it reappeared
+            last_used = max(self.ollama_client.last_used.get(name, 0.0), self.first_seen.get(name, now))
+            if now - last_used < self.unload_idle_seconds:
+                continue
+            try:
+                await self.ollama_client.unload(name)
+            except Exception as e:
+                logger.warning("Failed to unload %s: %s", name, e)
+                continue
+            logger.warning("Unloaded idle model %s under memory pressure", name)
+            memory_pressure_actions.labels(action="unload").inc()
+            models.pop(name)
+
+    def _export(self, rss, cgroup, stall, models):
+        nan = float("nan")
+        memory_process_rss.set(nan if rss is None else rss)
+        for kind in ("usage", "working_set", "limit"):
+            value = cgroup.get(kind) if cgroup else None
+            memory_cgroup.labels(kind=kind).set(nan if value is None else value)
+        memory_pressure_stall.set(nan if stall is None else stall)
+        memory_pressure_level.set(LEVELS.index(self.level))
+        if models is not None:
+            loaded_model_memory.clear()
+            for name, model in models.items():
+                loaded_model_memory.labels(model=name).set(model.get("size", 0))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
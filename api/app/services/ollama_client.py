@@ -1,15 +1,44 @@
 import httpx
-from typing import Dict, Any, Optional
-from app.config import settings
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional
+from app.services.adaptive_limiter import AdaptiveConcurrencyLimiter, LimiterOverloaded
+from app.utils import fastjson
 from app.utils.retry import retry_with_backoff
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class OllamaClient:
     """Client for communicating with Ollama API"""
     
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        timeout: float = 300,
+        max_retries: int = 3,
+        retry_delay: float = 1
+    ):
         self.base_url = base_url.rstrip('/')
-        self.client = httpx.AsyncClient(timeout=settings.api_timeout)
+        self.client = httpx.AsyncClient(timeout=timeout)
+        # Read by @retry_with_backoff on each call
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Clients sharing the application's limiter receive it from the container
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(enabled=False)
+        # Per-model activity, so idle models can be told apart (memory monitor)
+        self.inflight: Dict[str, int] = {}
+        self.last_used: Dict[str, float] = {}
+    
+    @contextmanager
+    def _using(self, model: str) -> Iterator[None]:
+        self.inflight[model] = self.inflight.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.inflight[model] -= 1
+            self.last_used[model] = time.monotonic()
     
     async def check_health(self) -> bool:
         """Check if Ollama service is available"""
@@ -19,7 +48,7 @@ class OllamaClient:
         except Exception:
             return False
     
-    @retry_with_backoff(max_retries=settings.max_retries, delay=settings.retry_delay)
+    @retry_with_backoff(max_retries=None, delay=None, no_retry=(LimiterOverloaded,))
     async def generate(
         self,
         model: str,
@@ -37,19 +66,109 @@ class OllamaClient:
         if options:
             payload["options"] = options
         
-        response = await self.client.post(
-            f"{self.base_url}/api/generate",
-            json=payload
-        )
-        response.raise_for_status()
-        return response.json()
+        async with self.limiter.slot(model) as permit:
+            with self._using(model):
+                response = await self.client.post(
+                    f"{self.base_url}/api/generate",
+                    content=fastjson.dumps(payload),
+                    headers=JSON_HEADERS
+                )
+            response.raise_for_status()
+            if stream:
+                # Aggregate an NDJSON reply into a single response
+                chunks = [fastjson.decode_ollama(line) for line in response.content.splitlines() if line.strip()]
+                if not chunks:
+                    return {}
+                final = dict(chunks[-1])
+                final["response"] = "".join(chunk.get("response", "") for chunk in chunks)
+            else:
+                final = fastjson.decode_ollama(response.content)
+            permit.tokens = final.get("eval_count")
+            permit.load_duration = final.get("load_duration")
+            return final
+    
+    async def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream response chunks from Ollama as they are generated"""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        
+        if options:
+            payload["options"] = options
+        
+        async with self.limiter.slot(model) as permit:
+            with self._using(model):
+                async with self.client.stream(
+                    "POST",
+                    f"{self.base_url}/api/generate",
+                    content=fastjson.dumps(payload),
+                    headers=JSON_HEADERS
+                ) as response:
+                    response.raise_for_status()
+                    async for chunk in fastjson.iter_ndjson(response.aiter_bytes()):
+                        if chunk.get("done"):
+                            permit.tokens = chunk.get("eval_count")
+                            permit.load_duration = chunk.get("load_duration")
+                        yield chunk
+    
+    @retry_with_backoff(max_retries=None, delay=None, no_retry=(LimiterOverloaded,))
+    async def embed(
+        self,
+        model: str,
+        inputs: List[str],
+        truncate: bool = True
+    ) -> Dict[str, Any]:
+        """Compute embeddings for a batch of texts in a single backend call"""
+        payload = {
+            "model": model,
+            "input": inputs,
+            "truncate": truncate
+        }
+        
+        # Same scheduler as generations: loading the embedding model evicts the chat model
+        async with self.limiter.slot(model) as permit:
+            with self._using(model):
+                response = await self.client.post(
+                    f"{self.base_url}/api/embed",
+                    content=fastjson.dumps(payload),
+                    headers=JSON_HEADERS
+                )
+            response.raise_for_status()
+            result = fastjson.loads(response.content)
+            permit.load_duration = result.get("load_duration")
+        return result
     
     async def list_models(self) -> Dict[str, Any]:
         """List available models"""
         response = await self.client.get(f"{self.base_url}/api/tags")
         response.raise_for_status()
+        models = response.json()
+        self.limiter.known_models.update(model["name"] for model in models.get("models", []) if "name" in model)
+        return models
+    
+    async def list_running(self) -> Dict[str, Any]:
+        """Models currently loaded in memory (/api/ps)"""
+        response = await self.client.get(f"{self.base_url}/api/ps")
+        response.raise_for_status()
         return response.json()
     
+    async def unload(self, model: str) -> None:
+        """Ask Ollama to unload a model now (empty prompt with keep_alive 0)"""
+        response = await self.client.post(
+            f"{self.base_url}/api/generate",
+            content=fastjson.dumps({"model": model, "keep_alive": 0}),
+            headers=JSON_HEADERS
+        )
+        response.raise_for_status()
+        self.limiter.forget(model)
+    
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
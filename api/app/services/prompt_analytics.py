@@ -0,0 +1,272 @@
+import hashlib
+import math
+import re
+import time
+import unicodedata
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_NUMBER = re.compile(r"\d+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, unicode form, punctuation and spacing folded: trivially different prompts count as one"""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    return " ".join(_WORD.findall(text.casefold()))
+
+
+def prompt_template(normalized: str) -> str:
+    """A normalized prompt with its numbers masked (ids, dates, amounts vary inside one template)"""
+    return _NUMBER.sub("0", normalized)
+
+
+def fingerprint(*parts: Optional[str]) -> int:
+    """Stable 64-bit hash of the parts (the same in every worker and across restarts)"""
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return int.from_bytes(digest.digest(), "little")
+
+
+class CountMinSketch:
+    """
+    Frequency estimates in `width * depth` counters
+
+    Each row is indexed by its own slice of bits of a 64-bit fingerprint
+    (width is rounded up to a power of two). Updates are conservative (only
+    the counters at the current minimum are raised), which keeps the
+    overestimation of rare keys low. Estimates never undercount.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        bits = max(1, (width - 1).bit_length())
+        if bits * depth > 64:
+            raise ValueError("width * depth needs more than the 64 bits of a fingerprint")
+        self.width = 1 << bits
+        self.depth = depth
+        self._mask = self.width - 1
+        self._shifts = [bits * i for i in range(depth)]
+        self.rows = [array("Q", bytes(8 * self.width)) for _ in range(depth)]
+
+    def _cells(self, key: int) -> List[int]:
+        mask = self._mask
+        return [(key >> shift) & mask for shift in self._shifts]
+
+    def add(self, key: int) -> int:
+        """Count one occurrence; returns the new estimate"""
+        cells = self._cells(key)
+        rows = self.rows
+        estimate = min([row[cell] for row, cell in zip(rows, cells)]) + 1
+        for row, cell in zip(rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def estimate(self, key: int) -> int:
+        return min([row[cell] for row, cell in zip(self.rows, self._cells(key))])
+
+
+class TopK:
+    """The `k` keys with the highest count-min estimates, with a sample of each"""
+
+    def __init__(self, k: int = 50):
+        self.k = k
+        self.items: Dict[int, List[Any]] = {}
+        # Lowest tracked count, refreshed only when an entry is evicted
+        self._floor = 0
+
+    def offer(self, key: int, count: int, sample: Optional[str]):
+        item = self.items.get(key)
+        if item is not None:
+            item[0] = count
+            return
+        if len(self.items) >= self.k:
+            if count <= self._floor:
+                return
+            smallest = min(self.items, key=lambda tracked: self.items[tracked][0])
+            if count <= self.items[smallest][0]:
+                self._floor = self.items[smallest][0]
+                return
+            del self.items[smallest]
+        self.items[key] = [count, sample]
+        if len(self.items) >= self.k:
+            self._floor = min(item[0] for item in self.items.values())
+
+    def top(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        ranked = sorted(self.items.items(), key=lambda entry: entry[1][0], reverse=True)[:limit]
+        return [{"fingerprint": f"{key:016x}", "count": count, "sample": sample} for key, (count, sample) in ranked]
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**precision one-byte registers (about 1.04/sqrt(m) relative error)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key: int):
+        bits = 64 - self.precision
+        index = key >> bits
+        rank = bits - (key & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+def hit_rates(top: Sequence[Dict[str, Any]], requests: int, distinct: int, cache_sizes: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    Estimated hit rate of an exact-match cache holding the `size` most frequent prompts
+
+    The first occurrence of each cached prompt is a miss. Beyond the tracked
+    top entries the figure is a lower bound, capped by the share of repeats
+    (`1 - distinct / requests`, what an unbounded cache would reach).
+    """
+    rates = []
+    for size in cache_sizes:
+        hits = sum(entry["count"] - 1 for entry in top[:size])
+        ceiling = max(0, requests - distinct)
+        exact = size <= len(top)
+        if size >= distinct:
+            hits, exact = ceiling, True
+        rates.append({
+            "cache_size": size,
+            "hit_rate": round(min(hits, ceiling) / requests, 4) if requests else 0.0,
+            "lower_bound": not exact
+        })
+    return rates
+
+
+class Window:
+    """Sketches of one time window"""
+
+    def __init__(self, start: float, width: int, depth: int, top_k: int, precision: int):
+        self.start = start
+        self.requests = 0
+        self.endpoints: Dict[str, int] = {}
+        self.prompt_counts = CountMinSketch(width, depth)
+        self.template_counts = CountMinSketch(width, depth)
+        self.top_prompts = TopK(top_k)
+        self.top_templates = TopK(top_k)
+        self.distinct_prompts = HyperLogLog(precision)
+        self.distinct_templates = HyperLogLog(precision)
+
+    def summary(self, window_seconds: float, cache_sizes: Iterable[int], limit: Optional[int] = None) -> Dict[str, Any]:
+        distinct = min(self.distinct_prompts.count(), self.requests)
+        top_prompts = self.top_prompts.top()
+        return {
+            "start": self.start,
+            "end": self.start + window_seconds,
+            "requests": self.requests,
+            "endpoints": dict(self.endpoints),
+            "distinct_prompts": distinct,
+            "distinct_templates": min(self.distinct_templates.count(), self.requests),
+            "repeat_share": round(1 - distinct / self.requests, 4) if self.requests else 0.0,
+            "hit_rates": hit_rates(top_prompts, self.requests, distinct, cache_sizes),
+            "top_prompts": top_prompts[:limit],
+            "top_templates": self.top_templates.top(limit)
+        }
+
+
+class PromptAnalytics:
+    """
+    Constant-memory analytics of the prompts seen by the chat endpoints
+
+    Each prompt is normalized and fingerprinted twice: as an exact prompt
+    (what an exact-match cache would key on) and as a template (structured
+    rules/context/knowledge base, or the prompt with its numbers masked). Per
+    tumbling window of `window_seconds`, count-min sketches with top-k
+    tracking find the heavy hitters and HyperLogLogs count distinct keys.
+    The last `windows` windows are kept; memory does not grow with traffic.
+    Entries carry the first `sample_chars` characters of the prompt only
+    when that is set; by default they are fingerprints alone.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 3600.0,
+        windows: int = 24,
+        width: int = 2048,
+        depth: int = 4,
+        top_k: int = 50,
+        precision: int = 12,
+        sample_chars: int = 0,
+        enabled: bool = True
+    ):
+        self.window_seconds = window_seconds
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.precision = precision
+        self.sample_chars = sample_chars
+        self.enabled = enabled
+        self.current = self._window(time.time())
+        self.history: Deque[Window] = deque(maxlen=max(0, windows - 1))
+
+    def _window(self, now: float) -> Window:
+        start = now - now % self.window_seconds
+        return Window(start, self.width, self.depth, self.top_k, self.precision)
+
+    def _rotate(self, now: float):
+        if now >= self.current.start + self.window_seconds:
+            # Closed windows keep their top-k and registers only; the count-min counters are dropped
+            self.current.prompt_counts = self.current.template_counts = None
+            self.history.append(self.current)
+            self.current = self._window(now)
+
+    def observe(self, endpoint: str, text: str, template: Optional[Sequence[Optional[str]]] = None):
+        """
+        Count one request
+
+        `template` identifies a structured prompt's fixed parts; without it
+        the template is derived from `text` by masking its numbers.
+        """
+        if not self.enabled:
+            return
+        self._rotate(time.time())
+        window = self.current
+        window.requests += 1
+        window.endpoints[endpoint] = window.endpoints.get(endpoint, 0) + 1
+
+        normalized = normalize_prompt(text)
+        if template is None:
+            template_text = prompt_template(normalized)
+            template_key = fingerprint(endpoint, template_text)
+            prompt_key = fingerprint(endpoint, normalized)
+        else:
+            template_text = " ".join(part for part in template if part)
+            template_key = fingerprint(endpoint, *template)
+            prompt_key = fingerprint(endpoint, *template, normalized)
+
+        limit = self.sample_chars
+        window.top_prompts.offer(prompt_key, window.prompt_counts.add(prompt_key), normalized[:limit] if limit else None)
+        window.distinct_prompts.add(prompt_key)
+        window.top_templates.offer(
+            template_key, window.template_counts.add(template_key), template_text[:limit] if limit else None
+        )
+        window.distinct_templates.add(template_key)
+
+    def report(self, cache_sizes: Iterable[int] = (10, 100, 1000), limit: int = 20) -> Dict[str, Any]:
+        """Current window in detail, then the previous ones (newest first)"""
+        self._rotate(time.time())
+        cache_sizes = sorted(set(cache_sizes))
+        return {
+            "window_seconds": self.window_seconds,
+            "sketch": {"width": self.width, "depth": self.depth, "top_k": self.top_k, "precision": self.precision},
+            "current": self.current.summary(self.window_seconds, cache_sizes, limit),
+            "previous": [
+                window.summary(self.window_seconds, cache_sizes, limit=5) for window in reversed(self.history)
+            ]
+        }
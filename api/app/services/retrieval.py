@@ -0,0 +1,233 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_COMBINING = re.compile(r"[\u0300-\u036f]")
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+# Function words of the FR/EN knowledge bases, too frequent to rank on
+STOPWORDS = frozenset("""
+a an and are as at be by do does for from has have how i in is it of on or
+that the this to was what when where which who why will with you your
+au aux avec ce ces dans de des du elle en est et il je la le les leur lui
+ma mais me mes mon ne nos notre nous ou par pas pour qu que qui sa se ses
+son sur ta te tes ton tu un une vos votre vous y
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent- and case-insensitive terms, stopwords dropped, plural/feminine endings folded"""
+    text = _COMBINING.sub("", unicodedata.normalize("NFKD", text)).casefold()
+    terms = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        # Light plural/feminine folding, the same on both sides of the match
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        if len(token) > 4 and token.endswith("e"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def chunk_text(text: str, max_chars: int = 400) -> List[str]:
+    """
+    Split a document into chunks of at most about `max_chars`
+
+    Paragraphs (blank-line separated) are kept whole when they fit; longer
+    ones are cut at line boundaries, consecutive lines being packed together.
+    A single line longer than `max_chars` is a chunk of its own.
+    """
+    chunks = []
+    for paragraph in _BLANK_LINES.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            chunks.append(paragraph)
+            continue
+        current: List[str] = []
+        size = 0
+        for line in paragraph.splitlines():
+            line = line.rstrip()
+            if not line:
+                continue
+            if current and size + len(line) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            chunks.append("\n".join(current))
+    return chunks
+
+
+@dataclass
+class Chunk:
+    """An indexed passage of a document"""
+    document_id: str
+    text: str
+    length: int
+
+
+@dataclass
+class SearchHit:
+    chunk_id: int
+    chunk: Chunk
+    score: float
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25
+
+    Postings hold term frequencies per chunk; document frequencies and chunk
+    lengths are maintained on every update. The IDF table and the per-chunk
+    length normalization depend on corpus-wide totals, so they are recomputed
+    once, on the first search after a change, and reused until the next one.
+    A search then only walks the postings of the query terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: Dict[int, Chunk] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.documents: Dict[str, List[int]] = {}
+        self.total_length = 0
+        self._next_id = 0
+        self._idf: Dict[str, float] = {}
+        self._norm: Dict[int, float] = {}
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, document_id: str, chunks: Iterable[str]) -> int:
+        """Index a document's chunks, replacing any previous version; returns the chunk count"""
+        self.remove(document_id)
+        ids = []
+        for text in chunks:
+            terms = tokenize(text)
+            chunk_id = self._next_id
+            self._next_id += 1
+            self.chunks[chunk_id] = Chunk(document_id, text, len(terms))
+            self.total_length += len(terms)
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            ids.append(chunk_id)
+        self.documents[document_id] = ids
+        self._stale = True
+        return len(ids)
+
+    def remove(self, document_id: str) -> bool:
+        """Drop a document's chunks from the index"""
+        ids = self.documents.pop(document_id, None)
+        if ids is None:
+            return False
+        for chunk_id in ids:
+            chunk = self.chunks.pop(chunk_id)
+            self.total_length -= chunk.length
+            for term in set(tokenize(chunk.text)):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(chunk_id, None)
+                    if not posting:
+                        del self.postings[term]
+        self._stale = True
+        return True
+
+    def _refresh(self):
+        count = len(self.chunks)
+        average = self.total_length / count if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+        self._norm = {
+            chunk_id: self.k1 * (1 - self.b + self.b * chunk.length / average) if average else self.k1
+            for chunk_id, chunk in self.chunks.items()
+        }
+        self._stale = False
+
+    def search(self, query: str, top_k: int = 4) -> List[SearchHit]:
+        """Best `top_k` chunks for the query (chunks sharing no term with it are never returned)"""
+        if self._stale:
+            self._refresh()
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self._idf[term]
+            for chunk_id, frequency in posting.items():
+                weight = idf * frequency * (self.k1 + 1) / (frequency + self._norm[chunk_id])
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [SearchHit(chunk_id, self.chunks[chunk_id], score) for chunk_id, score in best]
+
+
+class KnowledgeBase:
+    """A named BM25 index with its chunking size and an update counter"""
+
+    def __init__(self, name: str, chunk_chars: int = 400):
+        self.name = name
+        self.chunk_chars = chunk_chars
+        self.index = BM25Index()
+        # Bumped on every change, lets clients notice updates
+        self.version = 0
+
+    def upsert(self, document_id: str, text: str) -> int:
+        count = self.index.add(document_id, chunk_text(text, self.chunk_chars))
+        self.version += 1
+        return count
+
+    def delete(self, document_id: str) -> bool:
+        removed = self.index.remove(document_id)
+        if removed:
+            self.version += 1
+        return removed
+
+    def retrieve(self, query: str, top_k: int) -> List[SearchHit]:
+        """Relevant chunks, in indexing order so related lines stay together"""
+        return sorted(self.index.search(query, top_k), key=lambda hit: hit.chunk_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": len(self.index.documents),
+            "chunks": len(self.index),
+            "terms": len(self.index.postings),
+            "version": self.version
+        }
+
+
+class KnowledgeRegistry:
+    """Knowledge bases by name, bounded in number"""
+
+    def __init__(self, max_bases: int = 16, chunk_chars: int = 400):
+        self.max_bases = max_bases
+        self.chunk_chars = chunk_chars
+        self.bases: Dict[str, KnowledgeBase] = {}
+
+    def get(self, name: str) -> Optional[KnowledgeBase]:
+        return self.bases.get(name)
+
+    def get_or_create(self, name: str, chunk_chars: Optional[int] = None) -> KnowledgeBase:
+        base = self.bases.get(name)
+        if base is None:
+            if len(self.bases) >= self.max_bases:
+                raise ValueError(f"Too many knowledge bases (max {self.max_bases})")
+            base = self.bases[name] = KnowledgeBase(name, chunk_chars or self.chunk_chars)
+        return base
+
+    def delete(self, name: str) -> bool:
+        return self.bases.pop(name, None) is not None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: base.stats() for name, base in sorted(self.bases.items())}
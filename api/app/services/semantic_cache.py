@@ -0,0 +1,196 @@
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from app.metrics import semantic_cache_entries, semantic_cache_evictions
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+Scope = Tuple[str, str]
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query before embedding (unicode form, case, punctuation, spaces)"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def template_fingerprint(
+    rules: Optional[str],
+    context: Optional[str],
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Stable short key identifying a structured prompt template
+
+    The effective generation options are part of the key: an answer cut by
+    num_predict or stop, or sampled differently, is only reused for the
+    same options.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update((rules or "").encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update((context or "").encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(orjson.dumps(options or {}, option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """A cached answer and its bookkeeping"""
+    query: str
+    response: str
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class CacheHit:
+    """Result of a successful lookup"""
+    entry: CacheEntry
+    similarity: float
+
+
+class _ScopeIndex:
+    """Fixed-capacity matrix of unit vectors for one (template, model) scope"""
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries: List[Optional[CacheEntry]] = [None] * capacity
+        self.size = 0
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Best row index and cosine similarity for each query row"""
+        if self.size == 0:
+            empty = np.full(len(queries), -1, dtype=np.int64)
+            return empty, np.full(len(queries), -1.0, dtype=np.float32)
+        similarities = queries @ self.vectors[:self.size].T
+        best = similarities.argmax(axis=1)
+        return best, similarities[np.arange(len(queries)), best]
+
+    def insert(self, vector: np.ndarray, entry: CacheEntry, now: float) -> bool:
+        """Add an entry, evicting the least recently used one when full; returns True on eviction"""
+        evicted = self.size == self.capacity
+        if evicted:
+            slot = int(self.last_used.argmin())
+        else:
+            slot = self.size
+            self.size += 1
+        self.vectors[slot] = vector
+        self.entries[slot] = entry
+        self.last_used[slot] = now
+        return evicted
+
+
+class SemanticCache:
+    """
+    Near-duplicate response cache backed by a NumPy similarity index
+
+    Queries are stored as L2-normalized float32 rows so cosine similarity is a
+    single matrix product. Entries are scoped per (template, model) and memory
+    is bounded by `max_entries` rows per scope and `max_scopes` scopes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_entries: int = 2048,
+        max_scopes: int = 32,
+        ttl_seconds: float = 3600
+    ):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.max_scopes = max(1, max_scopes)
+        self.ttl_seconds = ttl_seconds
+        self._scopes: "OrderedDict[Scope, _ScopeIndex]" = OrderedDict()
+
+    @staticmethod
+    def _as_unit_rows(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def __len__(self) -> int:
+        return sum(index.size for index in self._scopes.values())
+
+    def lookup_many(
+        self,
+        scope: Scope,
+        vectors: Sequence[Sequence[float]]
+    ) -> List[Tuple[Optional[CacheHit], float]]:
+        """
+        Batched lookup for several query vectors in one scope
+
+        Returns, for each query, the hit (or None) and the best similarity seen.
+        """
+        index = self._scopes.get(scope)
+        if index is None:
+            return [(None, -1.0)] * len(vectors)
+
+        queries = self._as_unit_rows(vectors)
+        if queries.shape[1] != index.dim:
+            return [(None, -1.0)] * len(queries)
+
+        self._scopes.move_to_end(scope)
+        rows, similarities = index.search(queries)
+        now = time.time()
+        results: List[Tuple[Optional[CacheHit], float]] = []
+        for row, similarity in zip(rows.tolist(), similarities.tolist()):
+            entry = index.entries[row] if row >= 0 else None
+            if entry is None or similarity < self.threshold:
+                results.append((None, similarity))
+                continue
+            if now - entry.created_at > self.ttl_seconds:
+                # Expired entries become the next eviction candidates
+                index.last_used[row] = 0.0
+                results.append((None, similarity))
+                continue
+            entry.hits += 1
+            index.last_used[row] = now
+            results.append((CacheHit(entry=entry, similarity=similarity), similarity))
+        return results
+
+    def lookup(self, scope: Scope, vector: Sequence[float]) -> Tuple[Optional[CacheHit], float]:
+        """Look up a single query vector"""
+        return self.lookup_many(scope, [vector])[0]
+
+    def store(self, scope: Scope, vector: Sequence[float], query: str, response: str):
+        """Insert an answer for a query vector"""
+        unit = self._as_unit_rows([vector])[0]
+        index = self._scopes.get(scope)
+        if index is None or index.dim != unit.shape[0]:
+            if index is not None:
+                semantic_cache_evictions.labels(reason="dimension_change").inc(index.size)
+            index = _ScopeIndex(dim=unit.shape[0], capacity=self.max_entries)
+            self._scopes[scope] = index
+            while len(self._scopes) > self.max_scopes:
+                _, dropped = self._scopes.popitem(last=False)
+                semantic_cache_evictions.labels(reason="scope").inc(dropped.size)
+        self._scopes.move_to_end(scope)
+
+        now = time.time()
+        entry = CacheEntry(query=query, response=response, created_at=now)
+        if index.insert(unit, entry, now):
+            semantic_cache_evictions.labels(reason="capacity").inc()
+        semantic_cache_entries.set(len(self))
+
+    def clear(self):
+        """Drop every entry"""
+        self._scopes.clear()
+        semantic_cache_entries.set(0)
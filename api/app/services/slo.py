@@ -0,0 +1,232 @@
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Values at or below this (ms) land in the zero bucket
+MIN_VALUE = 1e-3
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhd]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_windows(spec: str) -> Dict[str, float]:
+    """'5m,1h' -> {'5m': 300.0, '1h': 3600.0}"""
+    windows = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = _DURATION.match(part)
+        if not match:
+            raise ValueError(f"Invalid SLO window: {part}")
+        windows[part] = float(match.group(1)) * _UNITS[match.group(2)]
+    return windows
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch)
+
+    Values go into logarithmic buckets of ratio gamma, so any quantile is
+    within `relative_accuracy` of the true value. The number of buckets is
+    capped by collapsing the lowest ones, which keeps memory constant and
+    only degrades the smallest quantiles.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= MIN_VALUE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """Fold the lowest buckets together until the cap holds"""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+
+    def merge(self, other: "DDSketch"):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class _Slice:
+    __slots__ = ("epoch", "sketch", "total", "errors", "slow")
+
+    def __init__(self, relative_accuracy: float, max_buckets: int):
+        self.epoch = -1
+        self.sketch = DDSketch(relative_accuracy, max_buckets)
+        self.total = 0
+        self.errors = 0
+        self.slow = 0
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.sketch = DDSketch(self.sketch.relative_accuracy, self.sketch.max_buckets)
+        self.total = self.errors = self.slow = 0
+
+
+class SlidingWindow:
+    """Ring of per-slice sketches and counters covering the last `window_seconds`"""
+
+    def __init__(self, window_seconds: float, slices: int = 12, relative_accuracy: float = 0.01, max_buckets: int = 512):
+        self.slice_seconds = window_seconds / slices
+        self._slices = [_Slice(relative_accuracy, max_buckets) for _ in range(slices)]
+
+    def _slice(self, now: float) -> _Slice:
+        epoch = int(now // self.slice_seconds)
+        current = self._slices[epoch % len(self._slices)]
+        if current.epoch != epoch:
+            current.reset(epoch)
+        return current
+
+    def record(self, now: float, duration_ms: float, success: bool, slow: bool):
+        current = self._slice(now)
+        current.total += 1
+        if not success:
+            current.errors += 1
+            return
+        current.sketch.add(duration_ms)
+        if slow:
+            current.slow += 1
+
+    def snapshot(self, now: float, into: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Merge the live slices (optionally into an existing snapshot)"""
+        snapshot = into or {"sketch": DDSketch(*self._params()), "total": 0, "errors": 0, "slow": 0}
+        oldest = int(now // self.slice_seconds) - len(self._slices)
+        for part in self._slices:
+            if part.epoch > oldest:
+                snapshot["sketch"].merge(part.sketch)
+                snapshot["total"] += part.total
+                snapshot["errors"] += part.errors
+                snapshot["slow"] += part.slow
+        return snapshot
+
+    def _params(self) -> Tuple[float, int]:
+        sketch = self._slices[0].sketch
+        return sketch.relative_accuracy, sketch.max_buckets
+
+
+class SLOTracker:
+    """
+    Per-endpoint/model latency quantiles and SLO compliance over sliding windows
+
+    Each request costs one sketch update per window; memory is bounded by
+    `max_series` x windows x slices x sketch buckets, whatever the traffic.
+    Objectives: availability (share of successful requests) and latency
+    (share of successful requests under `latency_threshold_ms`). Burn rate
+    is the observed bad ratio divided by the error budget (1 - target).
+    """
+
+    QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+    def __init__(
+        self,
+        windows: Dict[str, float],
+        availability_target: float = 0.99,
+        latency_target: float = 0.95,
+        latency_threshold_ms: float = 10000,
+        max_series: int = 64,
+        slices: int = 12
+    ):
+        self.windows = windows
+        self.availability_target = availability_target
+        self.latency_target = latency_target
+        self.latency_threshold_ms = latency_threshold_ms
+        self.max_series = max_series
+        self.slices = slices
+        self._series: Dict[Tuple[str, str], Dict[str, SlidingWindow]] = {}
+
+    def _windows_for(self, endpoint: str, model: str) -> Dict[str, SlidingWindow]:
+        key = (endpoint, model)
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= self.max_series:
+                # Unknown models beyond the cap share one series per endpoint
+                key = (endpoint, "other")
+                series = self._series.get(key)
+            if series is None:
+                series = {name: SlidingWindow(seconds, self.slices) for name, seconds in self.windows.items()}
+                self._series[key] = series
+        return series
+
+    def record(self, endpoint: str, model: str, duration_ms: float, success: bool):
+        now = time.monotonic()
+        slow = duration_ms > self.latency_threshold_ms
+        for window in self._windows_for(endpoint, model).values():
+            window.record(now, duration_ms, success, slow)
+
+    def _summarize(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        total, errors, slow = snapshot["total"], snapshot["errors"], snapshot["slow"]
+        successes = total - errors
+        summary: Dict[str, Any] = {"count": total}
+        for q in self.QUANTILES:
+            value = snapshot["sketch"].quantile(q)
+            summary[f"p{q * 100:g}"] = round(value, 3) if value is not None else None
+        availability = successes / total if total else None
+        latency = (successes - slow) / successes if successes else None
+        summary["availability"] = round(availability, 5) if availability is not None else None
+        summary["latency_compliance"] = round(latency, 5) if latency is not None else None
+        summary["burn_rate"] = {
+            "availability": round((1 - availability) / (1 - self.availability_target), 3)
+            if availability is not None else None,
+            "latency": round((1 - latency) / (1 - self.latency_target), 3) if latency is not None else None
+        }
+        return summary
+
+    def report(self, endpoint: Optional[str] = None) -> Dict[str, Any]:
+        """Quantiles, compliance and burn rates per series and window, plus the merged overall view"""
+        now = time.monotonic()
+        series: List[Dict[str, Any]] = []
+        overall: Dict[str, Dict[str, Any]] = {}
+        for (series_endpoint, model), windows in sorted(self._series.items()):
+            if endpoint is not None and series_endpoint != endpoint:
+                continue
+            entry = {"endpoint": series_endpoint, "model": model, "windows": {}}
+            for name, window in windows.items():
+                entry["windows"][name] = self._summarize(window.snapshot(now))
+                overall[name] = window.snapshot(now, overall.get(name))
+            series.append(entry)
+
+        return {
+            "objectives": {
+                "availability": self.availability_target,
+                "latency": {"target": self.latency_target, "threshold_ms": self.latency_threshold_ms}
+            },
+            "windows": {name: seconds for name, seconds in self.windows.items()},
+            "overall": {name: self._summarize(snapshot) for name, snapshot in overall.items()},
+            "series": series
+        }
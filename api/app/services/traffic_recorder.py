@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+from app.utils.jsonl_writer import RotatingJsonlWriter
+
+logger = logging.getLogger(__name__)
+
+# Request fields kept in recordings; anything else is dropped
+RECORDED_FIELDS = ("prompt", "query", "rules", "context", "knowledge_base", "top_k", "model", "stream", "options")
+
+_REDACTIONS = (
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\b(?:sk|pk|api|key|token)[-_][A-Za-z0-9_-]{12,}\b", re.IGNORECASE), "<secret>"),
+    (re.compile(r"\b(?:\d[ .-]?){12,19}\b"), "<number>"),
+    (re.compile(r"(?:\+\d{1,3}[ .-]?)?\(?\d{2,4}\)?(?:[ .-]?\d{2,4}){2,4}"), "<phone>"),
+)
+
+
+def sanitize_text(text: str) -> str:
+    """Redact emails, secrets, card-like and phone numbers"""
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def sanitize_body(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep known request fields and redact free text"""
+    sanitized = {}
+    for field in RECORDED_FIELDS:
+        value = body.get(field)
+        if value is None:
+            continue
+        sanitized[field] = sanitize_text(value) if isinstance(value, str) else value
+    return sanitized
+
+
+class TrafficRecorder:
+    """
+    Sampled recorder of API traffic for timing-faithful replay
+
+    `record` only appends to an in-memory buffer; a background task flushes
+    it to rotating gzip JSONL files in a worker thread.
+    """
+
+    def __init__(
+        self,
+        writer: RotatingJsonlWriter,
+        sample_rate: float = 0.1,
+        enabled: bool = True,
+        flush_interval: float = 5.0,
+        max_buffer: int = 10000
+    ):
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Dict[str, Any]] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    def should_sample(self) -> bool:
+        """Decide whether a request is recorded (called once it has completed)"""
+        return self.enabled and random.random() < self.sample_rate
+
+    def record(
+        self,
+        endpoint: str,
+        body: Dict[str, Any],
+        arrival: float,
+        model: str,
+        status: str,
+        duration_ms: float,
+        response: Optional[Dict[str, Any]] = None
+    ):
+        """Buffer one sampled request"""
+        if len(self._buffer) >= self.max_buffer:
+            return
+        response = response or {}
+        self._buffer.append({
+            "ts": arrival,
+            "endpoint": endpoint,
+            "model": model,
+            "body": sanitize_body(body),
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "prompt_tokens": response.get("prompt_eval_count"),
+            "completion_tokens": response.get("eval_count"),
+            # Replays scale the timeline by it to reproduce the unsampled request rate
+            "sample_rate": self.sample_rate,
+        })
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while self._buffer:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write buffered records in a worker thread"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self.writer.write_batch, batch)
+        except Exception as e:
+            logger.error("Failed to write %d traffic records: %s", len(batch), e)
+
+    async def close(self):
+        """Flush remaining records and stop the background task"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
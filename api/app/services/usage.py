@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Usage is aggregated per hour in the store
+BUCKET_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    tenant TEXT NOT NULL,
+    model TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    backend_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant, model, bucket)
+)
+"""
+
+_UPSERT = """
+INSERT INTO usage (tenant, model, bucket, requests, errors, prompt_tokens, completion_tokens, backend_seconds)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (tenant, model, bucket) DO UPDATE SET
+    requests = requests + excluded.requests,
+    errors = errors + excluded.errors,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    backend_seconds = backend_seconds + excluded.backend_seconds
+"""
+
+COUNTERS = ("requests", "errors", "prompt_tokens", "completion_tokens", "backend_seconds")
+
+
+def tenant_from_headers(tenant_id: Optional[str], api_key: Optional[str]) -> str:
+    """Explicit tenant id, else a hash of the API key (never stored in clear), else anonymous"""
+    if tenant_id:
+        return tenant_id[:64]
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return "anonymous"
+
+
+class UsageStore:
+    """
+    SQLite store of hourly usage per tenant and model
+
+    Every method opens its own connection and blocks; run them off the
+    event loop (e.g. `asyncio.to_thread`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._initialized = True
+        return connection
+
+    def write_batch(self, rows: List[Tuple]) -> None:
+        """Add (tenant, model, bucket, *COUNTERS) rows in one transaction"""
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(_UPSERT, rows)
+        finally:
+            connection.close()
+
+    def query(
+        self,
+        tenant: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        group_by_model: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Summed usage per tenant (and model) between two epoch timestamps"""
+        clauses, params = [], []
+        if tenant is not None:
+            clauses.append("tenant = ?")
+            params.append(tenant)
+        if since is not None:
+            clauses.append("bucket >= ?")
+            params.append(int(since // BUCKET_SECONDS) * BUCKET_SECONDS)
+        if until is not None:
+            clauses.append("bucket < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = "tenant, model" if group_by_model else "tenant"
+        sums = ", ".join(f"SUM({counter})" for counter in COUNTERS)
+
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT {columns}, {sums} FROM usage {where} GROUP BY {columns} ORDER BY {columns}",
+                params
+            ).fetchall()
+        finally:
+            connection.close()
+
+        keys = ("tenant", "model") if group_by_model else ("tenant",)
+        return [dict(zip(keys + COUNTERS, row)) for row in rows]
+
+
+class UsageTracker:
+    """
+    Per-tenant, per-model usage accounting
+
+    `record` is a dictionary update on the event loop; a background task
+    flushes the aggregates to the store in a worker thread every
+    `flush_interval` seconds.
+    """
+
+    def __init__(self, store: UsageStore, enabled: bool = True, flush_interval: float = 10.0):
+        self.store = store
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, str, int], List[float]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def record(
+        self,
+        tenant: str,
+        model: str,
+        success: bool,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        backend_seconds: float = 0.0
+    ):
+        """Add one request to the in-memory aggregates"""
+        if not self.enabled:
+            return
+        bucket = int(time.time() // BUCKET_SECONDS) * BUCKET_SECONDS
+        counters = self._pending.get((tenant, model, bucket))
+        if counters is None:
+            counters = self._pending[(tenant, model, bucket)] = [0, 0, 0, 0, 0.0]
+        counters[0] += 1
+        if not success:
+            counters[1] += 1
+        counters[2] += prompt_tokens or 0
+        counters[3] += completion_tokens or 0
+        counters[4] += backend_seconds
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write pending aggregates in a worker thread; kept for the next flush on failure"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            rows = [key + tuple(counters) for key, counters in batch.items()]
+            try:
+                await asyncio.to_thread(self.store.write_batch, rows)
+            except Exception as e:
+                logger.error("Failed to write %d usage rows: %s", len(rows), e)
+                for key, counters in batch.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0, 0, 0.0])
+                    for index, value in enumerate(counters):
+                        merged[index] += value
+
+    async def query(self, **filters) -> List[Dict[str, Any]]:
+        """Flush, then read the store in a worker thread"""
+        await self.flush()
+        return await asyncio.to_thread(self.store.query, **filters)
+
+    async def close(self):
+        """Flush remaining aggregates and stop the background task"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
@@ -0,0 +1,117 @@
+from typing import Any, AsyncIterator, Callable, Dict, Iterable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+# Ollama fields the API never reads; `context` can hold thousands of token ids
+OLLAMA_SKIPPED_FIELDS = ("context",)
+
+_WHITESPACE = b" \t\r\n"
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes"""
+    return orjson.dumps(obj)
+
+
+def loads(data) -> Any:
+    """Parse JSON from bytes or str"""
+    return orjson.loads(data)
+
+
+def _skip_whitespace(raw: bytes, pos: int, step: int = 1) -> int:
+    while 0 <= pos < len(raw) and raw[pos] in _WHITESPACE:
+        pos += step
+    return pos
+
+
+def _member_span(raw: bytes, start: int, key_length: int):
+    """Byte span of an object member holding a flat array (with one comma), or None"""
+    # The key must be an object member: preceded by '{' or ','
+    before = _skip_whitespace(raw, start - 1, step=-1)
+    colon = _skip_whitespace(raw, start + key_length)
+    if before < 0 or raw[before] not in b"{," or colon >= len(raw) or raw[colon] != ord(":"):
+        return None
+    value = _skip_whitespace(raw, colon + 1)
+    if value >= len(raw) or raw[value] != ord("["):
+        return None
+    end = raw.find(b"]", value)
+    if end < 0 or raw.find(b"[", value + 1, end) >= 0 or raw.find(b"{", value + 1, end) >= 0:
+        return None
+    end += 1
+
+    after = _skip_whitespace(raw, end)
+    if after < len(raw) and raw[after] == ord(","):
+        return start, after + 1
+    if raw[before] == ord(","):
+        return before, end
+    return start, end
+
+
+def strip_fields(raw: bytes, fields: Iterable[str] = OLLAMA_SKIPPED_FIELDS) -> bytes:
+    """
+    Remove flat array members (e.g. `"context": [1, 2, ...]`) from a JSON object
+
+    Works on the raw bytes with C-level searches so the arrays are never
+    materialized as Python lists. Only arrays of scalars are removed; anything
+    unexpected is left in place for the regular parser.
+    """
+    for name in fields:
+        key = b'"' + name.encode() + b'"'
+        start = raw.find(key)
+        while start >= 0:
+            span = _member_span(raw, start, len(key))
+            if span is not None:
+                raw = raw[:span[0]] + raw[span[1]:]
+                break
+            start = raw.find(key, start + 1)
+    return raw
+
+
+def decode_ollama(raw: bytes, skip: Iterable[str] = OLLAMA_SKIPPED_FIELDS) -> Dict[str, Any]:
+    """Decode an Ollama JSON reply, skipping fields the API does not use"""
+    return orjson.loads(strip_fields(raw, skip) if skip else raw)
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes],
+    skip: Iterable[str] = OLLAMA_SKIPPED_FIELDS
+) -> AsyncIterator[Dict[str, Any]]:
+    """Incrementally decode newline-delimited JSON from a byte stream"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            line = buffer[start:newline]
+            start = newline + 1
+            if line.strip():
+                yield decode_ollama(line, skip)
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield decode_ollama(buffer, skip)
+
+
+class ORJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """Route class parsing request bodies with orjson"""
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request) -> Response:
+            return await original_handler(ORJSONRequest(request.scope, request.receive))
+
+        return handler
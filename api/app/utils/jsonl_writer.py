@@ -0,0 +1,59 @@
+import gzip
+import os
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from app.utils import fastjson
+
+
+class RotatingJsonlWriter:
+    """
+    Append records to gzip-compressed JSONL files rotated by size
+
+    Each batch is written as its own gzip member, so files stay readable by
+    `gzip.open` even if the process stops between batches. Writes are blocking
+    and meant to run off the event loop (e.g. `asyncio.to_thread`).
+    """
+
+    def __init__(self, directory: str, prefix: str, max_bytes: int = 50 * 1024 * 1024, max_files: int = 20):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._path: Optional[str] = None
+        self._sequence = 0
+
+    def _new_path(self) -> str:
+        self._sequence += 1
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.directory, f"{self.prefix}-{timestamp}-{self._sequence:04d}.jsonl.gz")
+
+    def _prune(self):
+        """Keep only the newest `max_files` files"""
+        if self.max_files <= 0:
+            return
+        files = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(f"{self.prefix}-") and name.endswith(".jsonl.gz")
+        )
+        for name in files[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def write_batch(self, records: Iterable[Any]) -> int:
+        """Write records as one compressed member; returns the number of bytes written"""
+        payload = b"".join(fastjson.dumps(record) + b"\n" for record in records)
+        if not payload:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self._path is None or (os.path.exists(self._path) and os.path.getsize(self._path) >= self.max_bytes):
+            self._path = self._new_path()
+            self._prune()
+
+        compressed = gzip.compress(payload, compresslevel=6)
+        with open(self._path, "ab") as f:
+            f.write(compressed)
+        return len(compressed)
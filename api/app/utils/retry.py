@@ -1,40 +1,50 @@
 import asyncio
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def retry_with_backoff(max_retries: int = 3, delay: int = 1, backoff: int = 2):
+def retry_with_backoff(
+    max_retries: Optional[int] = 3,
+    delay: Optional[float] = 1,
+    backoff: int = 2,
+    no_retry: tuple = ()
+):
     """
     Retry decorator with exponential backoff
     
     Args:
-        max_retries: Maximum number of retry attempts
-        delay: Initial delay between retries in seconds
+        max_retries: Maximum number of retry attempts (None: the instance's `max_retries`)
+        delay: Initial delay between retries in seconds (None: the instance's `retry_delay`)
         backoff: Multiplier for exponential backoff
+        no_retry: Exception types raised immediately without retrying
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
-            current_delay = delay
+            # Methods of configured clients read their own settings
+            retries = args[0].max_retries if max_retries is None else max_retries
+            current_delay = args[0].retry_delay if delay is None else delay
             last_exception = None
             
-            for attempt in range(max_retries + 1):
+            for attempt in range(retries + 1):
                 try:
                     return await func(*args, **kwargs)
+                except no_retry:
+                    raise
                 except Exception as e:
                     last_exception = e
-                    if attempt < max_retries:
+                    if attempt < retries:
                         logger.warning(
-                            f"Attempt {attempt + 1}/{max_retries} failed: {str(e)}. "
+                            f"Attempt {attempt + 1}/{retries} failed: {str(e)}. "
                             f"Retrying in {current_delay}s..."
                         )
                         await asyncio.sleep(current_delay)
                         current_delay *= backoff
                     else:
-                        logger.error(f"All {max_retries} retry attempts failed")
+                        logger.error(f"All {retries} retry attempts failed")
             
             raise last_exception
         
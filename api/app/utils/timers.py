@@ -40,3 +40,27 @@ def timer_context() -> Generator[Timer, None, None]:
         yield timer
     finally:
         timer.stop()
+
+
+class PhaseTimer:
+    """Durations of consecutive named phases (e.g. application startup)"""
+    
+    def __init__(self):
+        self.phases = {}
+        self.started = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """Time one phase; a repeated name accumulates"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+    
+    def as_dict(self) -> dict:
+        """Phase durations and total elapsed time in milliseconds"""
+        return {
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3)
+        }
@@ -0,0 +1,240 @@
+"""
+Microbenchmarks for the API's own per-request overhead
+
+Covers the hot paths around each Ollama call (prompt building, request
+validation, metric label lookups, retry wrapper, JSON encoding/decoding,
+prompt analytics) and
+a full in-process ASGI request with a stubbed OllamaClient, then compares the
+results with stored baselines.
+
+    cd api
+    python -m benchmarks.bench_api                 # compare with baselines.json
+    python -m benchmarks.bench_api --save          # record new baselines
+    python -m benchmarks.bench_api --threshold 0.3 # allow +30% before failing
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from app.main import create_app
+from app.metrics import request_latency, request_counter
+from app.routers.chat import ChatRequest, StructuredChatRequest, ChatResponse, build_structured_prompt
+from app.services.prompt_analytics import PromptAnalytics
+from app.utils import fastjson
+from app.utils.retry import retry_with_backoff
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+OLLAMA_REPLY = {
+    "model": "qwen2.5:7b-instruct-q4_0",
+    "created_at": "2026-01-01T00:00:00Z",
+    "response": "Docker isolates applications in containers sharing the host kernel. " * 4,
+    "done": True,
+    "context": list(range(4096)),
+    "total_duration": 5_000_000_000,
+    "load_duration": 1_000_000,
+    "prompt_eval_count": 120,
+    "prompt_eval_duration": 900_000_000,
+    "eval_count": 60,
+    "eval_duration": 4_000_000_000,
+}
+OLLAMA_REPLY_BYTES = fastjson.dumps(OLLAMA_REPLY)
+
+
+class StubOllamaClient:
+    """OllamaClient replacement answering instantly with a canned reply"""
+
+    async def generate(self, model: str, prompt: str, stream: bool = False, options=None) -> Dict[str, Any]:
+        return fastjson.decode_ollama(OLLAMA_REPLY_BYTES)
+
+    async def check_health(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> float:
+    """Median seconds per call of a synchronous function"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time / repeat:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def measure_async(factory: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> float:
+    """Median seconds per await of a coroutine factory, in one event loop"""
+
+    async def run() -> float:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                await factory()
+            if time.perf_counter() - start >= min_time / repeat:
+                break
+            number *= 2
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                await factory()
+            samples.append((time.perf_counter() - start) / number)
+        return statistics.median(samples)
+
+    return asyncio.run(run())
+
+
+def bench_retry_overhead() -> float:
+    """Cost added by retry_with_backoff around a successful call"""
+
+    async def call():
+        return None
+
+    wrapped = retry_with_backoff(max_retries=3, delay=1)(call)
+    return max(0.0, measure_async(wrapped) - measure_async(call))
+
+
+def bench_asgi(path: str, payload: Dict[str, Any]) -> float:
+    """Full in-process request through the ASGI app with a stubbed Ollama"""
+    app = create_app()
+    app.state.container.ollama_client = StubOllamaClient()
+
+    async def run() -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def request():
+                response = await client.post(path, json=payload)
+                response.raise_for_status()
+
+            for _ in range(20):
+                await request()
+            samples = []
+            for _ in range(5):
+                start = time.perf_counter()
+                for _ in range(100):
+                    await request()
+                samples.append((time.perf_counter() - start) / 100)
+            return statistics.median(samples)
+
+    return asyncio.run(run())
+
+
+def run_benchmarks(selected: Optional[List[str]] = None) -> Dict[str, float]:
+    """Run the suite; returns microseconds per operation by benchmark name"""
+    chat_body = {"prompt": "Explain Docker volumes in one sentence", "model": "qwen2.5:7b-instruct-q4_0"}
+    structured_body = {"query": "How do I monitor container memory?", "rules": None, "context": None}
+    chat_json = json.dumps(chat_body).encode()
+    response = ChatResponse(response=OLLAMA_REPLY["response"], model=OLLAMA_REPLY["model"], duration_ms=1234.5)
+    analytics = PromptAnalytics()
+
+    benchmarks: Dict[str, Callable[[], float]] = {
+        "build_structured_prompt": lambda: measure(lambda: build_structured_prompt("How do I monitor memory?")),
+        "validate_chat_request": lambda: measure(lambda: ChatRequest.model_validate(chat_body)),
+        "validate_chat_request_json": lambda: measure(lambda: ChatRequest.model_validate_json(chat_json)),
+        "validate_structured_request": lambda: measure(lambda: StructuredChatRequest.model_validate(structured_body)),
+        "metric_labels_lookup": lambda: measure(
+            lambda: request_latency.labels(method="POST", endpoint="/chat")
+            and request_counter.labels(method="POST", endpoint="/chat", status="success")
+        ),
+        "retry_wrapper_overhead": bench_retry_overhead,
+        "encode_chat_response": lambda: measure(lambda: fastjson.dumps(response.model_dump())),
+        "decode_ollama_reply": lambda: measure(lambda: fastjson.decode_ollama(OLLAMA_REPLY_BYTES)),
+        "prompt_analytics_observe": lambda: measure(lambda: analytics.observe("/chat", chat_body["prompt"])),
+        "asgi_chat": lambda: bench_asgi("/chat", chat_body),
+        "asgi_chat_structured": lambda: bench_asgi("/chat/structured", structured_body),
+    }
+
+    results = {}
+    for name, bench in benchmarks.items():
+        if selected and name not in selected:
+            continue
+        results[name] = round(bench() * 1_000_000, 3)
+    return results
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(results: Dict[str, float]):
+    data = {
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "unit": "microseconds per operation",
+        "results": results,
+    }
+    with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: Dict[str, float], baselines: Dict[str, float], threshold: float, floor_us: float) -> List[str]:
+    """Print a comparison table; returns the names of regressed benchmarks"""
+    regressions = []
+    print(f"{'benchmark':32} {'baseline µs':>12} {'current µs':>12} {'change':>9}")
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:32} {'-':>12} {current:12.3f} {'new':>9}")
+            continue
+        change = (current - baseline) / baseline if baseline else 0.0
+        # Ignore sub-floor jitter on very cheap operations
+        regressed = change > threshold and current - baseline > floor_us
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{name:32} {baseline:12.3f} {current:12.3f} {change:+8.1%}{marker}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API overhead microbenchmarks")
+    parser.add_argument("--save", action="store_true", help="Store results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown ratio (0.25 = +25%%)")
+    parser.add_argument("--floor-us", type=float, default=0.5, help="Ignore regressions smaller than this (µs)")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+
+    if args.save:
+        save_baselines(results)
+        for name, value in results.items():
+            print(f"{name:32} {value:12.3f} µs")
+        print(f"\nBaselines written to {BASELINE_FILE}")
+        return
+
+    baselines = load_baselines().get("results", {})
+    regressions = compare(results, baselines, args.threshold, args.floor_us)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Dict
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.main import create_app
+
+
+@pytest.fixture
+def settings(tmp_path) -> Settings:
+    """Settings with on-disk state under tmp_path and no background services"""
+    return Settings(
+        jobs_enabled=False,
+        memory_monitor_enabled=False,
+        jobs_db_path=str(tmp_path / "jobs.db"),
+        usage_db_path=str(tmp_path / "usage.db"),
+        traffic_recording_dir=str(tmp_path / "traffic"),
+        audit_log_dir=str(tmp_path / "audit"),
+    )
+
+
+class StubOllamaClient:
+    """OllamaClient replacement: a 4-word answer, truncated to `num_predict` words; streams `num_predict` words"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def generate(self, model: str, prompt: str, stream: bool = False, options=None) -> Dict[str, Any]:
+        self.calls.append(options or {})
+        count = min(4, (options or {}).get("num_predict", 4))
+        return {
+            "response": " ".join(["grafana"] * count),
+            "done": True,
+            "done_reason": "stop" if count == 4 else "length",
+            "eval_count": count
+        }
+
+    async def generate_stream(self, model: str, prompt: str, options=None):
+        self.calls.append(options or {})
+        count = (options or {}).get("num_predict", 4)
+        for _ in range(count):
+            await asyncio.sleep(0.01)
+            yield {"response": "grafana ", "done": False}
+        yield {"response": "", "done": True, "eval_count": count}
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def call_app():
+    """`call_app(app, method, path, **kwargs)`: one request through the ASGI app (no lifespan)"""
+
+    def call(app, method: str, path: str, **kwargs) -> httpx.Response:
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, path, **kwargs)
+
+        return asyncio.run(run())
+
+    return call
+
+
+@pytest.fixture
+def make_app(settings):
+    def factory(**overrides):
+        app = create_app(settings.model_copy(update=overrides))
+        app.state.container.ollama_client = StubOllamaClient()
+        return app
+
+    return factory
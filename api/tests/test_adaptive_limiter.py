@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.metrics import model_swaps
+from app.services.adaptive_limiter import AdaptiveConcurrencyLimiter
+
+
+def not_found():
+    request = httpx.Request("POST", "http://ollama/api/generate")
+    response = httpx.Response(404, request=request)
+    return httpx.HTTPStatusError("model not found", request=request, response=response)
+
+
+def test_unknown_model_does_not_evict_the_resident_one():
+    limiter = AdaptiveConcurrencyLimiter(max_loaded_models=1)
+    limiter.known_models.add("qwen")
+    other_before = model_swaps.labels(model="other")._value.get()
+
+    async def run():
+        async with limiter.slot("qwen"):
+            pass
+        with pytest.raises(httpx.HTTPStatusError):
+            async with limiter.slot("no-such-model"):
+                raise not_found()
+
+    asyncio.run(run())
+    # The rejected model never loaded: qwen is still resident, and the name is not a metric label
+    assert list(limiter._resident) == ["qwen"]
+    assert "no-such-model" not in limiter.known_models
+    assert model_swaps.labels(model="other")._value.get() == other_before + 1
+    assert ("no-such-model",) not in model_swaps._metrics
+
+
+def test_served_model_becomes_known():
+    limiter = AdaptiveConcurrencyLimiter(max_loaded_models=1)
+
+    async def run():
+        async with limiter.slot("llama"):
+            pass
+
+    asyncio.run(run())
+    assert "llama" in limiter.known_models
+    assert list(limiter._resident) == ["llama"]
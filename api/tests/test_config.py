@@ -0,0 +1,34 @@
+import asyncio
+import importlib
+
+import httpx
+import pytest
+
+from app.container import Container
+from app.services.ollama_client import OllamaClient
+
+
+def test_importing_the_app_reads_no_settings():
+    config = importlib.import_module("app.config")
+    importlib.import_module("app.main")
+    assert config.get_settings.cache_info().currsize == 0
+
+
+def test_retries_follow_the_injected_settings(settings):
+    client = Container(settings.model_copy(update={"max_retries": 0, "retry_delay": 0})).ollama_client
+    assert (client.max_retries, client.retry_delay) == (0, 0)
+    asyncio.run(client.close())
+
+
+def test_client_retries_with_its_own_parameters():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500, request=request)
+
+    client = OllamaClient("http://ollama", max_retries=2, retry_delay=0)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.generate(model="qwen", prompt="hi"))
+    assert len(calls) == 3
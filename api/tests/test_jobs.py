@@ -0,0 +1,30 @@
+import pytest
+
+
+SUBMISSION = {"type": "chat", "request": {"prompt": "hi"}}
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:11434/api/generate",
+    "http://localhost:8000/jobs",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://[::1]/hook",
+])
+def test_callbacks_to_internal_addresses_are_rejected(make_app, call_app, url):
+    app = make_app(jobs_enabled=True)
+    response = call_app(app, "POST", "/jobs", json={**SUBMISSION, "callback_url": url})
+    assert response.status_code == 422
+
+
+def test_callback_host_allowlist(make_app, call_app):
+    app = make_app(jobs_enabled=True, jobs_callback_allowed_hosts="hooks.example.org", jobs_callback_allow_private=True)
+    response = call_app(app, "POST", "/jobs", json={**SUBMISSION, "callback_url": "http://127.0.0.1/hook"})
+    assert response.status_code == 422
+    assert "not allowed" in response.json()["detail"]
+
+
+def test_private_callbacks_when_allowed(make_app, call_app):
+    app = make_app(jobs_enabled=True, jobs_callback_allowed_hosts="127.0.0.1", jobs_callback_allow_private=True)
+    response = call_app(app, "POST", "/jobs", json={**SUBMISSION, "callback_url": "http://127.0.0.1:9000/hook"})
+    assert response.status_code == 202
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.services.memory_monitor import MemoryMonitor
+
+
+def test_pressure_applies_one_num_ctx_to_every_request(make_app, call_app):
+    app = make_app(memory_pressure_num_ctx=2048)
+    services = app.state.container
+
+    call_app(app, "POST", "/chat", json={"prompt": "hi", "stream": False})
+    assert "num_ctx" not in services.ollama_client.calls[-1]
+
+    services.memory_monitor.level = "warning"
+    for options in ({}, {"num_ctx": 1024}, {"num_ctx": 8192}):
+        call_app(app, "POST", "/chat", json={"prompt": "hi", "stream": False, "options": options})
+        assert services.ollama_client.calls[-1]["num_ctx"] == 2048
+
+
+class PsClient:
+    """Ollama with one model loaded by someone else (warmup, another replica)"""
+
+    def __init__(self):
+        self.inflight = {}
+        self.last_used = {}
+        self.unloaded = []
+
+    async def list_running(self):
+        return {"models": [{"name": "llama", "size": 900}] if not self.unloaded else []}
+
+    async def unload(self, model):
+        self.unloaded.append(model)
+
+
+def test_models_loaded_elsewhere_are_idle_from_first_sight():
+    client = PsClient()
+    monitor = MemoryMonitor(client, ollama_memory_limit=1000, unload_idle_seconds=300, enabled=False)
+
+    asyncio.run(monitor.check())
+    assert monitor.level == "warning"
+    assert client.unloaded == []
+
+    monitor.first_seen["llama"] -= 301
+    asyncio.run(monitor.check())
+    assert client.unloaded == ["llama"]
@@ -0,0 +1,52 @@
+from array import array
+
+
+class StubBatcher:
+    """Every query embeds to the same vector: any lookup in a populated scope is a hit"""
+
+    async def embed(self, model, texts):
+        return [array("f", [1.0, 0.0, 0.0]) for _ in texts]
+
+    async def close(self):
+        pass
+
+
+def test_requested_options_are_part_of_the_cache_scope(make_app, call_app):
+    app = make_app(semantic_cache_enabled=True)
+    app.state.container.embedding_batcher = StubBatcher()
+    query = {"query": "How do I monitor memory?", "stream": False}
+
+    truncated = call_app(app, "POST", "/chat/structured", json={**query, "options": {"num_predict": 2}}).json()
+    assert truncated["response"] == "grafana grafana"
+
+    # Truncated answers are never stored
+    again = call_app(app, "POST", "/chat/structured", json={**query, "options": {"num_predict": 2}}).json()
+    assert not again["cached"]
+
+    default = call_app(app, "POST", "/chat/structured", json=query).json()
+    assert not default["cached"]
+    assert default["response"] != truncated["response"]
+
+    again = call_app(app, "POST", "/chat/structured", json=query).json()
+    assert again["cached"]
+    assert again["response"] == default["response"]
+
+    for options in ({"stop": ["\n"]}, {"temperature": 1.5}):
+        reply = call_app(app, "POST", "/chat/structured", json={**query, "options": options}).json()
+        assert not reply["cached"]
+
+
+def test_latency_budget_does_not_split_the_cache_scope(make_app, call_app, monkeypatch):
+    app = make_app(semantic_cache_enabled=True, structured_latency_budget_ms=2000)
+    services = app.state.container
+    services.embedding_batcher = StubBatcher()
+    # The budgeted num_predict moves with the measured token rate and the prompt length
+    budgets = iter([100, 150])
+    monkeypatch.setattr(services.generation_budget, "num_predict_for", lambda model, prompt, budget_ms: next(budgets))
+    query = {"query": "How do I monitor memory?", "stream": False}
+
+    first = call_app(app, "POST", "/chat/structured", json=query).json()
+    assert not first["cached"]
+    second = call_app(app, "POST", "/chat/structured", json=query).json()
+    assert second["cached"]
+    assert services.ollama_client.calls[0]["num_predict"] == 100
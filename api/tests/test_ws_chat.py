@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.routers.ws_chat import ChatSession
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+
+def test_cancel_before_turn_starts(make_app):
+    app = make_app()
+    websocket = RecordingWebSocket()
+
+    async def run():
+        session = ChatSession(websocket, app.state.container, "anonymous")
+        # Back to back: the turn's task has not run a single step when the cancel arrives
+        await session.handle(json.dumps({"type": "chat", "id": "t1", "prompt": "hi"}))
+        await session.handle(json.dumps({"type": "cancel", "id": "t1"}))
+        await asyncio.sleep(0.05)
+        assert session.turns == {}
+
+        # The id is free again
+        await session.handle(json.dumps({"type": "chat", "id": "t1", "prompt": "hi", "options": {"num_predict": 2}}))
+        await asyncio.sleep(0.2)
+        await session.close()
+
+    asyncio.run(run())
+    kinds = [frame["type"] for frame in websocket.frames]
+    assert kinds[0] == "cancelled"
+    assert "error" not in kinds
+    assert kinds[-1] == "done"
+
+
+def test_cancel_during_generation(make_app):
+    app = make_app()
+    with TestClient(app) as client, client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json({"type": "chat", "id": 1, "prompt": "hi", "options": {"num_predict": 200}})
+        assert websocket.receive_json()["type"] == "token"
+        websocket.send_json({"type": "cancel", "id": 1})
+        while (frame := websocket.receive_json())["type"] == "token":
+            pass
+        assert frame == {"type": "cancelled", "id": 1}
+
+
+def test_cancel_spends_no_error_budget(make_app):
+    app = make_app()
+    with TestClient(app) as client:
+        for _ in range(4):
+            assert client.post("/chat", json={"prompt": "hi", "stream": False}).status_code == 200
+        with client.websocket_connect("/ws/chat") as websocket:
+            websocket.send_json({"type": "chat", "id": 1, "prompt": "hi", "options": {"num_predict": 200}})
+            websocket.receive_json()
+            websocket.send_json({"type": "cancel", "id": 1})
+            while websocket.receive_json()["type"] != "cancelled":
+                pass
+
+        for window in client.get("/slo").json()["overall"].values():
+            assert window["count"] == 4
+            assert window["availability"] == 1.0
+            assert window["burn_rate"]["availability"] == 0.0
+        (usage,) = client.get("/usage").json()["usage"]
+        assert usage["requests"] == 5
+        assert usage["errors"] == 0
+
+
+def test_batch_turns_are_shed_under_memory_pressure(make_app):
+    app = make_app()
+    services = app.state.container
+    services.memory_monitor.level = "critical"
+    websocket = RecordingWebSocket()
+
+    async def run():
+        session = ChatSession(websocket, services, "anonymous")
+        await session.handle(json.dumps({"type": "chat", "id": "b", "prompt": "hi", "priority": "batch"}))
+        await session.handle(json.dumps({"type": "chat", "id": "i", "prompt": "hi", "options": {"num_predict": 2}}))
+        await asyncio.sleep(0.1)
+        await session.close()
+
+    asyncio.run(run())
+    shed = [frame for frame in websocket.frames if frame["id"] == "b"]
+    assert shed == [{
+        "type": "error", "id": "b", "error": "Memory pressure: batch traffic is paused", "retry_after": 5
+    }]
+    assert websocket.frames[-1]["type"] == "done" and websocket.frames[-1]["id"] == "i"
+    assert len(services.ollama_client.calls) == 1
+
+
+def test_batch_header_applies_to_every_turn(make_app):
+    app = make_app()
+    app.state.container.memory_monitor.level = "critical"
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/chat", headers={"X-Priority": "batch"}) as ws:
+            ws.send_json({"type": "chat", "id": 1, "prompt": "hi"})
+            assert ws.receive_json()["error"] == "Memory pressure: batch traffic is paused"
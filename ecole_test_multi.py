@@ -5,13 +5,21 @@ Teste les réponses de l'assistant avec validation automatique
 """
 
 import requests
+import httpx
+import asyncio
 import csv
+import hashlib
+import math
+import os
+import re
 import time
+import unicodedata
 import json
 import argparse
 from datetime import datetime
-from typing import List, Dict, Tuple
-from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 from colorama import init, Fore, Style
 import sys
 
@@ -26,7 +34,7 @@ API_URL = "http://localhost:8000/chat"
 MODEL = "qwen2.5:7b-instruct-q4_0"
 TIMEOUT = 30  # secondes
 
-SYSTEM_CONTEXT = """École Jeanne d'Arc - Informations
+SCHOOL_INFOS = """École Jeanne d'Arc - Informations
 
 INFOS:
 - Âges: 14 mois-18 ans (Crèche→Collège)
@@ -36,10 +44,15 @@ INFOS:
 - Devise: "Être - Grandir - Réussir"
 - Enseignants: Équipe marocaine et internationale
 - Facilités de paiement pour 3+ enfants
-
-RÈGLES: Réponse courte (1-2 phrases). Si info manquante → "Contactez 05 22 22 01 70"
 """
 
+SCHOOL_RULES = 'RÈGLES: Réponse courte (1-2 phrases). Si info manquante → "Contactez 05 22 22 01 70"'
+
+SYSTEM_CONTEXT = f"{SCHOOL_INFOS}\n{SCHOOL_RULES}\n"
+
+# Base de connaissances (--knowledge-base): une ligne d'INFOS par morceau indexé
+KNOWLEDGE_CHUNK_CHARS = 80
+
 # Questions de test avec catégories et réponses attendues pour validation
 QUESTIONS = [
     {
@@ -201,33 +214,272 @@ class TestResult:
     validation_score: int = 0
     expected_keywords: List[str] = None
     found_keywords: List[str] = None
+    ttft: float = None
+    question_id: str = None
+    completion_tokens: int = None
+    tokens_per_second: float = None
+
+class LatencyHistogram:
+    """Histogramme logarithmique (pas de 1%) : percentiles en mémoire constante"""
+    
+    GROWTH = math.log(1.01)
+    
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+    
+    def add(self, seconds: float) -> None:
+        index = round(math.log(max(seconds, 1e-4)) / self.GROWTH)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+    
+    def percentile(self, percent: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return math.exp(index * self.GROWTH)
+        return 0.0
+    
+    def summary(self) -> Dict:
+        """p50/p95/p99 arrondis en secondes"""
+        return {
+            "count": self.count,
+            "p50": round(self.percentile(50), 3),
+            "p95": round(self.percentile(95), 3),
+            "p99": round(self.percentile(99), 3)
+        }
+
+# ============================================================================
+# VALIDATION PAR MOTS-CLÉS
+# ============================================================================
+
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]+")
+
+def fold_text(text: str) -> str:
+    """Forme normalisée pour la comparaison: NFKD, sans accents, casefold ("Être" -> "etre")"""
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+class KeywordMatcher:
+    """
+    Recherche de tous les mots-clés d'une question en une seule passe
+    
+    Les mots-clés normalisés sont compilés en une seule regex (alternatives
+    de la plus longue à la plus courte, testées à chaque position via un
+    lookahead). Un mot-clé contenu dans un autre mot-clé trouvé est déduit
+    sans nouvelle recherche.
+    """
+    
+    def __init__(self, keywords: Tuple[str, ...], word_boundary: bool = False):
+        self.keywords = keywords
+        self.word_boundary = word_boundary
+        self._by_folded: Dict[str, List[str]] = {}
+        for keyword in keywords:
+            folded = fold_text(keyword).strip()
+            if folded:
+                self._by_folded.setdefault(folded, []).append(keyword)
+        
+        folded_keywords = sorted(self._by_folded, key=len, reverse=True)
+        self._pattern = None
+        if folded_keywords:
+            alternatives = "|".join(re.escape(k) for k in folded_keywords)
+            if word_boundary:
+                alternatives = rf"(?<!\w)(?:{alternatives})(?!\w)"
+            self._pattern = re.compile(rf"(?=({alternatives}))")
+        
+        # Mots-clés impliqués par la présence d'un mot-clé plus long
+        self._implied: Dict[str, List[str]] = {}
+        for longer in folded_keywords:
+            self._implied[longer] = [
+                shorter for shorter in folded_keywords
+                if shorter != longer and self._contains(longer, shorter)
+            ]
+    
+    def _contains(self, text: str, keyword: str) -> bool:
+        if self.word_boundary:
+            return re.search(rf"(?<!\w){re.escape(keyword)}(?!\w)", text) is not None
+        return keyword in text
+    
+    def find(self, text: str) -> List[str]:
+        """Mots-clés (forme originale, ordre d'origine) présents dans le texte"""
+        if self._pattern is None:
+            return []
+        matched = set()
+        for match in self._pattern.finditer(fold_text(text)):
+            folded = match.group(1)
+            if folded not in matched:
+                matched.add(folded)
+                matched.update(self._implied[folded])
+                if len(matched) == len(self._by_folded):
+                    break
+        return [keyword for keyword in self.keywords if fold_text(keyword).strip() in matched]
+
+@lru_cache(maxsize=4096)
+def compile_keywords(keywords: Tuple[str, ...], word_boundary: bool = False) -> KeywordMatcher:
+    """Matcher compilé une seule fois par liste de mots-clés"""
+    return KeywordMatcher(keywords, word_boundary)
+
+# ============================================================================
+# JEUX DE DONNÉES ET POINTS DE REPRISE
+# ============================================================================
+
+def question_id(question_data: Dict) -> str:
+    """Identifiant stable d'une question (champ id, sinon hash langue + texte)"""
+    if question_data.get("id"):
+        return str(question_data["id"])
+    key = f"{question_data.get('lang', '')}\x00{question_data['question']}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "oui", "y", "o")
+
+def load_dataset(path: str) -> Iterator[Dict]:
+    """
+    Lit les questions une à une depuis un fichier JSONL ou CSV
+    
+    JSONL: un objet par ligne (question, category, lang, expected_keywords, strict_validation, id optionnel)
+    CSV: mêmes colonnes, expected_keywords séparés par "|"
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {
+                    "id": row.get("id") or None,
+                    "question": row["question"],
+                    "category": row.get("category") or "general",
+                    "lang": row.get("lang") or "fr",
+                    "expected_keywords": [k.strip() for k in (row.get("expected_keywords") or "").split("|") if k.strip()],
+                    "strict_validation": parse_bool(row.get("strict_validation", True))
+                }
+        else:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    item.setdefault("category", "general")
+                    item.setdefault("lang", "fr")
+                    item.setdefault("expected_keywords", [])
+                    item.setdefault("strict_validation", True)
+                    yield item
+
+def token_stats(usage: Optional[Dict], duration: float, ttft: Optional[float] = None) -> Dict:
+    """
+    Débit de génération d'une réponse
+    
+    Utilise le temps de génération mesuré par Ollama (generation_ms) quand
+    l'API le renvoie, sinon le temps écoulé après le premier token.
+    """
+    tokens = (usage or {}).get("completion_tokens")
+    if not tokens:
+        return {"completion_tokens": tokens, "tokens_per_second": None}
+    generation_ms = usage.get("generation_ms")
+    seconds = generation_ms / 1000 if generation_ms else duration - (ttft or 0)
+    return {"completion_tokens": tokens, "tokens_per_second": tokens / seconds if seconds > 0 else None}
+
+def count_dataset(path: str) -> int:
+    """Compte les questions sans les charger en mémoire"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+        return sum(1 for line in f if line.strip())
+
+class ResultWriter:
+    """Écrit chaque résultat dès qu'il est disponible (CSV + JSONL de reprise)"""
+    
+    CSV_FIELDS = ["question", "category", "language", "response", "duration",
+                  "status", "validation", "validation_score", "found_keywords", "ttft", "id",
+                  "completion_tokens", "tokens_per_second"]
+    
+    def __init__(self, prefix: str):
+        self.csv_path = f"{prefix}.csv"
+        self.checkpoint_path = f"{prefix}_results.jsonl"
+        self.report_path = f"{prefix}_report.json"
+        self._csv_file = None
+        self._csv_writer = None
+        self._checkpoint = None
+    
+    def open(self) -> None:
+        new_csv = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+        self._csv_file = open(self.csv_path, "a", newline="", encoding="utf-8")
+        self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=self.CSV_FIELDS)
+        if new_csv:
+            self._csv_writer.writeheader()
+        self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+    
+    def write(self, result: TestResult) -> None:
+        self._csv_writer.writerow({
+            "question": result.question,
+            "category": result.category,
+            "language": result.language,
+            "response": result.response,
+            "duration": round(result.duration, 3),
+            "status": result.status,
+            "validation": result.validation,
+            "validation_score": result.validation_score,
+            "found_keywords": ", ".join(result.found_keywords) if result.found_keywords else "",
+            "ttft": round(result.ttft, 3) if result.ttft is not None else "",
+            "id": result.question_id,
+            "completion_tokens": result.completion_tokens if result.completion_tokens is not None else "",
+            "tokens_per_second": round(result.tokens_per_second, 2) if result.tokens_per_second is not None else ""
+        })
+        self._checkpoint.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+        # Flush à chaque résultat: un crash ne perd que la requête en cours
+        self._csv_file.flush()
+        self._checkpoint.flush()
+    
+    def read_checkpoint(self) -> Iterator[TestResult]:
+        """Relit les résultats déjà enregistrés (un par ligne)"""
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield TestResult(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    # Dernière ligne tronquée par un arrêt brutal
+                    continue
+    
+    def close(self) -> None:
+        for f in (self._csv_file, self._checkpoint):
+            if f is not None:
+                f.close()
 
 class APITester:
     """Classe principale pour tester l'API"""
     
-    def __init__(self, api_url: str, model: str, system_context: str):
+    def __init__(self, api_url: str, model: str, system_context: str, writer: Optional[ResultWriter] = None,
+                 word_boundary: bool = False, knowledge_base: Optional[str] = None, top_k: Optional[int] = None):
         self.api_url = api_url
+        # Avec une base de connaissances, /chat/structured n'insère que les morceaux pertinents
+        self.knowledge_base = knowledge_base
+        self.top_k = top_k
+        self.word_boundary = word_boundary
         self.model = model
         self.system_context = system_context
-        self.results: List[TestResult] = []
+        self.writer = writer
+        # Agrégats mis à jour au fil de l'eau (mémoire constante)
+        self.category_stats: Dict[str, Dict] = {}
+        self.latency = {"overall": LatencyHistogram(), "by_category": {}, "by_language": {}, "ttft": LatencyHistogram()}
         self.stats = {
             "total": 0,
             "success": 0,
             "errors": 0,
             "validation_passed": 0,
             "validation_failed": 0,
-            "total_duration": 0
+            "total_duration": 0,
+            # Durée des seules réponses réussies (base de la durée moyenne)
+            "success_duration": 0
         }
+        self.generation = {"tokens": 0, "seconds": 0.0}
     
     def validate_response(self, response: str, expected_keywords: List[str], strict: bool = True) -> Tuple[str, int, List[str]]:
-        """Valide une réponse par rapport aux mots-clés attendus"""
-        response_lower = response.lower()
-        found_keywords = []
-        
-        for keyword in expected_keywords:
-            keyword_lower = keyword.lower()
-            if keyword_lower in response_lower:
-                found_keywords.append(keyword)
+        """Valide une réponse par rapport aux mots-clés attendus (insensible à la casse et aux accents)"""
+        matcher = compile_keywords(tuple(expected_keywords), self.word_boundary)
+        found_keywords = matcher.find(response)
         
         score = len(found_keywords)
         
@@ -244,21 +496,72 @@ class APITester:
             else:
                 return "partial", score, found_keywords
     
-    def send_request(self, question_data: Dict) -> TestResult:
-        """Envoie une requête à l'API et retourne le résultat"""
-        prompt = f"{self.system_context}\n\nQuestion: {question_data['question']}\nRéponse:"
-        
-        data = {
-            "prompt": prompt,
+    def build_prompt(self, question_data: Dict) -> str:
+        """Construit le prompt envoyé à l'API"""
+        return f"{self.system_context}\n\nQuestion: {question_data['question']}\nRéponse:"
+    
+    def build_payload(self, question_data: Dict, stream: bool = False) -> Tuple[str, Dict]:
+        """URL et corps de la requête: prompt complet sur /chat, ou retrieval sur /chat/structured"""
+        if self.knowledge_base:
+            return structured_url(self.api_url), {
+                "query": question_data["question"],
+                "rules": SCHOOL_RULES,
+                "knowledge_base": self.knowledge_base,
+                "top_k": self.top_k,
+                "model": self.model,
+                "stream": stream
+            }
+        return self.api_url, {
+            "prompt": self.build_prompt(question_data),
             "model": self.model,
-            "stream": False
+            "stream": stream
         }
+    
+    def build_success_result(self, question_data: Dict, response_text: str, duration: float,
+                             ttft: Optional[float] = None, usage: Optional[Dict] = None) -> TestResult:
+        """Valide une réponse reçue et construit le résultat (usage: compteurs de tokens renvoyés par l'API)"""
+        validation_status, score, found_keywords = self.validate_response(
+            response_text,
+            question_data["expected_keywords"],
+            question_data["strict_validation"]
+        )
+        
+        return TestResult(
+            question=question_data["question"],
+            category=question_data["category"],
+            language=question_data["lang"],
+            response=response_text,
+            duration=duration,
+            status="success",
+            validation=validation_status,
+            validation_score=score,
+            expected_keywords=question_data["expected_keywords"],
+            found_keywords=found_keywords,
+            ttft=ttft,
+            **token_stats(usage, duration, ttft)
+        )
+    
+    def build_error_result(self, question_data: Dict, response: str, duration: float, status: str) -> TestResult:
+        """Construit un résultat d'erreur"""
+        return TestResult(
+            question=question_data["question"],
+            category=question_data["category"],
+            language=question_data["lang"],
+            response=response,
+            duration=duration,
+            status=status,
+            expected_keywords=question_data["expected_keywords"]
+        )
+    
+    def send_request(self, question_data: Dict) -> TestResult:
+        """Envoie une requête à l'API et retourne le résultat"""
+        url, data = self.build_payload(question_data)
         
         start_time = time.time()
         
         try:
             response = requests.post(
-                self.api_url, 
+                url, 
                 json=data, 
                 timeout=TIMEOUT,
                 headers={"Content-Type": "application/json"}
@@ -266,27 +569,9 @@ class APITester:
             duration = time.time() - start_time
             
             if response.status_code == 200:
-                response_text = response.json().get("response", "").strip()
-                
-                # Validation de la réponse
-                validation_status, score, found_keywords = self.validate_response(
-                    response_text,
-                    question_data["expected_keywords"],
-                    question_data["strict_validation"]
-                )
-                
-                return TestResult(
-                    question=question_data["question"],
-                    category=question_data["category"],
-                    language=question_data["lang"],
-                    response=response_text,
-                    duration=duration,
-                    status="success",
-                    validation=validation_status,
-                    validation_score=score,
-                    expected_keywords=question_data["expected_keywords"],
-                    found_keywords=found_keywords
-                )
+                payload = response.json()
+                response_text = payload.get("response", "").strip()
+                return self.build_success_result(question_data, response_text, duration, usage=payload)
             else:
                 return TestResult(
                     question=question_data["question"],
@@ -329,92 +614,199 @@ class APITester:
                 expected_keywords=question_data["expected_keywords"]
             )
     
-    def run_tests(self, questions: List[Dict], delay: float = 0.5) -> None:
-        """Exécute tous les tests"""
-        self.stats["total"] = len(questions)
-        
+    def print_header(self, total: Optional[int], mode: str = "séquentiel") -> None:
+        """Affiche l'en-tête d'une exécution"""
         print(f"\n{Fore.CYAN}{'='*70}")
         print(f"{Fore.CYAN}  ÉCOLE JEANNE D'ARC - TEST AUTOMATISÉ COMPLET")
         print(f"{Fore.CYAN}{'='*70}")
         print(f"{Fore.YELLOW}Modèle: {self.model}")
-        print(f"{Fore.YELLOW}Questions: {len(questions)}")
+        print(f"{Fore.YELLOW}Questions: {total if total is not None else '?'}")
+        print(f"{Fore.YELLOW}Mode: {mode}")
         print(f"{Fore.YELLOW}Début: {datetime.now().strftime('%H:%M:%S')}")
         print(f"{Fore.CYAN}{'-'*70}\n")
+    
+    def print_question(self, index: int, total: Optional[int], question_data: Dict) -> None:
+        """Affiche la progression pour une question"""
+        progress = f"[{index}/{total}]" if total else f"[{index}]"
+        category = f"[{question_data['category']}]"
+        lang = f"[{question_data['lang'].upper()}]"
         
-        for i, question_data in enumerate(questions, 1):
-            # Affichage de la progression
-            progress = f"[{i}/{len(questions)}]"
-            category = f"[{question_data['category']}]"
-            lang = f"[{question_data['lang'].upper()}]"
-            
-            print(f"{Fore.WHITE}{progress} {Fore.GREEN}{category} {Fore.BLUE}{lang} {Fore.WHITE}{question_data['question']}")
-            
-            # Envoi de la requête
-            result = self.send_request(question_data)
-            self.results.append(result)
-            
-            # Mise à jour des statistiques
-            self.stats["total_duration"] += result.duration
+        print(f"{Fore.WHITE}{progress} {Fore.GREEN}{category} {Fore.BLUE}{lang} {Fore.WHITE}{question_data['question']}")
+    
+    def update_stats(self, result: TestResult) -> str:
+        """Met à jour les agrégats avec un résultat; retourne l'indicateur de validation"""
+        self.stats["total"] += 1
+        self.stats["total_duration"] += result.duration
+        
+        category = self.category_stats.setdefault(result.category, {"total": 0, "success": 0, "passed": 0})
+        category["total"] += 1
+        if result.status == "success":
+            self.stats["success_duration"] += result.duration
+            category["success"] += 1
+            if result.validation == "passed" or result.validation == "partial":
+                category["passed"] += 1
+            self.latency["overall"].add(result.duration)
+            self.latency["by_category"].setdefault(result.category, LatencyHistogram()).add(result.duration)
+            self.latency["by_language"].setdefault(result.language, LatencyHistogram()).add(result.duration)
+            if result.ttft is not None:
+                self.latency["ttft"].add(result.ttft)
+            if result.tokens_per_second:
+                self.generation["tokens"] += result.completion_tokens
+                self.generation["seconds"] += result.completion_tokens / result.tokens_per_second
+        
+        if result.status == "success":
+            self.stats["success"] += 1
             
-            if result.status == "success":
-                self.stats["success"] += 1
-                
-                # Validation
-                if result.validation == "passed":
-                    self.stats["validation_passed"] += 1
-                    validation_indicator = f"{Fore.GREEN}✓"
-                elif result.validation == "partial":
-                    self.stats["validation_passed"] += 1  # On compte partial comme passed
-                    validation_indicator = f"{Fore.YELLOW}⚠"
-                else:
-                    self.stats["validation_failed"] += 1
-                    validation_indicator = f"{Fore.RED}✗"
+            # Validation
+            if result.validation == "passed":
+                self.stats["validation_passed"] += 1
+                validation_indicator = f"{Fore.GREEN}✓"
+            elif result.validation == "partial":
+                self.stats["validation_passed"] += 1  # On compte partial comme passed
+                validation_indicator = f"{Fore.YELLOW}⚠"
             else:
-                self.stats["errors"] += 1
+                self.stats["validation_failed"] += 1
                 validation_indicator = f"{Fore.RED}✗"
+        else:
+            self.stats["errors"] += 1
+            validation_indicator = f"{Fore.RED}✗"
+        
+        return validation_indicator
+    
+    def record_result(self, result: TestResult, question_data: Dict) -> None:
+        """Enregistre un résultat (fichiers + statistiques) et l'affiche"""
+        result.question_id = question_id(question_data)
+        if self.writer is not None:
+            self.writer.write(result)
+        validation_indicator = self.update_stats(result)
+        
+        # Affichage du résultat
+        if result.status == "success":
+            # Tronquer la réponse si trop longue
+            response_preview = result.response
+            if len(response_preview) > 100:
+                response_preview = response_preview[:97] + "..."
             
-            # Affichage du résultat
+            ttft = f" (TTFT {result.ttft:.3f}s)" if result.ttft is not None else ""
+            print(f"  {validation_indicator} {Fore.WHITE}{response_preview}")
+            print(f"  {Fore.CYAN}⏱ {result.duration:.3f}s{ttft} | "
+                  f"{Fore.YELLOW}Score: {result.validation_score}/{len(result.expected_keywords)} | "
+                  f"{Fore.MAGENTA}Keywords: {', '.join(result.found_keywords) if result.found_keywords else 'none'}")
+        else:
+            print(f"  {validation_indicator} {Fore.RED}{result.status}: {result.response}")
+        
+        print()
+    
+    def load_checkpoint(self) -> Set[str]:
+        """
+        Réintègre les réponses réussies d'une exécution précédente; retourne leurs ids
+        
+        Les questions en échec (timeout, connexion, erreur HTTP) sont relancées. Pour un même id,
+        le dernier résultat enregistré remplace les précédents (une question relancée avec succès).
+        """
+        if self.writer is None:
+            return set()
+        latest = {result.question_id: result for result in self.writer.read_checkpoint()}
+        done = set()
+        for result in latest.values():
             if result.status == "success":
-                # Tronquer la réponse si trop longue
-                response_preview = result.response
-                if len(response_preview) > 100:
-                    response_preview = response_preview[:97] + "..."
-                
-                print(f"  {validation_indicator} {Fore.WHITE}{response_preview}")
-                print(f"  {Fore.CYAN}⏱ {result.duration:.3f}s | "
-                      f"{Fore.YELLOW}Score: {result.validation_score}/{len(result.expected_keywords)} | "
-                      f"{Fore.MAGENTA}Keywords: {', '.join(result.found_keywords) if result.found_keywords else 'none'}")
-            else:
-                print(f"  {validation_indicator} {Fore.RED}{result.status}: {result.response}")
-            
-            print()
-            
+                done.add(result.question_id)
+                self.update_stats(result)
+        return done
+    
+    def run_tests(self, questions: Iterable[Dict], delay: float = 0.5, total: Optional[int] = None) -> None:
+        """Exécute tous les tests"""
+        self.print_header(total)
+        
+        for i, question_data in enumerate(questions, 1):
             # Pause entre les requêtes
-            if i < len(questions):
+            if i > 1:
                 time.sleep(delay)
+            
+            self.print_question(i, total, question_data)
+            
+            # Envoi de la requête
+            result = self.send_request(question_data)
+            self.record_result(result, question_data)
+    
+    async def send_request_async(self, client: httpx.AsyncClient, question_data: Dict,
+                                 stream: bool = False) -> TestResult:
+        """Envoie une requête avec le client asynchrone partagé (streaming optionnel pour le TTFT)"""
+        url, data = self.build_payload(question_data, stream)
+        
+        start_time = time.perf_counter()
+        
+        try:
+            if not stream:
+                response = await client.post(url, json=data)
+                duration = time.perf_counter() - start_time
+                if response.status_code != 200:
+                    return self.build_error_result(question_data, f"HTTP {response.status_code}: {response.text}",
+                                                   duration, f"error_{response.status_code}")
+                payload = response.json()
+                response_text = payload.get("response", "").strip()
+                return self.build_success_result(question_data, response_text, duration, usage=payload)
+            
+            ttft = None
+            final_chunk = None
+            parts = []
+            async with client.stream("POST", url, json=data) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    return self.build_error_result(question_data, f"HTTP {response.status_code}: {body}",
+                                                   time.perf_counter() - start_time, f"error_{response.status_code}")
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        return self.build_error_result(question_data, chunk["error"],
+                                                       time.perf_counter() - start_time, "exception")
+                    if chunk.get("response"):
+                        if ttft is None:
+                            ttft = time.perf_counter() - start_time
+                        parts.append(chunk["response"])
+                    if chunk.get("done"):
+                        final_chunk = chunk
+            duration = time.perf_counter() - start_time
+            return self.build_success_result(question_data, "".join(parts).strip(), duration, ttft, final_chunk)
+        
+        except httpx.TimeoutException:
+            return self.build_error_result(question_data, "Timeout", TIMEOUT, "timeout")
+        except httpx.ConnectError:
+            return self.build_error_result(question_data, "Connection Error", 0, "connection_error")
+        except Exception as e:
+            return self.build_error_result(question_data, str(e), time.perf_counter() - start_time, "exception")
+    
+    async def run_tests_async(self, questions: Iterable[Dict], concurrency: int = 4, stream: bool = False,
+                              total: Optional[int] = None) -> None:
+        """Exécute les tests en parallèle avec un client HTTP mutualisé"""
+        mode = f"asyncio, concurrence {concurrency}" + (", streaming" if stream else "")
+        self.print_header(total, mode)
+        
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        # Itérateur partagé: les workers tirent les questions au fur et à mesure
+        pending = enumerate(questions, 1)
+        
+        async with httpx.AsyncClient(timeout=TIMEOUT, limits=limits) as client:
+            async def worker() -> None:
+                for index, question_data in pending:
+                    result = await self.send_request_async(client, question_data, stream)
+                    self.print_question(index, total, question_data)
+                    self.record_result(result, question_data)
+            
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
     
     def generate_report(self) -> Dict:
         """Génère un rapport détaillé des tests"""
-        if not self.results:
+        if self.stats["total"] == 0:
             return {}
         
         # Calculs statistiques
-        avg_duration = self.stats["total_duration"] / self.stats["success"] if self.stats["success"] > 0 else 0
+        avg_duration = self.stats["success_duration"] / self.stats["success"] if self.stats["success"] > 0 else 0
         success_rate = (self.stats["success"] / self.stats["total"]) * 100 if self.stats["total"] > 0 else 0
         validation_rate = (self.stats["validation_passed"] / self.stats["success"]) * 100 if self.stats["success"] > 0 else 0
         
-        # Analyse par catégorie
-        category_stats = {}
-        for result in self.results:
-            if result.category not in category_stats:
-                category_stats[result.category] = {"total": 0, "success": 0, "passed": 0}
-            
-            category_stats[result.category]["total"] += 1
-            if result.status == "success":
-                category_stats[result.category]["success"] += 1
-                if result.validation == "passed" or result.validation == "partial":
-                    category_stats[result.category]["passed"] += 1
-        
         return {
             "summary": {
                 "total_questions": self.stats["total"],
@@ -427,44 +819,205 @@ class APITester:
                 "average_duration": round(avg_duration, 3),
                 "total_duration": round(self.stats["total_duration"], 2)
             },
-            "category_stats": category_stats,
+            "category_stats": self.category_stats,
+            "latency": {
+                "overall": self.latency["overall"].summary(),
+                "by_category": {name: hist.summary() for name, hist in self.latency["by_category"].items()},
+                "by_language": {name: hist.summary() for name, hist in self.latency["by_language"].items()},
+                "ttft": self.latency["ttft"].summary() if self.latency["ttft"].count else None
+            },
+            "generation": {
+                "completion_tokens": self.generation["tokens"],
+                "tokens_per_second": round(self.generation["tokens"] / self.generation["seconds"], 2)
+                if self.generation["seconds"] > 0 else None
+            },
             "timestamp": datetime.now().isoformat(),
             "model": self.model
         }
     
-    def save_results(self, filename: str = None) -> str:
-        """Sauvegarde les résultats dans un fichier CSV"""
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"ecole_test_results_{timestamp}.csv"
-        
-        # Fichier CSV principal
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = ["question", "category", "language", "response", "duration", 
-                         "status", "validation", "validation_score", "found_keywords"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for result in self.results:
-                writer.writerow({
-                    "question": result.question,
-                    "category": result.category,
-                    "language": result.language,
-                    "response": result.response,
-                    "duration": round(result.duration, 3),
-                    "status": result.status,
-                    "validation": result.validation,
-                    "validation_score": result.validation_score,
-                    "found_keywords": ", ".join(result.found_keywords) if result.found_keywords else ""
-                })
-        
-        # Fichier JSON avec le rapport
+    def save_results(self) -> Tuple[str, str]:
+        """Écrit le rapport JSON (les résultats CSV/JSONL sont écrits au fil de l'eau)"""
         report = self.generate_report()
-        json_filename = filename.replace('.csv', '_report.json')
-        with open(json_filename, 'w', encoding='utf-8') as f:
+        with open(self.writer.report_path, 'w', encoding='utf-8') as f:
             json.dump(report, f, indent=2, ensure_ascii=False)
         
-        return filename, json_filename
+        return self.writer.csv_path, self.writer.report_path
+
+# ============================================================================
+# MATRICE MODÈLES × CONCURRENCE
+# ============================================================================
+
+MATRIX_FIELDS = ["model", "concurrency", "questions", "success_rate", "pass_rate", "tokens_per_second",
+                 "ttft_p50", "ttft_p95", "latency_p50", "latency_p95", "throughput_qps",
+                 "peak_model_memory_mb", "peak_total_memory_mb", "wall_seconds"]
+
+class BackendMemoryPoller:
+    """Échantillonne /api/ps d'Ollama pendant une cellule et garde le pic mémoire"""
+    
+    def __init__(self, ollama_url: str, model: str, interval: float = 1.0):
+        self.url = f"{ollama_url.rstrip('/')}/api/ps"
+        self.model = model
+        self.interval = interval
+        self.peak_model = 0
+        self.peak_total = 0
+        self.samples = 0
+    
+    async def run(self, client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                response = await client.get(self.url, timeout=5.0)
+                models = response.json().get("models", [])
+                self.samples += 1
+                self.peak_total = max(self.peak_total, sum(m.get("size", 0) for m in models))
+                for loaded in models:
+                    if self.model in (loaded.get("name"), loaded.get("model")):
+                        self.peak_model = max(self.peak_model, loaded.get("size", 0))
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(self.interval)
+    
+    def summary(self) -> Dict:
+        if not self.samples:
+            return {"peak_model_memory_mb": None, "peak_total_memory_mb": None}
+        return {
+            "peak_model_memory_mb": round(self.peak_model / 2**20, 1),
+            "peak_total_memory_mb": round(self.peak_total / 2**20, 1)
+        }
+
+def api_root(api_url: str) -> str:
+    """http://host:8000/chat -> http://host:8000"""
+    return api_url.rstrip("/").rsplit("/chat", 1)[0]
+
+def structured_url(api_url: str) -> str:
+    return f"{api_root(api_url)}/chat/structured"
+
+def register_knowledge(api_url: str, name: str) -> int:
+    """(Ré)indexe SCHOOL_INFOS dans la base de connaissances de l'API, retourne le nombre de morceaux"""
+    response = requests.post(
+        f"{api_root(api_url)}/knowledge/{name}/documents",
+        json={"documents": [{"id": "infos", "text": SCHOOL_INFOS}], "chunk_chars": KNOWLEDGE_CHUNK_CHARS},
+        timeout=TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()["indexed"]["infos"]
+
+def open_questions(dataset: Optional[str]) -> Tuple[Iterator[Dict], int]:
+    """Itérateur de questions et leur nombre (jeu de données ou QUESTIONS)"""
+    if dataset:
+        return load_dataset(dataset), count_dataset(dataset)
+    return iter(QUESTIONS), len(QUESTIONS)
+
+def cell_prefix(prefix: str, model: str, concurrency: int) -> str:
+    return f"{prefix}_{re.sub(r'[^A-Za-z0-9.-]+', '-', model)}_c{concurrency}"
+
+async def run_matrix_cell(args, prefix: str, model: str, concurrency: int) -> Dict:
+    """Exécute le jeu de questions pour un modèle et un niveau de concurrence"""
+    writer = ResultWriter(cell_prefix(prefix, model, concurrency))
+    tester = APITester(args.url, model, SYSTEM_CONTEXT, writer=writer, word_boundary=args.word_boundary,
+                       knowledge_base=args.knowledge_base, top_k=args.top_k)
+    done = tester.load_checkpoint() if args.resume else set()
+    questions, total = open_questions(args.dataset)
+    questions = (q for q in questions if question_id(q) not in done)
+    
+    poller = BackendMemoryPoller(args.ollama_url, model)
+    writer.open()
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient() as client:
+            polling = asyncio.create_task(poller.run(client))
+            try:
+                # Streaming obligatoire: le TTFT fait partie de la matrice
+                await tester.run_tests_async(questions, concurrency, True, max(0, total - len(done)))
+            finally:
+                polling.cancel()
+    finally:
+        writer.close()
+    wall = time.perf_counter() - start
+    
+    report = tester.generate_report()
+    if not report:
+        return {"model": model, "concurrency": concurrency, "questions": 0}
+    tester.save_results()
+    
+    summary, latency = report["summary"], report["latency"]
+    ttft = latency["ttft"] or {}
+    overall = latency["overall"] if latency["overall"]["count"] else {}
+    return {
+        "model": model,
+        "concurrency": concurrency,
+        "questions": summary["total_questions"],
+        "success_rate": summary["success_rate"],
+        "pass_rate": summary["validation_rate"],
+        "tokens_per_second": report["generation"]["tokens_per_second"],
+        "ttft_p50": ttft.get("p50"),
+        "ttft_p95": ttft.get("p95"),
+        "latency_p50": overall.get("p50"),
+        "latency_p95": overall.get("p95"),
+        "throughput_qps": round((summary["total_questions"] - len(done)) / wall, 3) if wall > 0 else None,
+        **poller.summary(),
+        "wall_seconds": round(wall, 2)
+    }
+
+def recommend(cells: List[Dict], quality_bar: float) -> Optional[Dict]:
+    """Cellule la plus rapide (p95) dont le taux de validation atteint le seuil"""
+    eligible = [
+        cell for cell in cells
+        if cell.get("latency_p95") is not None and (cell.get("pass_rate") or 0) >= quality_bar
+    ]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda cell: (cell["latency_p95"], -(cell.get("tokens_per_second") or 0)))
+
+def run_matrix(args, prefix: str) -> int:
+    """Exécute toute la matrice et écrit le rapport combiné; retourne le code de sortie"""
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    levels = [int(c) for c in args.concurrency_levels.split(",") if c.strip()]
+    
+    cells = []
+    for model in models:
+        for concurrency in levels:
+            print(f"{Fore.MAGENTA}▶ {model} × concurrence {concurrency}")
+            cells.append(asyncio.run(run_matrix_cell(args, prefix, model, concurrency)))
+    
+    best = recommend(cells, args.quality_bar)
+    matrix = {
+        "models": models,
+        "concurrency_levels": levels,
+        "quality_bar": args.quality_bar,
+        "cells": cells,
+        "recommendation": best,
+        "timestamp": datetime.now().isoformat()
+    }
+    with open(f"{prefix}_matrix.json", "w", encoding="utf-8") as f:
+        json.dump(matrix, f, indent=2, ensure_ascii=False)
+    with open(f"{prefix}_matrix.csv", "w", newline="", encoding="utf-8") as f:
+        matrix_writer = csv.DictWriter(f, fieldnames=MATRIX_FIELDS, extrasaction="ignore")
+        matrix_writer.writeheader()
+        matrix_writer.writerows(cells)
+    
+    def show(value, fmt: str) -> str:
+        return format(value, fmt) if value is not None else "-"
+    
+    print(f"{Fore.CYAN}{'='*70}")
+    print(f"{Fore.CYAN}  MATRICE MODÈLES × CONCURRENCE")
+    print(f"{Fore.CYAN}{'='*70}")
+    print(f"{Fore.WHITE}{'modèle':32} {'conc':>4} {'valid%':>7} {'tok/s':>7} {'ttft95':>7} {'p95':>7} {'mém MB':>8}")
+    for cell in cells:
+        print(f"{Fore.WHITE}{cell['model'][:32]:32} {cell['concurrency']:>4} "
+              f"{show(cell.get('pass_rate'), '.1f'):>7} {show(cell.get('tokens_per_second'), '.1f'):>7} "
+              f"{show(cell.get('ttft_p95'), '.2f'):>7} {show(cell.get('latency_p95'), '.2f'):>7} "
+              f"{show(cell.get('peak_model_memory_mb'), '.0f'):>8}")
+    
+    print(f"\n{Fore.GREEN}✅ Fichiers sauvegardés:")
+    print(f"   {Fore.WHITE}• {prefix}_matrix.json")
+    print(f"   {Fore.WHITE}• {prefix}_matrix.csv")
+    
+    if best is None:
+        print(f"\n{Fore.RED}⚠️  Aucun modèle n'atteint {args.quality_bar}% de validation")
+        return 1
+    print(f"\n{Fore.GREEN}★ Recommandé: {best['model']} (concurrence {best['concurrency']}, "
+          f"p95 {best['latency_p95']:.2f}s, validation {best['pass_rate']}%)")
+    return 0
 
 # ============================================================================
 # FONCTION PRINCIPALE
@@ -477,24 +1030,78 @@ def main():
     parser.add_argument("--model", default=MODEL, help="Modèle à utiliser")
     parser.add_argument("--delay", type=float, default=0.3, help="Délai entre les requêtes")
     parser.add_argument("--output", help="Nom du fichier de sortie (sans extension)")
+    parser.add_argument("--word-boundary", action="store_true",
+                        help="Les mots-clés doivent correspondre à des mots entiers")
+    parser.add_argument("--dataset", help="Fichier de questions JSONL ou CSV (par défaut: QUESTIONS)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprend depuis <output>_results.jsonl en sautant les questions déjà réussies (les échecs sont relancés)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Mode asyncio: requêtes concurrentes avec un client mutualisé")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes simultanées en mode --async")
+    parser.add_argument("--stream", action="store_true", help="Réponses en streaming pour mesurer le TTFT (--async)")
+    parser.add_argument("--models", help="Matrice: modèles séparés par des virgules (active le mode matrice)")
+    parser.add_argument("--concurrency-levels", default="1,4",
+                        help="Matrice: niveaux de concurrence séparés par des virgules")
+    parser.add_argument("--ollama-url", default="http://localhost:11434",
+                        help="Matrice: URL d'Ollama pour le pic mémoire (/api/ps)")
+    parser.add_argument("--quality-bar", type=float, default=80.0,
+                        help="Matrice: taux de validation minimal (%%) pour la recommandation")
+    parser.add_argument("--knowledge-base",
+                        help="Enregistre les INFOS dans cette base de l'API et passe par /chat/structured (retrieval BM25)")
+    parser.add_argument("--top-k", type=int, default=3, help="Morceaux de la base insérés par question")
     args = parser.parse_args()
     
+    if args.resume and not args.output:
+        parser.error("--resume nécessite --output (préfixe de l'exécution à reprendre)")
+    
+    prefix = args.output or f"ecole_test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    writer = ResultWriter(prefix)
+    
+    if args.knowledge_base:
+        try:
+            chunks = register_knowledge(args.url, args.knowledge_base)
+        except requests.RequestException as e:
+            print(f"{Fore.RED}❌ Enregistrement de la base de connaissances impossible: {e}")
+            sys.exit(1)
+        print(f"{Fore.CYAN}📚 Base '{args.knowledge_base}': {chunks} morceaux indexés (top-{args.top_k} par question)")
+    
+    if args.models:
+        try:
+            sys.exit(run_matrix(args, prefix))
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}⚠  Matrice interrompue (reprendre avec --output {prefix} --resume)")
+            sys.exit(130)
+    
     try:
         # Initialisation du testeur
-        tester = APITester(args.url, args.model, SYSTEM_CONTEXT)
+        tester = APITester(args.url, args.model, SYSTEM_CONTEXT, writer=writer, word_boundary=args.word_boundary,
+                           knowledge_base=args.knowledge_base, top_k=args.top_k)
+        done = tester.load_checkpoint() if args.resume else set()
+        if done:
+            print(f"{Fore.YELLOW}↻ Reprise: {len(done)} questions déjà réussies")
+        
+        questions, total = open_questions(args.dataset)
+        questions = (q for q in questions if question_id(q) not in done)
+        total = max(0, total - len(done))
         
         # Exécution des tests
-        tester.run_tests(QUESTIONS, args.delay)
+        writer.open()
+        try:
+            if args.use_async:
+                asyncio.run(tester.run_tests_async(questions, args.concurrency, args.stream, total))
+            else:
+                tester.run_tests(questions, args.delay, total)
+        finally:
+            writer.close()
         
         # Génération du rapport
         report = tester.generate_report()
+        if not report:
+            print(f"{Fore.YELLOW}Aucun résultat à rapporter")
+            sys.exit(0)
         
         # Sauvegarde des résultats
-        if args.output:
-            csv_file = f"{args.output}.csv"
-            json_file = f"{args.output}_report.json"
-        else:
-            csv_file, json_file = tester.save_results()
+        csv_file, json_file = tester.save_results()
         
         # Affichage du résumé
         print(f"{Fore.CYAN}{'='*70}")
@@ -522,6 +1129,19 @@ def main():
                   f"{Fore.CYAN}Succès: {stats['success']:2} ({success_rate:5.1f}%) | "
                   f"{Fore.YELLOW}Validation: {stats['passed']:2} ({validation_rate:5.1f}%)")
         
+        print(f"\n{Fore.CYAN}{'-'*70}")
+        print(f"{Fore.CYAN}  LATENCE (p50 / p95 / p99)")
+        print(f"{Fore.CYAN}{'-'*70}")
+        latency = report["latency"]
+        for group in ("by_category", "by_language"):
+            for name, values in latency[group].items():
+                print(f"{Fore.WHITE}{name:15} | "
+                      f"{Fore.CYAN}{values['p50']:.3f}s / {values['p95']:.3f}s / {values['p99']:.3f}s "
+                      f"{Fore.WHITE}(n={values['count']})")
+        if latency["ttft"]:
+            ttft = latency["ttft"]
+            print(f"{Fore.YELLOW}{'TTFT':15} | {ttft['p50']:.3f}s / {ttft['p95']:.3f}s / {ttft['p99']:.3f}s")
+        
         print(f"\n{Fore.GREEN}✅ Fichiers sauvegardés:")
         print(f"   {Fore.WHITE}• {csv_file}")
         print(f"   {Fore.WHITE}• {json_file}")
@@ -536,6 +1156,7 @@ def main():
             
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}⚠  Test interrompu par l'utilisateur")
+        print(f"{Fore.YELLOW}   Résultats conservés dans {writer.checkpoint_path} (reprendre avec --output {prefix} --resume)")
         sys.exit(130)
     except Exception as e:
         print(f"\n{Fore.RED}✗ Erreur critique: {e}")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for the Ollama server
+
+Implements /api/generate (streaming and non-streaming), /api/chat, /api/tags,
+/api/ps and /api/embed with configurable token rates, model load delays,
+parallel slots, failures and latency spikes, so the API can be benchmarked
+and tested on a plain machine without downloading a model.
+
+    python scripts/mock_ollama.py --port 11434 --tokens-per-sec 25 --parallel 1
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+WORDS = (
+    "the model answers with a short deterministic sentence about monitoring latency "
+    "memory containers prometheus grafana docker metrics tokens school crèche cantine "
+    "transport inscription contact devise être grandir réussir"
+).split()
+
+NANOSECONDS = 1_000_000_000
+
+
+class MockConfig:
+    """Runtime behaviour of the mock server"""
+
+    def __init__(
+        self,
+        models: List[str],
+        tokens_per_sec: float = 25.0,
+        prompt_tokens_per_sec: float = 250.0,
+        load_delay: float = 2.0,
+        parallel: int = 1,
+        max_loaded_models: int = 1,
+        response_tokens: int = 48,
+        failure_rate: float = 0.0,
+        spike_rate: float = 0.0,
+        spike_delay: float = 5.0,
+        embedding_dim: int = 768,
+        model_size_gb: float = 4.4,
+        seed: int = 42
+    ):
+        self.models = models
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.load_delay = load_delay
+        self.parallel = parallel
+        self.max_loaded_models = max_loaded_models
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.spike_rate = spike_rate
+        self.spike_delay = spike_delay
+        self.embedding_dim = embedding_dim
+        self.model_size = int(model_size_gb * 1024 ** 3)
+        self.seed = seed
+
+
+def stable_seed(*parts: Any) -> int:
+    """Seed derived from the request content so replies are reproducible"""
+    digest = hashlib.blake2b("\x00".join(str(part) for part in parts).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """Build the mock Ollama application"""
+    app = FastAPI(title="Mock Ollama")
+    slots = asyncio.Semaphore(config.parallel)
+    loaded: Dict[str, float] = {}
+    load_lock = asyncio.Lock()
+    rng = random.Random(config.seed)
+
+    async def ensure_loaded(model: str) -> float:
+        """Load a model (evicting the oldest when full); returns the load time in seconds"""
+        async with load_lock:
+            if model in loaded:
+                loaded[model] = time.time()
+                return 0.0
+            while len(loaded) >= config.max_loaded_models:
+                oldest = min(loaded, key=loaded.get)
+                del loaded[oldest]
+            await asyncio.sleep(config.load_delay)
+            loaded[model] = time.time()
+            return config.load_delay
+
+    def unknown_model(model: str) -> Optional[Response]:
+        if model not in config.models:
+            return JSONResponse({"error": f"model '{model}' not found, try pulling it first"}, status_code=404)
+        return None
+
+    def inject_failure() -> Optional[Response]:
+        if config.failure_rate and rng.random() < config.failure_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        return None
+
+    async def maybe_spike():
+        if config.spike_rate and rng.random() < config.spike_rate:
+            await asyncio.sleep(config.spike_delay)
+
+    def reply_tokens(model: str, prompt: str, limit: Optional[int]) -> List[str]:
+        generator = random.Random(stable_seed(config.seed, model, prompt))
+        count = config.response_tokens if limit is None or limit < 0 else min(limit, config.response_tokens)
+        return [generator.choice(WORDS) + " " for _ in range(count)]
+
+    def timing_fields(load: float, prompt_tokens: int, prompt_time: float, tokens: int, eval_time: float, total: float):
+        return {
+            "total_duration": int(total * NANOSECONDS),
+            "load_duration": int(load * NANOSECONDS),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_time * NANOSECONDS),
+            "eval_count": tokens,
+            "eval_duration": int(eval_time * NANOSECONDS),
+        }
+
+    async def run_generation(model: str, prompt: str, options: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield token chunks then a final chunk with Ollama-style counters"""
+        started = time.perf_counter()
+        async with slots:
+            load = await ensure_loaded(model)
+            await maybe_spike()
+            prompt_tokens = count_tokens(prompt)
+            num_ctx = options.get("num_ctx")
+            if num_ctx:
+                prompt_tokens = min(prompt_tokens, num_ctx)
+            prompt_time = prompt_tokens / config.prompt_tokens_per_sec
+            await asyncio.sleep(prompt_time)
+
+            tokens = reply_tokens(model, prompt, options.get("num_predict"))
+            stops = options.get("stop") or []
+            eval_started = time.perf_counter()
+            emitted = 0
+            for token in tokens:
+                if any(stop and stop in token for stop in stops):
+                    break
+                await asyncio.sleep(1.0 / config.tokens_per_sec)
+                emitted += 1
+                yield {"token": token}
+            eval_time = time.perf_counter() - eval_started
+        yield {
+            "done": True,
+            **timing_fields(load, prompt_tokens, prompt_time, emitted, eval_time, time.perf_counter() - started),
+        }
+
+    def created_at() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    @app.get("/")
+    async def root():
+        return Response("Ollama is running", media_type="text/plain")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {
+            "models": [
+                {
+                    "name": model,
+                    "model": model,
+                    "size": config.model_size,
+                    "digest": hashlib.sha256(model.encode()).hexdigest(),
+                    "details": {"format": "gguf", "family": model.split(":")[0]},
+                }
+                for model in config.models
+            ]
+        }
+
+    @app.get("/api/ps")
+    async def ps():
+        return {
+            "models": [
+                {
+                    "name": model,
+                    "model": model,
+                    "size": config.model_size,
+                    "size_vram": 0,
+                    "expires_at": datetime.fromtimestamp(used + 300, timezone.utc).isoformat(),
+                }
+                for model, used in loaded.items()
+            ]
+        }
+
+    async def generation_endpoint(request: Request, chat: bool):
+        body = orjson.loads(await request.body())
+        model = body.get("model", "")
+        error = unknown_model(model) or inject_failure()
+        if error:
+            return error
+
+        if chat:
+            messages = body.get("messages", [])
+            prompt = "\n".join(f"{m.get('role')}: {m.get('content', '')}" for m in messages)
+        else:
+            prompt = body.get("prompt", "")
+        options = body.get("options") or {}
+
+        # Empty prompt with keep_alive=0 unloads, empty prompt alone just loads
+        if not prompt and not chat:
+            if body.get("keep_alive") in (0, "0", "0s"):
+                loaded.pop(model, None)
+                return {"model": model, "created_at": created_at(), "response": "", "done": True,
+                        "done_reason": "unload"}
+            load = await ensure_loaded(model)
+            return {"model": model, "created_at": created_at(), "response": "", "done": True,
+                    "done_reason": "load", "load_duration": int(load * NANOSECONDS)}
+
+        def chunk(text: str, final: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            data: Dict[str, Any] = {"model": model, "created_at": created_at()}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if final is None:
+                data["done"] = False
+            else:
+                data.update(final)
+                data["done_reason"] = "stop"
+                if not chat:
+                    data["context"] = list(range(final["prompt_eval_count"] + final["eval_count"]))
+            return data
+
+        if body.get("stream", True):
+            async def stream():
+                async for part in run_generation(model, prompt, options):
+                    if part.get("done"):
+                        yield orjson.dumps(chunk("", part)) + b"\n"
+                    else:
+                        yield orjson.dumps(chunk(part["token"])) + b"\n"
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+        text = []
+        final = {}
+        async for part in run_generation(model, prompt, options):
+            if part.get("done"):
+                final = part
+            else:
+                text.append(part["token"])
+        return Response(orjson.dumps(chunk("".join(text).strip(), final)), media_type="application/json")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await generation_endpoint(request, chat=False)
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await generation_endpoint(request, chat=True)
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = orjson.loads(await request.body())
+        model = body.get("model", "")
+        error = unknown_model(model) or inject_failure()
+        if error:
+            return error
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        started = time.perf_counter()
+        async with slots:
+            load = await ensure_loaded(model)
+            await maybe_spike()
+            prompt_tokens = sum(count_tokens(text) for text in inputs)
+            await asyncio.sleep(prompt_tokens / config.prompt_tokens_per_sec)
+
+        embeddings = []
+        for text in inputs:
+            # Bag-of-words hashing: texts sharing words get similar vectors
+            vector = [0.0] * config.embedding_dim
+            for word in text.lower().split():
+                generator = random.Random(stable_seed(model, word))
+                for _ in range(8):
+                    vector[generator.randrange(config.embedding_dim)] += generator.choice((-1.0, 1.0))
+            norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+            embeddings.append([value / norm for value in vector])
+
+        return Response(orjson.dumps({
+            "model": model,
+            "embeddings": embeddings,
+            "total_duration": int((time.perf_counter() - started) * NANOSECONDS),
+            "load_duration": int(load * NANOSECONDS),
+            "prompt_eval_count": prompt_tokens,
+        }), media_type="application/json")
+
+    @app.post("/api/pull")
+    async def pull(request: Request):
+        body = orjson.loads(await request.body())
+        name = body.get("name") or body.get("model", "")
+        if name not in config.models:
+            config.models.append(name)
+
+        async def progress():
+            total = config.model_size
+            for completed in (0, total // 2, total):
+                yield orjson.dumps({"status": "downloading", "completed": completed, "total": total}) + b"\n"
+                await asyncio.sleep(0.01)
+            yield orjson.dumps({"status": "success"}) + b"\n"
+        return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="qwen2.5:7b-instruct-q4_0,nomic-embed-text",
+                        help="Comma-separated list of models reported as installed")
+    parser.add_argument("--tokens-per-sec", type=float, default=25.0, help="Generation speed")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=250.0, help="Prompt evaluation speed")
+    parser.add_argument("--load-delay", type=float, default=2.0, help="Seconds to load a model")
+    parser.add_argument("--parallel", type=int, default=1, help="Concurrent generation slots (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--max-loaded-models", type=int, default=1, help="OLLAMA_MAX_LOADED_MODELS")
+    parser.add_argument("--response-tokens", type=int, default=48, help="Tokens per reply before num_predict")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="Fraction of requests delayed by --spike-delay")
+    parser.add_argument("--spike-delay", type=float, default=5.0)
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--model-size-gb", type=float, default=4.4, help="Size reported by /api/tags and /api/ps")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        models=[model.strip() for model in args.models.split(",") if model.strip()],
+        tokens_per_sec=args.tokens_per_sec,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        load_delay=args.load_delay,
+        parallel=args.parallel,
+        max_loaded_models=args.max_loaded_models,
+        response_tokens=args.response_tokens,
+        failure_rate=args.failure_rate,
+        spike_rate=args.spike_rate,
+        spike_delay=args.spike_delay,
+        embedding_dim=args.embedding_dim,
+        model_size_gb=args.model_size_gb,
+        seed=args.seed,
+    )
+    print(f"Mock Ollama on http://{args.host}:{args.port} serving {', '.join(config.models)}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
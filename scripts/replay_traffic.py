@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Replay recorded API traffic with its original timing
+
+Reads the gzip JSONL files written by the API traffic recorder
+(TRAFFIC_RECORDING_ENABLED=true), sends every request to the target API at
+its recorded offset divided by --speed, and compares replay latency and
+throughput with the recording.
+
+A recording sampled at TRAFFIC_RECORDING_SAMPLE_RATE holds only that share
+of the requests, so replaying it at its own timing sends sample_rate times
+the original load. --original-rate compresses the gaps by the sample rate
+to reproduce the unsampled request rate (requests, not their mix, are
+extrapolated).
+"""
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from stress_test import LatencyHistogram
+
+
+def load_recording(paths: List[str], limit: Optional[int] = None) -> List[dict]:
+    """Load records from files or directories, sorted by arrival time"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))))
+        else:
+            files.append(path)
+
+    records = []
+    for file in files:
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def recorded_sample_rate(records: List[dict]) -> float:
+    """Sample rate stored in the records (recordings made before it was stored count as 1.0)"""
+    rates = {record.get("sample_rate") or 1.0 for record in records}
+    if len(rates) > 1:
+        print(f"⚠️  Recording mixes sample rates {sorted(rates)}: using the lowest")
+    return min(rates)
+
+
+def peak_concurrency(intervals: List[tuple]) -> int:
+    """Maximum number of overlapping (start, end) intervals"""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+async def replay_one(client: httpx.AsyncClient, url: str, record: dict, scheduled: float) -> dict:
+    """Send one recorded request; latency is measured from its scheduled time"""
+    body = dict(record["body"])
+    result = {"endpoint": record["endpoint"], "success": False, "status": 0, "start": scheduled}
+    try:
+        if body.get("stream"):
+            async with client.stream("POST", f"{url}{record['endpoint']}", json=body) as response:
+                result["status"] = response.status_code
+                async for _ in response.aiter_lines():
+                    pass
+        else:
+            response = await client.post(f"{url}{record['endpoint']}", json=body)
+            result["status"] = response.status_code
+        result["success"] = result["status"] == 200
+    except Exception as e:
+        result["error"] = str(e)
+    result["end"] = time.perf_counter()
+    result["latency"] = result["end"] - scheduled
+    return result
+
+
+async def replay(url: str, records: List[dict], speed: float = 1.0) -> List[dict]:
+    """Replay records preserving (scaled) inter-arrival gaps"""
+    origin = records[0]["ts"]
+    results: List[dict] = []
+    tasks = []
+
+    async with httpx.AsyncClient(timeout=300.0, limits=httpx.Limits(max_connections=None)) as client:
+        start = time.perf_counter()
+        for record in records:
+            scheduled = start + (record["ts"] - origin) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(replay_one(client, url, record, scheduled)))
+        results = await asyncio.gather(*tasks)
+    return list(results)
+
+
+def compare(records: List[dict], results: List[dict], speed: float) -> Dict[str, dict]:
+    """Recorded vs replayed latency, throughput and concurrency"""
+    recorded = LatencyHistogram()
+    replayed = LatencyHistogram()
+    for record in records:
+        if record.get("status") == "success":
+            recorded.record(record["duration_ms"] / 1000)
+    for result in results:
+        if result["success"]:
+            replayed.record(result["latency"])
+
+    recorded_span = max(records[-1]["ts"] + records[-1]["duration_ms"] / 1000 - records[0]["ts"], 1e-9)
+    replay_span = max(max(r["end"] for r in results) - min(r["start"] for r in results), 1e-9)
+    recorded_ok = sum(1 for record in records if record.get("status") == "success")
+    replayed_ok = sum(1 for result in results if result["success"])
+
+    report = {
+        "recorded": {
+            "requests": len(records),
+            "successful": recorded_ok,
+            # Expected throughput once the recording is compressed by `speed`
+            "throughput_rps": round(recorded_ok / recorded_span * speed, 3),
+            "peak_concurrency": peak_concurrency(
+                [(r["ts"], r["ts"] + r["duration_ms"] / 1000) for r in records]
+            ),
+            "latency_ms": recorded.summary(),
+        },
+        "replayed": {
+            "requests": len(results),
+            "successful": replayed_ok,
+            "throughput_rps": round(replayed_ok / replay_span, 3),
+            "peak_concurrency": peak_concurrency([(r["start"], r["end"]) for r in results]),
+            "latency_ms": replayed.summary(),
+        },
+    }
+
+    deltas = {}
+    for key in ("p50", "p90", "p99", "p99.9", "mean"):
+        before = report["recorded"]["latency_ms"].get(key)
+        after = report["replayed"]["latency_ms"].get(key)
+        if before and after:
+            deltas[f"latency_{key}_ms"] = round(after - before, 3)
+            deltas[f"latency_{key}_pct"] = round((after - before) / before * 100, 1)
+    before, after = report["recorded"]["throughput_rps"], report["replayed"]["throughput_rps"]
+    deltas["throughput_rps"] = round(after - before, 3)
+    if before:
+        deltas["throughput_pct"] = round((after - before) / before * 100, 1)
+    report["deltas"] = deltas
+    return report
+
+
+def print_comparison(report: dict):
+    print("\n=== Replay Results ===")
+    for name in ("recorded", "replayed"):
+        section = report[name]
+        latency = section["latency_ms"]
+        print(f"{name:9} requests={section['requests']} ok={section['successful']} "
+              f"throughput={section['throughput_rps']} req/s peak_concurrency={section['peak_concurrency']}")
+        if latency.get("count"):
+            print(f"          p50={latency['p50']:.1f} p90={latency['p90']:.1f} "
+                  f"p99={latency['p99']:.1f} p99.9={latency['p99.9']:.1f} ms")
+    print("\nDeltas (replayed - recorded):")
+    for key, value in report["deltas"].items():
+        print(f"  {key}: {value:+}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded API traffic")
+    parser.add_argument("recording", nargs="+", help="Recording files or directories (*.jsonl.gz)")
+    parser.add_argument("--url", default="http://localhost:8000", help="Target API URL")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (2 = twice as fast)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--original-rate", action="store_true",
+                        help="Divide the gaps by the recording's sample rate to replay the unsampled request rate")
+    parser.add_argument("--output", help="Write the comparison as JSON")
+    args = parser.parse_args()
+
+    records = load_recording(args.recording, args.limit)
+    if not records:
+        print("No records found")
+        raise SystemExit(1)
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    sample_rate = recorded_sample_rate(records)
+    speed = args.speed / sample_rate if args.original_rate else args.speed
+    recorded_rps = len(records) / span if span > 0 else 0.0
+    print(f"Replaying {len(records)} requests spanning {span:.1f}s at {speed:g}x against {args.url}")
+    print(f"Recording sampled at {sample_rate:.0%}: original traffic ~{recorded_rps / sample_rate:.2f} req/s, "
+          f"replayed ~{recorded_rps * speed:.2f} req/s")
+    results = asyncio.run(replay(args.url, records, speed))
+    report = compare(records, results, speed)
+    report["sample_rate"] = sample_rate
+    print_comparison(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nComparison written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,19 @@
 """
 Script pour télécharger et optimiser le modèle Ollama
 Gère le téléchargement du modèle avec vérification de la mémoire disponible
+
+Mode benchmark (--benchmark): télécharge les modèles candidats en parallèle,
+mesure sur cette machine le temps de chargement, les tokens/s (prompt et
+génération) et la mémoire résidente, puis recommande le plus rapide qui tient
+dans --memory-budget-gb (optionnellement écrit dans .env avec --write-env).
 """
+import argparse
 import asyncio
+import json
+import os
+import re
+import statistics
+import time
 import httpx
 import sys
 
@@ -58,12 +69,12 @@ async def list_models(url: str = "http://localhost:11434"):
             return []
 
 
-async def pull_model(model_name: str, url: str = "http://localhost:11434"):
-    """Télécharger un modèle Ollama"""
+async def pull_model(model_name: str, url: str = "http://localhost:11434", interactive: bool = True):
+    """Télécharger un modèle Ollama (interactive=False: sans confirmation ni barre de progression)"""
     print(f"\n📥 Téléchargement du modèle: {model_name}")
     
     # Afficher les infos du modèle si disponibles
-    if model_name in MODELS_INFO:
+    if interactive and model_name in MODELS_INFO:
         info = MODELS_INFO[model_name]
         print(f"   Taille approximative: {info['size_gb']} GB")
         print(f"   Description: {info['description']}")
@@ -86,10 +97,18 @@ async def pull_model(model_name: str, url: str = "http://localhost:11434"):
                     print(f"❌ Erreur: {response.status_code}")
                     return False
                 
-                print("   Progression:")
+                if interactive:
+                    print("   Progression:")
                 async for line in response.aiter_lines():
-                    if line:
-                        import json
+                    if line and not interactive:
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if "error" in data:
+                            print(f"❌ {model_name}: {data['error']}")
+                            return False
+                    elif line:
                         try:
                             data = json.loads(line)
                             status = data.get("status", "")
@@ -103,7 +122,7 @@ async def pull_model(model_name: str, url: str = "http://localhost:11434"):
                         except json.JSONDecodeError:
                             pass
                 
-                print("\n✅ Modèle téléchargé avec succès!")
+                print(f"\n✅ Modèle téléchargé avec succès!" if interactive else f"✅ {model_name} téléchargé")
                 return True
                 
         except Exception as e:
@@ -165,6 +184,186 @@ def print_recommendations():
     print("="*60 + "\n")
 
 
+BENCHMARK_PROMPT = (
+    "Tu es l'assistant d'une école. Explique en français, en cinq phrases, "
+    "comment se déroule une journée type en maternelle: accueil, activités, "
+    "repas, sieste et sortie. Donne des horaires indicatifs."
+)
+BENCHMARK_OPTIONS = {"num_predict": 128, "temperature": 0, "seed": 42}
+
+
+def rate(count, duration_ns):
+    """Tokens par seconde à partir des compteurs Ollama"""
+    if not count or not duration_ns:
+        return None
+    return count / (duration_ns / 1e9)
+
+
+async def unload_model(client: httpx.AsyncClient, model_name: str, url: str):
+    """Décharger un modèle (keep_alive=0) pour mesurer un chargement à froid"""
+    try:
+        await client.post(f"{url}/api/generate", json={"model": model_name, "keep_alive": 0})
+    except httpx.HTTPError:
+        pass
+
+
+async def resident_memory(client: httpx.AsyncClient, model_name: str, url: str):
+    """Mémoire résidente (octets) et part en VRAM du modèle chargé, d'après /api/ps"""
+    response = await client.get(f"{url}/api/ps")
+    for loaded in response.json().get("models", []):
+        if model_name in (loaded.get("name"), loaded.get("model")):
+            return loaded.get("size", 0), loaded.get("size_vram", 0)
+    return None, None
+
+
+async def benchmark_model(model_name: str, url: str = "http://localhost:11434", runs: int = 3):
+    """Benchmark standardisé d'un modèle: chargement à froid, tokens/s, mémoire résidente"""
+    print(f"\n⏱  Benchmark de {model_name}...")
+    result = {"model": model_name, "ok": False}
+    
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        try:
+            await unload_model(client, model_name, url)
+            
+            # Prompt vide: Ollama charge le modèle sans générer
+            start = time.perf_counter()
+            response = await client.post(f"{url}/api/generate", json={"model": model_name})
+            response.raise_for_status()
+            result["load_seconds"] = round(time.perf_counter() - start, 3)
+            
+            prompt_rates, generation_rates, latencies = [], [], []
+            for run in range(runs):
+                # Préfixe différent à chaque essai: pas de réutilisation du cache de prompt
+                start = time.perf_counter()
+                response = await client.post(
+                    f"{url}/api/generate",
+                    json={
+                        "model": model_name,
+                        "prompt": f"[essai {run + 1}] {BENCHMARK_PROMPT}",
+                        "stream": False,
+                        "options": BENCHMARK_OPTIONS
+                    }
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                data = response.json()
+                prompt_rate = rate(data.get("prompt_eval_count"), data.get("prompt_eval_duration"))
+                generation_rate = rate(data.get("eval_count"), data.get("eval_duration"))
+                if prompt_rate:
+                    prompt_rates.append(prompt_rate)
+                if generation_rate:
+                    generation_rates.append(generation_rate)
+            
+            size, size_vram = await resident_memory(client, model_name, url)
+            result.update({
+                "ok": True,
+                "prompt_tokens_per_second": round(statistics.median(prompt_rates), 1) if prompt_rates else None,
+                "generation_tokens_per_second": round(statistics.median(generation_rates), 1) if generation_rates else None,
+                "request_seconds": round(statistics.median(latencies), 3),
+                "resident_gb": round(size / 1024**3, 2) if size else None,
+                "vram_gb": round(size_vram / 1024**3, 2) if size else None
+            })
+            print(f"   ✅ chargement {result['load_seconds']}s | "
+                  f"prompt {result['prompt_tokens_per_second']} tok/s | "
+                  f"génération {result['generation_tokens_per_second']} tok/s | "
+                  f"mémoire {result['resident_gb']} GB")
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"   ❌ {model_name}: {str(e)}")
+        finally:
+            # Un seul modèle résident à la fois pendant les mesures
+            await unload_model(client, model_name, url)
+    
+    return result
+
+
+def recommend_model(results, memory_budget_gb: float):
+    """Modèle le plus rapide en génération dont la mémoire résidente tient dans le budget"""
+    eligible = [
+        r for r in results
+        if r["ok"] and r.get("generation_tokens_per_second")
+        and r.get("resident_gb") is not None and r["resident_gb"] <= memory_budget_gb
+    ]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda r: r["generation_tokens_per_second"])
+
+
+def write_env(model_name: str, path: str = ".env"):
+    """Mettre à jour (ou ajouter) OLLAMA_MODEL dans le fichier .env"""
+    content = ""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+    line = f"OLLAMA_MODEL={model_name}"
+    if re.search(r"^OLLAMA_MODEL=.*$", content, flags=re.MULTILINE):
+        content = re.sub(r"^OLLAMA_MODEL=.*$", line, content, flags=re.MULTILINE)
+    else:
+        content = content + ("" if not content or content.endswith("\n") else "\n") + line + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def print_benchmark(results, best, memory_budget_gb: float):
+    """Tableau comparatif des modèles mesurés"""
+    def show(value):
+        return "-" if value is None else str(value)
+    
+    print("\n" + "="*78)
+    print(f"📊 BENCHMARK SUR CETTE MACHINE (budget mémoire: {memory_budget_gb} GB)")
+    print("="*78)
+    print(f"{'Modèle':30} {'Charg. s':>9} {'Prompt t/s':>11} {'Gén. t/s':>9} {'Mémoire GB':>11}")
+    for r in results:
+        if not r["ok"]:
+            print(f"{r['model'][:30]:30} ❌ {r.get('error', 'échec')[:44]}")
+            continue
+        marker = " ⭐" if best is r else ("" if r["resident_gb"] is None or r["resident_gb"] <= memory_budget_gb else " ⚠️")
+        print(f"{r['model'][:30]:30} {show(r['load_seconds']):>9} {show(r['prompt_tokens_per_second']):>11} "
+              f"{show(r['generation_tokens_per_second']):>9} {show(r['resident_gb']):>11}{marker}")
+    print("="*78)
+
+
+async def run_benchmark(args):
+    """Téléchargement parallèle puis benchmark séquentiel des modèles candidats"""
+    models = args.benchmark or list(MODELS_INFO)
+    if not await check_ollama_service(args.url):
+        return 1
+    
+    if not args.skip_pull:
+        pulled = await asyncio.gather(*(pull_model(m, args.url, interactive=False) for m in models))
+        models = [m for m, ok in zip(models, pulled) if ok]
+    
+    # Les mesures restent séquentielles pour ne pas se disputer CPU et mémoire
+    results = []
+    for model_name in models:
+        results.append(await benchmark_model(model_name, args.url, args.runs))
+    
+    best = recommend_model(results, args.memory_budget_gb)
+    print_benchmark(results, best, args.memory_budget_gb)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "memory_budget_gb": args.memory_budget_gb,
+                "results": results,
+                "recommended": best["model"] if best else None
+            }, f, indent=2, ensure_ascii=False)
+        print(f"📝 Résultats écrits dans {args.output}")
+    
+    if best is None:
+        print(f"❌ Aucun modèle ne tient dans {args.memory_budget_gb} GB")
+        return 1
+    
+    print(f"\n⭐ Modèle recommandé: {best['model']} "
+          f"({best['generation_tokens_per_second']} tok/s, {best['resident_gb']} GB)")
+    if args.write_env:
+        write_env(best["model"], args.write_env)
+        print(f"✅ OLLAMA_MODEL={best['model']} écrit dans {args.write_env}")
+    else:
+        print(f"   Mettez à jour le fichier .env avec: OLLAMA_MODEL={best['model']}")
+    return 0
+
+
 async def main():
     """Point d'entrée principal"""
     print("="*60)
@@ -205,4 +404,18 @@ async def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Installation et sélection du modèle Ollama")
+    parser.add_argument("--benchmark", nargs="*", metavar="MODEL",
+                        help="Mode benchmark (par défaut: tous les modèles de MODELS_INFO)")
+    parser.add_argument("--url", default="http://localhost:11434", help="URL d'Ollama")
+    parser.add_argument("--memory-budget-gb", type=float, default=6.0, help="Mémoire résidente maximale")
+    parser.add_argument("--runs", type=int, default=3, help="Générations mesurées par modèle")
+    parser.add_argument("--skip-pull", action="store_true", help="Ne pas télécharger les modèles")
+    parser.add_argument("--write-env", nargs="?", const=".env", metavar="PATH",
+                        help="Écrire le modèle recommandé dans .env (ou PATH)")
+    parser.add_argument("--output", help="Écrire les résultats en JSON")
+    args = parser.parse_args()
+    
+    if args.benchmark is not None:
+        sys.exit(asyncio.run(run_benchmark(args)))
     asyncio.run(main())
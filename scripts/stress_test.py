@@ -1,10 +1,92 @@
+import argparse
 import asyncio
+import csv
+import json
+import math
+import random
 import httpx
 import time
-from typing import List
+from typing import Dict, Iterator, List, Optional
 import statistics
 
 
+class LatencyHistogram:
+    """
+    HDR-style latency histogram
+
+    Values are recorded in microseconds into log-linear buckets with 2048
+    sub-buckets per power of two, i.e. ~3 significant digits over any range,
+    with constant memory per recorded magnitude.
+    """
+
+    SUB_BUCKET_BITS = 11
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min_value: Optional[int] = None
+        self.max_value = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        return (shift << self.SUB_BUCKET_BITS) | (value >> shift)
+
+    def _value_at(self, index: int) -> int:
+        """Upper bound of a bucket (the value reported for percentiles)"""
+        shift = index >> self.SUB_BUCKET_BITS
+        sub_bucket = index & (self.SUB_BUCKET_COUNT - 1)
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        """Record a latency given in seconds"""
+        value = max(1, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the counts of another histogram"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def percentile(self, percent: float) -> float:
+        """Latency in milliseconds at a percentile (0-100)"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value_at(index), self.max_value) / 1000
+        return self.max_value / 1000
+
+    def summary(self) -> Dict[str, float]:
+        """Percentile summary in milliseconds"""
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min_value / 1000,
+            "mean": round(self.total / self.count / 1000, 3),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p99.9": self.percentile(99.9),
+            "max": self.max_value / 1000,
+        }
+
+
 async def send_request(client: httpx.AsyncClient, url: str, prompt: str) -> dict:
     """Send a single request to the API"""
     start = time.time()
@@ -71,12 +153,298 @@ async def stress_test(
         print(f"  Median: {statistics.median(durations):.2f}")
         if len(durations) > 1:
             print(f"  Std Dev: {statistics.stdev(durations):.2f}")
+    if failed:
+        # Timeouts sit here: leaving them out would hide the slowest requests
+        failed_durations = [r["duration"] for r in failed]
+        print(f"\nFailed requests (seconds): Mean: {statistics.mean(failed_durations):.2f} "
+              f"Max: {max(failed_durations):.2f}")
 
 
-if __name__ == "__main__":
-    asyncio.run(stress_test(
-        url="http://localhost:8000",
-        num_requests=50,
-        concurrency=5,
-        prompt="Hello, how are you?"
+# ============================================================================
+# Open-loop load generation
+# ============================================================================
+
+REQUEST_KINDS = ("chat", "structured", "stream")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse a request mix such as 'chat=0.6,structured=0.3,stream=0.1'"""
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind '{kind}' (expected one of {', '.join(REQUEST_KINDS)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def rate_at(elapsed: float, duration: float, rate: float, profile: str, start_rate: float, steps: int) -> float:
+    """Target arrival rate (requests/s) at a given time of the run"""
+    if profile == "ramp":
+        return start_rate + (rate - start_rate) * min(1.0, elapsed / duration)
+    if profile == "step":
+        step = min(steps - 1, int(elapsed / (duration / steps)))
+        return start_rate + (rate - start_rate) * step / max(1, steps - 1)
+    return rate
+
+
+def arrival_schedule(
+    duration: float,
+    rate: float,
+    profile: str = "constant",
+    arrival: str = "constant",
+    start_rate: Optional[float] = None,
+    steps: int = 4,
+    seed: Optional[int] = None
+) -> Iterator[float]:
+    """Yield send offsets (seconds from start) independent of response times"""
+    if duration <= 0 or steps < 1:
+        raise ValueError("duration must be positive and steps at least 1")
+    rng = random.Random(seed)
+    start_rate = rate / 10 if start_rate is None else start_rate
+    elapsed = 0.0
+    while True:
+        current = max(rate_at(elapsed, duration, rate, profile, start_rate, steps), 1e-6)
+        elapsed += rng.expovariate(current) if arrival == "poisson" else 1.0 / current
+        if elapsed >= duration:
+            return
+        yield elapsed
+
+
+async def send_open_loop(
+    client: httpx.AsyncClient,
+    url: str,
+    kind: str,
+    prompt: str,
+    scheduled: float
+) -> dict:
+    """
+    Send one request and time it from its scheduled start
+
+    Latency counts from the intended send time, so time spent waiting for a
+    free connection or a late scheduler is charged to the system under test
+    instead of being silently omitted.
+    """
+    sent = time.perf_counter()
+    result = {"kind": kind, "scheduled": scheduled, "status": 0, "success": False, "ttft": None}
+    try:
+        if kind == "stream":
+            async with client.stream("POST", f"{url}/chat", json={"prompt": prompt, "stream": True}) as response:
+                result["status"] = response.status_code
+                failed = response.status_code != 200
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    if result["ttft"] is None:
+                        result["ttft"] = time.perf_counter() - scheduled
+                    if '"error"' in line:
+                        failed = True
+                result["success"] = not failed
+        else:
+            endpoint, payload = ("/chat", {"prompt": prompt}) if kind == "chat" else ("/chat/structured", {"query": prompt})
+            response = await client.post(f"{url}{endpoint}", json=payload)
+            result["status"] = response.status_code
+            result["success"] = response.status_code == 200
+    except Exception as e:
+        result["error"] = str(e)
+    done = time.perf_counter()
+    result["latency"] = done - scheduled
+    result["service_time"] = done - sent
+    return result
+
+
+async def open_loop_test(
+    url: str,
+    duration: float,
+    rate: float,
+    profile: str = "constant",
+    arrival: str = "constant",
+    start_rate: Optional[float] = None,
+    steps: int = 4,
+    mix: Optional[Dict[str, float]] = None,
+    prompts: Optional[List[str]] = None,
+    max_inflight: int = 1000,
+    seed: Optional[int] = None
+) -> dict:
+    """Run an open-loop test: requests are sent on schedule whether or not earlier ones finished"""
+    mix = mix or {"chat": 1.0}
+    prompts = prompts or ["Hello, how are you?"]
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+
+    print(f"Starting open-loop test: {profile} profile, {arrival} arrivals, "
+          f"{rate} req/s for {duration}s, mix={mix}")
+
+    results: List[dict] = []
+    dropped = 0
+    tasks = set()
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+
+    async with httpx.AsyncClient(timeout=300.0, limits=limits) as client:
+        start = time.perf_counter()
+        for offset in arrival_schedule(duration, rate, profile, arrival, start_rate, steps, seed):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_inflight:
+                # Safety valve for the generator itself; reported, never hidden
+                dropped += 1
+                continue
+            kind = rng.choices(kinds, weights)[0]
+            task = asyncio.create_task(
+                send_open_loop(client, url, kind, rng.choice(prompts), start + offset)
+            )
+            task.add_done_callback(lambda t: results.append(t.result()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return build_report(results, elapsed, dropped, start)
+
+
+def build_report(results: List[dict], elapsed: float, dropped: int, start: float) -> dict:
+    """Aggregate per-kind HDR histograms and throughput; failures get their own histogram"""
+    overall = LatencyHistogram()
+    service = LatencyHistogram()
+    ttft = LatencyHistogram()
+    failed = LatencyHistogram()
+    per_kind: Dict[str, LatencyHistogram] = {}
+    errors = 0
+
+    for result in results:
+        result["scheduled"] -= start
+        if not result["success"]:
+            errors += 1
+            # Timeouts and errors are kept apart from, but reported next to, the success percentiles
+            failed.record(result["latency"])
+            continue
+        overall.record(result["latency"])
+        service.record(result["service_time"])
+        per_kind.setdefault(result["kind"], LatencyHistogram()).record(result["latency"])
+        if result["ttft"] is not None:
+            ttft.record(result["ttft"])
+
+    return {
+        "requests": len(results),
+        "successful": len(results) - errors,
+        "errors": errors,
+        "dropped": dropped,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round((len(results) - errors) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": overall.summary(),
+        "service_time_ms": service.summary(),
+        "ttft_ms": ttft.summary(),
+        "failed_latency_ms": failed.summary(),
+        "per_kind_latency_ms": {kind: hist.summary() for kind, hist in per_kind.items()},
+        "results": results,
+    }
+
+
+def print_report(report: dict):
+    """Print an open-loop report"""
+    print("\n=== Open-Loop Test Results ===")
+    print(f"Requests: {report['requests']} | Successful: {report['successful']} | "
+          f"Errors: {report['errors']} | Dropped: {report['dropped']}")
+    print(f"Throughput: {report['throughput_rps']} req/s over {report['elapsed_s']}s")
+    for title, key in (("Latency (from schedule)", "latency_ms"),
+                       ("Failed requests, latency (from schedule)", "failed_latency_ms"),
+                       ("Service time", "service_time_ms"),
+                       ("Time to first token", "ttft_ms")):
+        summary = report[key]
+        if summary.get("count"):
+            print(f"\n{title} (ms), n={summary['count']}:")
+            print("  " + " | ".join(f"{name}: {summary[name]:.1f}"
+                                   for name in ("p50", "p90", "p99", "p99.9", "max")))
+    for kind, summary in report["per_kind_latency_ms"].items():
+        print(f"  {kind:10} p50={summary['p50']:.1f} p99={summary['p99']:.1f} (n={summary['count']})")
+
+
+def write_report(report: dict, prefix: str, config: dict):
+    """Write the summary as JSON and per-request rows as CSV"""
+    summary = {key: value for key, value in report.items() if key != "results"}
+    summary["config"] = config
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    with open(f"{prefix}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["kind", "scheduled_s", "status", "success", "latency_ms", "service_time_ms", "ttft_ms"])
+        for result in sorted(report["results"], key=lambda r: r["scheduled"]):
+            writer.writerow([
+                result["kind"],
+                round(result["scheduled"], 4),
+                result["status"],
+                result["success"],
+                round(result["latency"] * 1000, 3),
+                round(result["service_time"] * 1000, 3),
+                round(result["ttft"] * 1000, 3) if result["ttft"] is not None else "",
+            ])
+    print(f"\nResults written to {prefix}.json and {prefix}.csv")
+
+
+def positive(kind):
+    """argparse type accepting only values above zero"""
+    def parse(text: str):
+        value = kind(text)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+        return value
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the Ollama Monitoring API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: lock-step batches (legacy), open: scheduled arrivals")
+    parser.add_argument("--prompt", action="append", help="Prompt to send (repeatable)")
+    # Closed mode
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    # Open mode
+    parser.add_argument("--rate", type=positive(float), default=1.0, help="Target (final) arrival rate in req/s")
+    parser.add_argument("--duration", type=positive(float), default=60.0, help="Run length in seconds")
+    parser.add_argument("--arrival", choices=["constant", "poisson"], default="poisson")
+    parser.add_argument("--profile", choices=["constant", "ramp", "step"], default="constant")
+    parser.add_argument("--start-rate", type=float, help="Initial rate for ramp/step profiles")
+    parser.add_argument("--steps", type=positive(int), default=4, help="Number of levels for the step profile")
+    parser.add_argument("--mix", default="chat=1", help="Request mix, e.g. chat=0.6,structured=0.3,stream=0.1")
+    parser.add_argument("--max-inflight", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write <output>.json and <output>.csv")
+    args = parser.parse_args()
+
+    prompts = args.prompt or ["Hello, how are you?"]
+
+    if args.mode == "closed":
+        asyncio.run(stress_test(
+            url=args.url,
+            num_requests=args.requests,
+            concurrency=args.concurrency,
+            prompt=prompts[0]
+        ))
+        return
+
+    report = asyncio.run(open_loop_test(
+        url=args.url,
+        duration=args.duration,
+        rate=args.rate,
+        profile=args.profile,
+        arrival=args.arrival,
+        start_rate=args.start_rate,
+        steps=args.steps,
+        mix=parse_mix(args.mix),
+        prompts=prompts,
+        max_inflight=args.max_inflight,
+        seed=args.seed
     ))
+    print_report(report)
+    if args.output:
+        write_report(report, args.output, {key: value for key, value in vars(args).items() if key != "output"})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,70 @@
+"""
+Warm up the API before it takes traffic
+
+Without a profile, sends one request to /chat with the configured model.
+With --profile (JSON) or --from-recording (traffic recordings), warms in
+stages:
+
+  1. residency  - load the profile models in Ollama (keep_alive), one at a
+                  time and no more than --max-loaded-models (Ollama's
+                  OLLAMA_MAX_LOADED_MODELS): loading more would evict the
+                  first ones. Profile models come most used first.
+  2. prefixes   - one /chat/structured call per template, priming the
+                  backend prompt cache for the rules/context prefix
+  3. responses  - frequent prompts, filling the API response caches
+
+Stages 2 and 3 run --concurrency requests at a time.
+
+Profile format:
+
+    {
+      "models": ["qwen2.5:7b-instruct-q4_0"],
+      "templates": [{"rules": "...", "context": "...", "knowledge_base": "...", "top_k": 4, "model": "..."}],
+      "prompts": [
+        {"endpoint": "/chat/structured", "query": "...", "rules": "...", "context": "...", "knowledge_base": "..."},
+        {"endpoint": "/chat", "prompt": "..."}
+      ]
+    }
+
+Each stage reports when it is warm; the exit code is non-zero unless every
+stage is, so a rollout can gate readiness on it.
+"""
+import argparse
 import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
 import httpx
 import sys
 
 
 async def warmup_model(
     api_url: str = "http://localhost:8000",
-    model: str = "llama2",
+    model: Optional[str] = None,
     test_prompt: str = "Hello"
 ):
     """
     Warm up the Ollama model by sending a test request
     This helps load the model into memory before actual usage
+    (model=None uses the API's configured OLLAMA_MODEL)
     """
-    print(f"Warming up model: {model}")
+    print(f"Warming up model: {model or 'API default'}")
     print(f"API URL: {api_url}")
-    
+
     async with httpx.AsyncClient(timeout=300.0) as client:
         try:
-            # Check API health first
-            health_response = await client.get(f"{api_url}/health")
-            if health_response.status_code != 200:
-                print("❌ API health check failed")
-                sys.exit(1)
-            print("✓ API is healthy")
-            
-            # Check Ollama health
-            ollama_health = await client.get(f"{api_url}/health/ollama")
-            if ollama_health.status_code != 200:
-                print("❌ Ollama health check failed")
-                sys.exit(1)
-            print("✓ Ollama is healthy")
-            
+            await check_health(client, api_url)
+
             # Send warmup request
             print(f"Sending warmup request with prompt: '{test_prompt}'")
-            response = await client.post(
-                f"{api_url}/chat",
-                json={
-                    "prompt": test_prompt,
-                    "model": model
-                }
-            )
-            
+            payload = {"prompt": test_prompt}
+            if model:
+                payload["model"] = model
+            response = await client.post(f"{api_url}/chat", json=payload)
+
             if response.status_code == 200:
                 data = response.json()
                 print(f"✓ Warmup successful!")
@@ -49,11 +73,189 @@ async def warmup_model(
             else:
                 print(f"❌ Warmup failed with status code: {response.status_code}")
                 sys.exit(1)
-                
+
         except Exception as e:
             print(f"❌ Error during warmup: {str(e)}")
             sys.exit(1)
 
 
+async def check_health(client: httpx.AsyncClient, api_url: str):
+    """Exit unless both the API and Ollama report healthy"""
+    # Check API health first
+    health_response = await client.get(f"{api_url}/health")
+    if health_response.status_code != 200:
+        print("❌ API health check failed")
+        sys.exit(1)
+    print("✓ API is healthy")
+
+    # Check Ollama health
+    ollama_health = await client.get(f"{api_url}/health/ollama")
+    if ollama_health.status_code != 200:
+        print("❌ Ollama health check failed")
+        sys.exit(1)
+    print("✓ Ollama is healthy")
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    profile.setdefault("models", [])
+    profile.setdefault("templates", [])
+    profile.setdefault("prompts", [])
+    return profile
+
+
+def profile_from_recording(paths: List[str], top: int = 20) -> Dict[str, Any]:
+    """Build a profile from traffic recordings: top models, templates and prompts"""
+    from replay_traffic import load_recording
+
+    records = [r for r in load_recording(paths) if r.get("status") == "success"]
+    models = Counter(r["model"] for r in records if r.get("model"))
+    # Retrieval requests keep their knowledge base, so the replayed prompt is the one served in production
+    templates = Counter(
+        (r["body"].get("rules"), r["body"].get("context"), r["body"].get("knowledge_base"),
+         r["body"].get("top_k"), r.get("model"))
+        for r in records if r["endpoint"] == "/chat/structured"
+    )
+    prompts = Counter(
+        (r["endpoint"], r["body"].get("prompt") or r["body"].get("query"), r["body"].get("rules"),
+         r["body"].get("context"), r["body"].get("knowledge_base"), r["body"].get("top_k"), r.get("model"))
+        for r in records
+    )
+
+    profile_prompts = []
+    for (endpoint, text, rules, context, knowledge_base, top_k, model), _ in prompts.most_common(top):
+        prompt = {"endpoint": endpoint, "model": model}
+        if endpoint == "/chat/structured":
+            prompt.update({
+                "query": text, "rules": rules, "context": context, "knowledge_base": knowledge_base, "top_k": top_k
+            })
+        else:
+            prompt["prompt"] = text
+        profile_prompts.append(prompt)
+
+    return {
+        "models": [model for model, _ in models.most_common(top)],
+        "templates": [
+            {"rules": rules, "context": context, "knowledge_base": knowledge_base, "top_k": top_k, "model": model}
+            for (rules, context, knowledge_base, top_k, model), _ in templates.most_common(top)
+        ],
+        "prompts": profile_prompts
+    }
+
+
+async def run_stage(name: str, items: List[Any], worker, concurrency: int) -> Dict[str, Any]:
+    """Run one warmup stage concurrently and report whether it is warm"""
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def guarded(item):
+        async with semaphore:
+            try:
+                return await worker(item)
+            except Exception as e:
+                print(f"  ✗ {name}: {str(e)}")
+                return False
+
+    results = await asyncio.gather(*(guarded(item) for item in items))
+    ok = sum(1 for result in results if result)
+    report = {
+        "stage": name,
+        "items": len(items),
+        "ok": ok,
+        "failed": len(items) - ok,
+        "ready": ok == len(items),
+        "seconds": round(time.perf_counter() - start, 3),
+        "warm_at": datetime.now().isoformat()
+    }
+    status = "✓" if report["ready"] else "❌"
+    print(f"{status} {name}: {ok}/{len(items)} warm after {report['seconds']}s")
+    return report
+
+
+async def warmup_profile(
+    profile: Dict[str, Any],
+    api_url: str = "http://localhost:8000",
+    ollama_url: str = "http://localhost:11434",
+    concurrency: int = 4,
+    keep_alive: str = "30m",
+    prime_query: str = "Bonjour",
+    max_loaded_models: int = 1
+) -> List[Dict[str, Any]]:
+    """Warm model residency, prompt prefixes and response caches in order"""
+    stages = []
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        await check_health(client, api_url)
+
+        async def load_model(model: str) -> bool:
+            # An empty prompt loads the model without generating
+            response = await client.post(
+                f"{ollama_url}/api/generate",
+                json={"model": model, "keep_alive": keep_alive}
+            )
+            response.raise_for_status()
+            loaded = (await client.get(f"{ollama_url}/api/ps")).json().get("models", [])
+            return any(model in (m.get("name"), m.get("model")) for m in loaded)
+
+        async def prime_template(template: Dict[str, Any]) -> bool:
+            payload = {"query": template.get("query") or prime_query}
+            for field in ("rules", "context", "knowledge_base", "top_k", "model"):
+                if template.get(field):
+                    payload[field] = template[field]
+            response = await client.post(f"{api_url}/chat/structured", json=payload)
+            return response.status_code == 200
+
+        async def send_prompt(prompt: Dict[str, Any]) -> bool:
+            endpoint = prompt.get("endpoint", "/chat/structured")
+            payload = {k: v for k, v in prompt.items() if k != "endpoint" and v is not None}
+            response = await client.post(f"{api_url}{endpoint}", json=payload)
+            return response.status_code == 200
+
+        models = profile["models"][:max(1, max_loaded_models)]
+        if len(profile["models"]) > len(models):
+            skipped = ", ".join(profile["models"][len(models):])
+            print(f"⚠️  Ollama keeps {len(models)} model(s) loaded: not preloading {skipped}")
+        # Sequential: concurrent loads would race for the same slots and evict each other
+        stages.append(await run_stage("residency", models, load_model, 1))
+        stages.append(await run_stage("prefixes", profile["templates"], prime_template, concurrency))
+        stages.append(await run_stage("responses", profile["prompts"], send_prompt, concurrency))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up the API and Ollama")
+    parser.add_argument("--api-url", default="http://localhost:8000", help="API URL")
+    parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama URL (residency stage)")
+    parser.add_argument("--model", help="Model for the single-request warmup (default: API's OLLAMA_MODEL)")
+    parser.add_argument("--profile", help="Traffic profile JSON")
+    parser.add_argument("--from-recording", nargs="+", metavar="PATH",
+                        help="Derive the profile from traffic recordings (files or directories)")
+    parser.add_argument("--top", type=int, default=20, help="Entries kept per section with --from-recording")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per stage")
+    parser.add_argument("--keep-alive", default="30m", help="How long Ollama keeps warmed models loaded")
+    parser.add_argument("--max-loaded-models", type=int, default=1,
+                        help="Ollama's OLLAMA_MAX_LOADED_MODELS: models preloaded by the residency stage")
+    parser.add_argument("--report", help="Write the stage report as JSON")
+    args = parser.parse_args()
+
+    if not args.profile and not args.from_recording:
+        asyncio.run(warmup_model(args.api_url, args.model))
+        return
+
+    profile = load_profile(args.profile) if args.profile else profile_from_recording(args.from_recording, args.top)
+    print(f"Profile: {len(profile['models'])} models, {len(profile['templates'])} templates, "
+          f"{len(profile['prompts'])} prompts")
+    stages = asyncio.run(warmup_profile(
+        profile, args.api_url, args.ollama_url, args.concurrency, args.keep_alive,
+        max_loaded_models=args.max_loaded_models
+    ))
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"stages": stages, "ready": all(s["ready"] for s in stages)}, f, indent=2)
+        print(f"Report written to {args.report}")
+    sys.exit(0 if all(stage["ready"] for stage in stages) else 1)
+
+
 if __name__ == "__main__":
-    asyncio.run(warmup_model())
+    main()